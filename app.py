@@ -2,6 +2,7 @@
 Hugging Face Spaces entry point for the Reflective Story Article Generator
 """
 
+import logging
 import os
 import sys
 
@@ -19,13 +20,13 @@ def authenticate_user(username, password):
 if __name__ == "__main__":
     print("🤗 Starting Reflective Story Article Generator on Hugging Face Spaces")
     print("🔒 Authentication is enabled for privacy")
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     
     try:
-        from src.ui.interface import story_interface
+        from src.ui.interface import get_story_interface
         
-        # Launch with authentication
-        story_interface.demo = story_interface.create_interface()
-        story_interface.demo.launch(
+        # Launch with authentication (also starts the download server)
+        get_story_interface().launch(
             auth=authenticate_user,
             server_name="0.0.0.0",
             server_port=7860,
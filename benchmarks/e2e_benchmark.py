@@ -0,0 +1,417 @@
+"""
+End-to-end throughput benchmark for the Reflective Story Article Generator
+
+Starts the local fake OpenAI server (benchmarks/fake_openai_server.py), points
+the app at it and runs complete jobs - outline, article, TXT and PDF export -
+through OutlineGenerator, ArticleGenerator and ExportHandler at increasing
+concurrency:
+
+    python benchmarks/e2e_benchmark.py --concurrency 1 4 16 64 --output e2e.json
+
+For every concurrency level it reports p50/p95/p99 latency per stage and per
+job, throughput, errors and the peak resident set size of this process and
+its children (the PDF render workers). No network or API key is needed; the
+response cache is disabled so every job really calls the stub. Compare the
+JSON files of two commits to spot performance changes.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.fake_openai_server import add_server_arguments, parse_latency  # noqa: E402
+
+STAGES = ("outline", "article", "export", "job")
+
+def percentile(values, q):
+    """
+    Linearly interpolated percentile
+
+    Args:
+        values (list): Samples
+        q (float): Percentile between 0 and 100
+
+    Returns:
+        float: The percentile, or None without samples
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def summarize(values):
+    """p50/p95/p99, mean and max of latency samples in seconds"""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": sum(values) / len(values),
+        "max": max(values)
+    }
+
+def _process_rss(pid):
+    """Resident set size of one process in bytes (Linux), or 0"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def _child_pids(pid):
+    """Direct children of a process (Linux)"""
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except (OSError, ValueError):
+        pass
+    return children
+
+class RssSampler:
+    """Samples the RSS of this process and its children in a background thread"""
+
+    def __init__(self, interval=0.05, exclude=()):
+        """
+        Args:
+            interval (float): Seconds between samples
+            exclude (tuple): Child PIDs not to count (the stub server)
+        """
+        self.interval = interval
+        self.exclude = set(exclude)
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        """Current RSS of the process tree in bytes"""
+        pid = os.getpid()
+        total = _process_rss(pid)
+        if not total:
+            # No /proc: fall back to this process's lifetime peak
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return total + sum(_process_rss(child) for child in _child_pids(pid) if child not in self.exclude)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.sample())
+
+    def __enter__(self):
+        self.peak = self.sample()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.sample())
+
+def free_port():
+    """An unused local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(args, port):
+    """
+    Start the stub server in its own process and wait until it answers
+
+    Returns:
+        subprocess.Popen: The server process
+    """
+    command = [
+        sys.executable, os.path.join(ROOT_DIR, "benchmarks", "fake_openai_server.py"),
+        "--port", str(port), "--latency", args.latency,
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--rate-429", str(args.rate_429), "--rate-500", str(args.rate_500),
+        "--outline-tokens", str(args.outline_tokens), "--seed", str(args.seed)
+    ]
+    server = subprocess.Popen(command, cwd=ROOT_DIR)
+
+    import httpx
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("Fake OpenAI server exited during startup")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).raise_for_status()
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("Fake OpenAI server did not start within 30 seconds")
+
+def server_stats(port):
+    """Request counters of the stub server"""
+    import httpx
+    return httpx.get(f"http://127.0.0.1:{port}/stats", timeout=5).json()
+
+def configure_environment(args, port, work_dir):
+    """
+    Point the app at the stub before any of its modules are imported
+
+    The base URL, key, caches and ledger location are always overridden so a
+    benchmark can never reach the real API or touch local data. Rate limits
+    default to off; set OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT to include the
+    scheduler.
+    """
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ["SIMILAR_OUTLINES_ENABLED"] = "false"
+    os.environ["USAGE_LEDGER_PATH"] = os.path.join(work_dir, "usage_ledger.sqlite3")
+    os.environ["STREAM_RESPONSES"] = "true" if args.stream else "false"
+    os.environ.setdefault("OPENAI_RPM_LIMIT", "0")
+    os.environ.setdefault("OPENAI_TPM_LIMIT", "0")
+
+class Pipeline:
+    """One complete job: outline, article and exports"""
+
+    def __init__(self, args, downloads_dir):
+        from src.ai.article_generator import get_article_generator
+        from src.ai.outline_generator import get_outline_generator
+        from src.export.export_handler import ExportHandler
+        from src.export.pdf_renderer import get_pdf_renderer
+
+        self.args = args
+        self.outline_generator = get_outline_generator()
+        self.article_generator = get_article_generator()
+        self.export_handler = ExportHandler(downloads_dir=downloads_dir)
+        self.exporters = {
+            "txt": self.export_handler.export_to_txt,
+            "pdf": self.export_handler.export_to_pdf
+        }
+        if "pdf" in args.formats:
+            # Spawn the render workers now, not inside the first measured job
+            get_pdf_renderer().start()
+
+    async def _outline(self, params):
+        if self.args.stream:
+            outline = ""
+            async for outline in self.outline_generator.agenerate_outline_stream(*params, use_cache=False):
+                pass
+            return outline
+        return await self.outline_generator.agenerate_outline(*params, use_cache=False)
+
+    async def _article(self, outline, params):
+        if self.args.stream:
+            article = ""
+            async for article in self.article_generator.agenerate_article_stream(
+                outline, *params[1:], use_cache=False
+            ):
+                pass
+            return article
+        return await self.article_generator.agenerate_article(outline, *params[1:], use_cache=False)
+
+    async def run(self, index):
+        """
+        Run one job and time its stages
+
+        Args:
+            index (int): Job number, mixed into the theme so jobs differ
+
+        Returns:
+            dict: Seconds per completed stage and "error" if a stage failed
+        """
+        from src.utils.text import strip_status_header
+
+        params = (
+            self.args.structure, f"finding courage after a setback #{index}", "young professionals",
+            self.args.length, "warm and conversational", "small steps count; setbacks teach"
+        )
+        timings = {}
+        started = time.perf_counter()
+
+        outline = await self._outline(params)
+        timings["outline"] = time.perf_counter() - started
+        if not outline.startswith("✅"):
+            return {**timings, "error": "outline"}
+
+        mark = time.perf_counter()
+        article = await self._article(strip_status_header(outline), params)
+        timings["article"] = time.perf_counter() - mark
+        if not article.startswith("✅"):
+            return {**timings, "error": "article"}
+
+        mark = time.perf_counter()
+        try:
+            for fmt in self.args.formats:
+                # Exports block, so they run off the event loop as in the UI
+                await asyncio.to_thread(
+                    self.exporters[fmt], article, params[1], params[2], params[3], params[0]
+                )
+        except Exception:
+            return {**timings, "error": "export"}
+        timings["export"] = time.perf_counter() - mark
+        timings["job"] = time.perf_counter() - started
+        return timings
+
+async def run_level(pipeline, concurrency, jobs, first_index):
+    """
+    Run `jobs` jobs with at most `concurrency` in flight
+
+    Returns:
+        tuple: (list of per-job timing dicts, elapsed seconds)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index):
+        async with semaphore:
+            return await pipeline.run(index)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(first_index + i) for i in range(jobs)))
+    return results, time.perf_counter() - started
+
+def git_revision():
+    """Short commit hash of the working tree, or None"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def benchmark(args, port, server_pid, work_dir):
+    """
+    Run every concurrency level against a started stub server
+
+    All levels share one event loop, like the app: the pooled async OpenAI
+    client cannot move between loops.
+
+    Returns:
+        list: One result dict per level
+    """
+    pipeline = Pipeline(args, os.path.join(work_dir, "downloads"))
+    levels = []
+    next_index = 0
+
+    # One unmeasured job warms connections, imports and the PDF workers
+    await run_level(pipeline, 1, 1, next_index)
+    next_index += 1
+
+    for concurrency in args.concurrency:
+        jobs = max(concurrency * args.rounds, args.min_jobs)
+        before = server_stats(port)
+        with RssSampler(exclude=(server_pid,)) as rss:
+            results, elapsed = await run_level(pipeline, concurrency, jobs, next_index)
+        after = server_stats(port)
+        next_index += jobs
+
+        completed = [result for result in results if "error" not in result]
+        errors = {}
+        for result in results:
+            if "error" in result:
+                errors[result["error"]] = errors.get(result["error"], 0) + 1
+
+        level = {
+            "concurrency": concurrency,
+            "jobs": jobs,
+            "completed": len(completed),
+            "failed": jobs - len(completed),
+            "errors_by_stage": errors,
+            "elapsed_seconds": elapsed,
+            "throughput_jobs_per_second": len(completed) / elapsed if elapsed else None,
+            "latency_seconds": {
+                stage: summarize([result[stage] for result in results if stage in result])
+                for stage in STAGES
+            },
+            "peak_rss_mb": rss.peak / (1024 * 1024),
+            "server": {name: after[name] - before.get(name, 0) for name in after}
+        }
+        levels.append(level)
+
+        job = level["latency_seconds"]["job"]
+        print(f"{concurrency:>6} {jobs:>6} {level['completed']:>6} {level['failed']:>6} "
+              f"{level['throughput_jobs_per_second'] or 0:>9.2f} "
+              f"{_ms(job.get('p50'))} {_ms(job.get('p95'))} {_ms(job.get('p99'))} "
+              f"{level['peak_rss_mb']:>8.1f}", flush=True)
+    return levels
+
+def _ms(seconds):
+    """Format seconds as a fixed-width millisecond column"""
+    return f"{seconds * 1000:>9.0f}" if seconds is not None else f"{'-':>9}"
+
+def main(argv=None):
+    """Run the benchmark from the command line"""
+    parser = argparse.ArgumentParser(description="Load-test the pipeline against a local fake OpenAI server.")
+    parser.add_argument("-c", "--concurrency", type=int, nargs="+", default=[1, 4, 16, 64],
+                        help="Concurrency levels to run, in order (default: %(default)s)")
+    parser.add_argument("--rounds", type=int, default=2,
+                        help="Jobs per level as a multiple of its concurrency (default: %(default)s)")
+    parser.add_argument("--min-jobs", type=int, default=8,
+                        help="Minimum jobs per level (default: %(default)s)")
+    parser.add_argument("--length", type=int, default=800,
+                        help="Article word count; 1500+ uses sectioned generation (default: %(default)s)")
+    parser.add_argument("--structure", default="personal_journey",
+                        help="Story structure for every job (default: %(default)s)")
+    parser.add_argument("--formats", type=lambda value: [fmt for fmt in value.split(",") if fmt],
+                        default=["txt", "pdf"], help="Export formats, comma separated (default: txt,pdf)")
+    parser.add_argument("--stream", action="store_true", help="Use the streaming generators")
+    parser.add_argument("-o", "--output", help="Also write the results as JSON to this file")
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+    parse_latency(args.latency)
+    unknown = [fmt for fmt in args.formats if fmt not in ("txt", "pdf")]
+    if unknown:
+        parser.error(f"Unknown export format: {', '.join(unknown)}")
+
+    port = free_port()
+    with tempfile.TemporaryDirectory(prefix="e2e-benchmark-") as work_dir:
+        configure_environment(args, port, work_dir)
+        server = start_server(args, port)
+        try:
+            print(f"{'conc':>6} {'jobs':>6} {'ok':>6} {'failed':>6} {'jobs/s':>9} "
+                  f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'RSS MB':>8}")
+            levels = asyncio.run(benchmark(args, port, server.pid, work_dir))
+        finally:
+            from src.export.pdf_renderer import get_pdf_renderer
+            get_pdf_renderer().shutdown()
+            server.terminate()
+            server.wait()
+
+    if args.output:
+        report = {
+            "commit": git_revision(),
+            "python": sys.version.split()[0],
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "config": {
+                "length": args.length,
+                "structure": args.structure,
+                "formats": args.formats,
+                "stream": args.stream,
+                "rounds": args.rounds,
+                "latency": args.latency,
+                "tokens_per_second": args.tokens_per_second,
+                "rate_429": args.rate_429,
+                "rate_500": args.rate_500,
+                "outline_tokens": args.outline_tokens,
+                "seed": args.seed
+            },
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "levels": levels
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Local OpenAI-compatible stub server for benchmarks
+
+Serves POST /v1/chat/completions with canned but well-formed outlines,
+article sections and transitions, so the whole pipeline can be load-tested
+without a network or an API key:
+
+    python benchmarks/fake_openai_server.py --port 8100 --latency lognormal:0.4,0.5 \\
+        --tokens-per-second 120 --rate-429 0.02 --rate-500 0.01
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8100/v1.
+
+Each response waits for a time-to-first-token drawn from the latency
+distribution, then produces completion tokens at --tokens-per-second
+(streamed chunk by chunk when the request asks for a stream). Requests can
+fail with an injected 429 (with retry-after-ms) or 500. GET /stats returns
+request counters.
+
+Like OpenAI's prompt caching, a prompt whose first 1024+ tokens match an
+earlier request reports that prefix, in 128-token steps, as cached_tokens.
+
+GET /v1/models/{model} answers the app's health probe.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+
+# Words the stub writes with; a word counts as one token
+VOCABULARY = (
+    "the moment she paused to notice how quietly everything had changed around her "
+    "and what it asked of her next was patience kindness honesty and a willingness "
+    "to begin again with open hands while the morning light settled on the kitchen table"
+).split()
+
+_OUTLINE_SECTION = re.compile(r"^\s*(\d{1,2})\.\s+([^\n]+?)\s*$", re.MULTILINE)
+_SECTION_REQUEST = re.compile(r"YOUR SECTION \(\d+ of \d+\): ([^\n]+)")
+_WORDS_REQUEST = re.compile(r"approximately (\d+) words")
+
+# Prompt caching granularity, in tokens
+CACHE_MIN_PREFIX = 1024
+CACHE_PREFIX_STEP = 128
+
+def parse_latency(spec):
+    """
+    Parse a latency distribution spec into a sampler
+
+    Supported: "fixed:S", "uniform:LOW,HIGH", "lognormal:MEDIAN,SIGMA" and
+    "exponential:MEAN", all in seconds.
+
+    Args:
+        spec (str): Distribution spec
+
+    Returns:
+        callable: Takes a random.Random and returns a delay in seconds
+    """
+    kind, _, params = spec.partition(":")
+    try:
+        values = [float(value) for value in params.split(",") if value]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid latency parameters: {spec}") from None
+
+    samplers = {
+        "fixed": (1, lambda rng, v: v[0]),
+        "uniform": (2, lambda rng, v: rng.uniform(v[0], v[1])),
+        "lognormal": (2, lambda rng, v: rng.lognormvariate(math.log(v[0]), v[1])),
+        "exponential": (1, lambda rng, v: rng.expovariate(1 / v[0]))
+    }
+    if kind not in samplers or len(values) != samplers[kind][0]:
+        raise argparse.ArgumentTypeError(
+            f"Invalid latency distribution {spec!r}; use fixed:S, uniform:LOW,HIGH, "
+            "lognormal:MEDIAN,SIGMA or exponential:MEAN"
+        )
+    sample = samplers[kind][1]
+    return lambda rng: max(sample(rng, values), 0.0)
+
+def count_tokens(text):
+    """Rough prompt token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+class FakeCompletions:
+    """Produces responses and tracks counters for the stub server"""
+
+    def __init__(self, latency="fixed:0.2", tokens_per_second=200.0, rate_429=0.0, rate_500=0.0,
+                 outline_tokens=300, seed=None):
+        """
+        Args:
+            latency (str): Time-to-first-token distribution (see parse_latency)
+            tokens_per_second (float): Completion speed; 0 returns text instantly
+            rate_429 (float): Share of requests answered with 429 Too Many Requests
+            rate_500 (float): Share of requests answered with 500 Internal Server Error
+            outline_tokens (int): Completion length of outlines
+            seed (int): Seed for reproducible latencies and failures
+        """
+        self.sample_latency = parse_latency(latency)
+        self.tokens_per_second = tokens_per_second
+        self.rate_429 = rate_429
+        self.rate_500 = rate_500
+        self.outline_tokens = outline_tokens
+        self.random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "streamed": 0, "errors_429": 0, "errors_500": 0,
+                      "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+        self._prefixes = set()  # Hashes of prompt prefixes seen so far
+
+    def _count(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                self.stats[name] += amount
+
+    def draw_failure(self):
+        """Pick the injected error status for a request, or None"""
+        roll = self.random.random()
+        if roll < self.rate_429:
+            return 429
+        if roll < self.rate_429 + self.rate_500:
+            return 500
+        return None
+
+    def _words(self, count):
+        """`count` filler words"""
+        start = self.random.randrange(len(VOCABULARY))
+        return [VOCABULARY[(start + i) % len(VOCABULARY)] for i in range(count)]
+
+    def _sentences(self, count):
+        """Filler prose of about `count` words"""
+        words = self._words(count)
+        sentences = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        return " ".join(sentence[:1].upper() + sentence[1:] + "." for sentence in sentences)
+
+    def compose(self, body):
+        """
+        Write the completion text for a request
+
+        Outlines repeat the numbered sections of the prompt, section requests
+        get a "## Title" heading and roughly the requested length, everything
+        else gets plain prose.
+
+        Returns:
+            str: Completion text, capped at the request's max_tokens
+        """
+        prompt = body["messages"][-1]["content"] if body.get("messages") else ""
+        limit = int(body.get("max_tokens") or 1000)
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+
+        section = _SECTION_REQUEST.search(prompt)
+        outline_sections = _OUTLINE_SECTION.findall(prompt)
+        if section:
+            words = _WORDS_REQUEST.search(prompt)
+            target = min(int(words.group(1)) if words else 200, limit)
+            return f"## {section.group(1).strip()}\n\n{self._sentences(max(target - 4, 1))}"
+        if "bridge" in prompt and "sections" in prompt:
+            return self._sentences(min(30, limit))
+        if outline_sections and "OUTLINE:" not in prompt:
+            titles = [title.split(" - ")[0].strip() for _, title in outline_sections]
+            per_point = max(self.outline_tokens // max(len(titles) * 2, 1), 3)
+            if json_mode:
+                return json.dumps({
+                    "title": "A Quiet Turning Point",
+                    "sections": [{"title": title, "points": [self._sentences(per_point)] * 2} for title in titles]
+                })
+            lines = ["# A Quiet Turning Point", ""]
+            for number, title in enumerate(titles, 1):
+                lines.append(f"{number}. {title}")
+                lines.extend(f"   - {self._sentences(per_point)}" for _ in range(2))
+            return "\n".join(lines)
+        words = _WORDS_REQUEST.search(prompt)
+        target = min(int(words.group(1)) if words else 300, limit)
+        return self._sentences(target)
+
+    def cached_prefix(self, body):
+        """
+        Prompt tokens served from the simulated prompt cache
+
+        Remembers every cacheable prefix of this prompt for later requests.
+
+        Returns:
+            int: Length of the longest previously seen prefix, in tokens
+        """
+        prompt = "".join(f"{message.get('role')}:{message.get('content', '')}\n" for message in body.get("messages", []))
+        cached = 0
+        for tokens in range(CACHE_MIN_PREFIX, count_tokens(prompt) + 1, CACHE_PREFIX_STEP):
+            digest = hashlib.sha1(prompt[:tokens * 4].encode("utf-8")).digest()
+            with self._lock:
+                if digest in self._prefixes:
+                    cached = tokens
+                self._prefixes.add(digest)
+        return cached
+
+    def usage(self, body, completion_tokens):
+        """OpenAI usage block for a request"""
+        prompt_tokens = sum(count_tokens(str(message.get("content", ""))) for message in body.get("messages", []))
+        cached_tokens = min(self.cached_prefix(body), prompt_tokens)
+        self._count(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cached_tokens=cached_tokens)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens}
+        }
+
+    def generation_time(self, tokens):
+        """Seconds needed to produce `tokens` completion tokens"""
+        return tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def envelope(self, body, **fields):
+        """Fields shared by every response object"""
+        return {"id": f"chatcmpl-fake-{next(self._ids)}", "created": int(time.time()),
+                "model": body.get("model", "fake-model"), **fields}
+
+def create_app(completions):
+    """
+    Build the stub's FastAPI app
+
+    Args:
+        completions (FakeCompletions): Response generator and counters
+
+    Returns:
+        FastAPI: The app
+    """
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        completions._count(requests=1)
+        await asyncio.sleep(completions.sample_latency(completions.random))
+
+        status = completions.draw_failure()
+        if status == 429:
+            completions._count(errors_429=1)
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached (injected)", "type": "requests",
+                           "code": "rate_limit_exceeded"}},
+                status_code=429, headers={"retry-after-ms": "100"}
+            )
+        if status == 500:
+            completions._count(errors_500=1)
+            return JSONResponse(
+                {"error": {"message": "Internal error (injected)", "type": "server_error"}},
+                status_code=500
+            )
+
+        text = completions.compose(body)
+        tokens = text.split(" ")
+
+        if not body.get("stream"):
+            await asyncio.sleep(completions.generation_time(len(tokens)))
+            return completions.envelope(
+                body, object="chat.completion",
+                choices=[{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                usage=completions.usage(body, len(tokens))
+            )
+
+        completions._count(streamed=1)
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+        async def events():
+            def event(**fields):
+                chunk = completions.envelope(body, object="chat.completion.chunk", **fields)
+                return f"data: {json.dumps(chunk)}\n\n"
+
+            # Emit a few tokens per chunk so pacing does not need a sleep per token
+            step = 4
+            for start in range(0, len(tokens), step):
+                piece = " ".join(tokens[start:start + step]) + (" " if start + step < len(tokens) else "")
+                yield event(choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+                await asyncio.sleep(completions.generation_time(len(tokens[start:start + step])))
+            yield event(choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if include_usage:
+                yield event(choices=[], usage=completions.usage(body, len(tokens)))
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/v1/models/{model}")
+    async def model(model: str):
+        return {"id": model, "object": "model", "created": 0, "owned_by": "fake"}
+
+    @app.get("/stats")
+    async def stats():
+        return dict(completions.stats)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
+
+def build_parser():
+    """Command line options, shared with the end-to-end benchmark"""
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stub server.")
+    add_server_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8100, help="Port to listen on (default: %(default)s)")
+    return parser
+
+def add_server_arguments(parser):
+    """Add the stub's behaviour options to a parser"""
+    parser.add_argument("--latency", default="lognormal:0.3,0.4",
+                        help="Time to first token: fixed:S, uniform:LOW,HIGH, lognormal:MEDIAN,SIGMA "
+                             "or exponential:MEAN (default: %(default)s)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0,
+                        help="Completion speed per request; 0 is instant (default: %(default)s)")
+    parser.add_argument("--rate-429", type=float, default=0.0,
+                        help="Share of requests failing with 429 (default: %(default)s)")
+    parser.add_argument("--rate-500", type=float, default=0.0,
+                        help="Share of requests failing with 500 (default: %(default)s)")
+    parser.add_argument("--outline-tokens", type=int, default=300,
+                        help="Completion length of outlines (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1234, help="Random seed (default: %(default)s)")
+
+def main(argv=None):
+    """Run the stub server from the command line"""
+    import uvicorn
+
+    args = build_parser().parse_args(argv)
+    parse_latency(args.latency)
+    completions = FakeCompletions(
+        latency=args.latency, tokens_per_second=args.tokens_per_second,
+        rate_429=args.rate_429, rate_500=args.rate_500, outline_tokens=args.outline_tokens, seed=args.seed
+    )
+    uvicorn.run(create_app(completions), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Startup benchmark for the Reflective Story Article Generator
+
+Imports each target module in a fresh Python process and records the import
+time, the peak resident set size and which heavy dependencies were loaded:
+
+    python benchmarks/startup_benchmark.py --runs 5 --output startup.json
+
+Run it before and after a change to catch startup regressions.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules imported by default: the UI, the generators, exports and the batch CLI
+DEFAULT_TARGETS = [
+    "src.ui.interface",
+    "src.ai.outline_generator",
+    "src.export.export_handler",
+    "src.batch"
+]
+
+# Dependencies that should only load when they are actually used
+HEAVY_MODULES = ["gradio", "openai", "httpx", "reportlab", "flask", "fastapi"]
+
+# Runs inside the child process; prints one JSON line
+PROBE = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+__import__({target!r})
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "import_seconds": elapsed,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "loaded": [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+def measure(target):
+    """
+    Import a module in a fresh interpreter
+
+    Args:
+        target (str): Dotted module name
+
+    Returns:
+        dict: import_seconds, max_rss_kb and loaded heavy modules
+    """
+    code = PROBE.format(root=ROOT_DIR, target=target, heavy=HEAVY_MODULES)
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "")
+    completed = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def benchmark(targets, runs):
+    """
+    Measure every target `runs` times
+
+    Args:
+        targets (list): Dotted module names
+        runs (int): Fresh processes per target
+
+    Returns:
+        dict: Summary per target
+    """
+    results = {}
+    for target in targets:
+        samples = [measure(target) for _ in range(runs)]
+        times = [sample["import_seconds"] for sample in samples]
+        rss = [sample["max_rss_kb"] for sample in samples]
+        results[target] = {
+            "runs": runs,
+            "import_seconds_median": statistics.median(times),
+            "import_seconds_min": min(times),
+            "import_seconds_max": max(times),
+            "max_rss_mb_median": statistics.median(rss) / 1024,
+            "heavy_modules_loaded": samples[-1]["loaded"]
+        }
+    return results
+
+def main(argv=None):
+    """Run the benchmark from the command line"""
+    parser = argparse.ArgumentParser(description="Measure cold import time and memory.")
+    parser.add_argument("targets", nargs="*", default=DEFAULT_TARGETS,
+                        help="Modules to import (default: %(default)s)")
+    parser.add_argument("-n", "--runs", type=int, default=5,
+                        help="Fresh processes per module (default: %(default)s)")
+    parser.add_argument("-o", "--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = benchmark(args.targets, args.runs)
+
+    print(f"{'module':<30} {'median':>9} {'min':>9} {'max':>9} {'RSS MB':>8}  heavy deps loaded")
+    for target, result in results.items():
+        print(f"{target:<30} {result['import_seconds_median'] * 1000:>7.1f}ms "
+              f"{result['import_seconds_min'] * 1000:>7.1f}ms {result['import_seconds_max'] * 1000:>7.1f}ms "
+              f"{result['max_rss_mb_median']:>8.1f}  {', '.join(result['heavy_modules_loaded']) or '-'}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
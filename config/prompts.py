@@ -169,31 +169,80 @@ Structure this as an UNEXPECTED WISDOM story with these sections:
 Emphasize how profound truths often come from the most unexpected places."""
     }
     
-    ARTICLE_GENERATION = """Based on the following approved outline, write a complete reflective story article:
+    # Article prompts put the static instructions first, then the parameters
+    # and outline, with anything specific to one call at the very end, so
+    # calls share a long prefix the provider can cache (section calls for one
+    # article share everything up to "YOUR SECTION")
+    ARTICLE_GENERATION = """Write a complete reflective story article based on the approved outline and original parameters given at the end.
+
+Please write a complete article that:
+- Follows the approved outline structure
+- Maintains the specified writing style and tone
+- Speaks directly to the target audience
+- Incorporates the key messages naturally
+- Aims for the requested word count
+- Creates genuine moments for self-reflection
+- Ends with actionable insights or questions
+
+Write in a warm, engaging manner that invites readers to examine their own experiences.
+
+ORIGINAL PARAMETERS:
+Theme: {theme}
+Target Audience: {audience}
+Word Count: {length} words
+Writing Style: {style}
+Key Messages: {key_messages}
 
 OUTLINE:
 {outline}
 
+Aim for approximately {length} words."""
+
+    ARTICLE_SECTION_GENERATION = """You are writing one section of a reflective story article. Other writers are drafting the remaining sections at the same time, so stay strictly within your section.
+
+Please write your section so that it:
+- Begins with a "## " heading of the section title
+- Covers only the points planned for this section
+- Keeps to the requested length
+- Maintains the specified writing style and tone and speaks directly to the target audience
+- Does not summarize the whole article or repeat material from other sections
+- Flows naturally from the previous section and toward the next one
+
 ORIGINAL PARAMETERS:
 Theme: {theme}
 Target Audience: {audience}
-Word Count: {length} words
 Writing Style: {style}
 Key Messages: {key_messages}
 
-Please write a complete article that:
-- Follows the approved outline structure
-- Maintains the specified writing style and tone
-- Speaks directly to the target audience
-- Incorporates the key messages naturally
-- Aims for approximately {length} words
-- Creates genuine moments for self-reflection
-- Ends with actionable insights or questions
+FULL OUTLINE (for context only):
+{outline}
+
+YOUR SECTION ({position} of {total}): {title}
+{section_notes}
+
+Previous section: {previous_title}
+Next section: {next_title}
+
+Begin with the heading "## {title}" and write approximately {words} words."""
+
+    SECTION_TRANSITION = """Two consecutive sections of a reflective story article were written separately. Write one or two sentences that bridge the end of the first section to the start of the second. Match the tone of the text and do not repeat it.
+
+END OF SECTION "{previous_title}":
+{previous_text}
+
+START OF SECTION "{next_title}":
+{next_text}
+
+Return only the bridging sentences."""
+
+    OUTLINE_JSON_FORMAT = """
 
-Write in a warm, engaging manner that invites readers to examine their own experiences."""
+Return the outline as a JSON object instead of markdown, with this shape:
+{"title": "Working title of the article", "sections": [{"title": "Section name", "points": ["What this section covers", "..."]}]}
+Keep the numbered sections above, in order, as the entries of "sections"."""
 
     @classmethod
-    def get_outline_prompt(cls, structure_type, theme, audience, length, style, key_messages):
+    def get_outline_prompt(cls, structure_type, theme, audience, length, style, key_messages, json_format=False):
         """
         Get the appropriate outline prompt based on selected structure
         
@@ -204,6 +253,7 @@ Write in a warm, engaging manner that invites readers to examine their own exper
             length (int): Word count
             style (str): Writing style
             key_messages (str): Key messages
+            json_format (bool): Ask for the outline as JSON instead of markdown
             
         Returns:
             str: Formatted prompt for the selected structure
@@ -213,13 +263,14 @@ Write in a warm, engaging manner that invites readers to examine their own exper
             
         template = cls.OUTLINE_TEMPLATES[structure_type]
         
-        return template.format(
+        prompt = template.format(
             theme=theme,
             audience=audience,
             length=length,
             style=style,
             key_messages=key_messages
         )
+        return prompt + cls.OUTLINE_JSON_FORMAT if json_format else prompt
     
     @classmethod
     def get_structure_options(cls):
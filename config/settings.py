@@ -23,6 +23,127 @@ class Settings:
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4")
     TEMPERATURE = float(os.getenv("TEMPERATURE", "0.7"))
     MAX_TOKENS = int(os.getenv("MAX_TOKENS", "3000"))
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # OpenAI-compatible endpoint override
+    
+    # Secondary OpenAI-compatible provider for hedged requests and failover
+    # (unset: hedges go to the primary endpoint and there is no failover)
+    OPENAI_SECONDARY_BASE_URL = os.getenv("OPENAI_SECONDARY_BASE_URL") or None
+    OPENAI_SECONDARY_API_KEY = os.getenv("OPENAI_SECONDARY_API_KEY") or OPENAI_API_KEY
+    OPENAI_SECONDARY_MODEL = os.getenv("OPENAI_SECONDARY_MODEL") or OPENAI_MODEL
+    
+    # Hedged requests: an async call still running past this percentile of
+    # recent calls of its stage gets a duplicate and the first answer wins
+    HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+    HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+    HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "2.0"))  # seconds
+    HEDGE_MAX_RATE = float(os.getenv("HEDGE_MAX_RATE", "0.05"))  # share of calls that may be hedged
+    HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))  # latencies per stage before hedging
+    
+    # Circuit breaker per provider: opens when too many recent attempts fail
+    # with transient errors or are slow, so requests fail fast instead of
+    # waiting out timeouts; after the cool-down one trial request decides
+    CIRCUIT_BREAKER_ENABLED = os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"
+    CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", "20"))  # recent attempts considered
+    CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "10"))  # attempts before it can open
+    CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+    CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "60"))  # 0 ignores latency
+    CIRCUIT_SLOW_CALL_RATE = float(os.getenv("CIRCUIT_SLOW_CALL_RATE", "0.5"))
+    CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))  # cool-down before a trial
+    
+    # OpenAI health probe (a model lookup, no tokens) behind /health
+    HEALTH_PROBE_TTL = float(os.getenv("HEALTH_PROBE_TTL", "30"))  # seconds a result is reused
+    HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "5"))  # seconds
+    
+    # Identical calls made while one is in flight wait for its result instead
+    # of sending their own request (streams are shared from the first token)
+    COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "true").lower() == "true"
+    
+    # HTTP connection pool shared by all OpenAI calls
+    OPENAI_POOL_MAX_CONNECTIONS = int(os.getenv("OPENAI_POOL_MAX_CONNECTIONS", "100"))
+    OPENAI_POOL_MAX_KEEPALIVE = int(os.getenv("OPENAI_POOL_MAX_KEEPALIVE", "20"))
+    OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))  # seconds
+    OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))  # seconds
+    OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))  # seconds
+    OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "false").lower() == "true"  # requires the h2 package
+    
+    # Rate limits for the shared OpenAI scheduler (match your account tier; 0 disables)
+    OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+    OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "30000"))
+    OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "6"))
+    OPENAI_RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "1.0"))  # seconds
+    OPENAI_RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "60.0"))  # seconds
+    
+    # Stream outline and article text into the UI while it is generated
+    STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+    
+    # Generation handlers are async, so many can be in flight without holding
+    # worker threads; this caps how many Gradio runs at once per button
+    GENERATION_CONCURRENCY_LIMIT = int(os.getenv("GENERATION_CONCURRENCY_LIMIT", "256"))
+    
+    # Response Cache Settings
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "data/response_cache.sqlite3")
+    RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+    RESPONSE_CACHE_MEMORY_ENTRIES = int(os.getenv("RESPONSE_CACHE_MEMORY_ENTRIES", "256"))
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+    
+    # Serve an earlier outline when a request's theme, audience and key
+    # messages are near-duplicates of it (same structure, MinHash similarity)
+    SIMILAR_OUTLINES_ENABLED = os.getenv("SIMILAR_OUTLINES_ENABLED", "true").lower() == "true"
+    SIMILAR_OUTLINES_PATH = os.getenv("SIMILAR_OUTLINES_PATH", "data/similar_outlines.sqlite3")
+    SIMILAR_OUTLINE_THRESHOLD = float(os.getenv("SIMILAR_OUTLINE_THRESHOLD", "0.8"))  # estimated Jaccard, 0-1
+    
+    # Token Usage Ledger (append-only log of every OpenAI call)
+    USAGE_LEDGER_ENABLED = os.getenv("USAGE_LEDGER_ENABLED", "true").lower() == "true"
+    USAGE_LEDGER_PATH = os.getenv("USAGE_LEDGER_PATH", "data/usage_ledger.sqlite3")
+    USER_DAILY_TOKEN_BUDGET = int(os.getenv("USER_DAILY_TOKEN_BUDGET", "0"))  # per user per UTC day; 0 disables
+    
+    # Projects: parameters, outline and article versions saved per user so
+    # work can be reopened after a reload without calling OpenAI
+    PROJECT_STORE_ENABLED = os.getenv("PROJECT_STORE_ENABLED", "true").lower() == "true"
+    PROJECT_STORE_PATH = os.getenv("PROJECT_STORE_PATH", "data/projects.sqlite3")
+    
+    # Logging
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    
+    # Bearer token that lets a scraper read /metrics without a UI login;
+    # empty means only signed-in users (or everyone, without auth) can
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+    
+    # Article Generation Settings
+    ARTICLE_MAX_TOKENS = int(os.getenv("ARTICLE_MAX_TOKENS", "4096"))  # single-call completion limit
+    SECTIONED_ARTICLES = os.getenv("SECTIONED_ARTICLES", "true").lower() == "true"
+    SECTIONED_ARTICLE_MIN_WORDS = int(os.getenv("SECTIONED_ARTICLE_MIN_WORDS", "1500"))
+    SECTION_MAX_CONCURRENCY = int(os.getenv("SECTION_MAX_CONCURRENCY", "10"))
+    SECTION_TRANSITIONS = os.getenv("SECTION_TRANSITIONS", "true").lower() == "true"
+    
+    # Ask for outlines in JSON mode on non-streaming calls ("auto" enables it
+    # for models known to support response_format=json_object)
+    OUTLINE_JSON_MODE = os.getenv("OUTLINE_JSON_MODE", "auto").lower()
+    
+    # Keep article text per outline section in the UI, so editing one outline
+    # section regenerates only the article sections it affects (for articles
+    # of at least SECTIONED_ARTICLE_MIN_WORDS, which are written by section)
+    INCREMENTAL_ARTICLE_EDITS = os.getenv("INCREMENTAL_ARTICLE_EDITS", "true").lower() == "true"
+    
+    # Public URL prefix for download links, e.g. "https://stories.example.com"
+    # when the app sits behind a proxy; empty keeps links relative to the UI
+    DOWNLOAD_BASE_URL = os.getenv("DOWNLOAD_BASE_URL", "").rstrip("/")
+    
+    # Where exports live: "disk" (downloads/) or "memory" (no disk writes)
+    EXPORT_STORAGE = os.getenv("EXPORT_STORAGE", "disk").lower()
+    EXPORT_MEMORY_MAX_BYTES = int(os.getenv("EXPORT_MEMORY_MAX_BYTES", str(100 * 1024 * 1024)))
+    EXPORT_MEMORY_TTL = float(os.getenv("EXPORT_MEMORY_TTL", "3600"))  # seconds until an undownloaded export expires
+    
+    # Download Retention Settings (0 disables a limit)
+    DOWNLOAD_MAX_AGE = float(os.getenv("DOWNLOAD_MAX_AGE", str(24 * 3600)))  # seconds since last access
+    DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(500 * 1024 * 1024)))
+    DOWNLOAD_SWEEP_INTERVAL = float(os.getenv("DOWNLOAD_SWEEP_INTERVAL", "300"))  # seconds
+    
+    # PDF Export Settings
+    PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))  # 0 renders in the request thread
+    PDF_RENDER_QUEUE_SIZE = int(os.getenv("PDF_RENDER_QUEUE_SIZE", "16"))  # renders waiting for a worker
+    PDF_RENDER_QUEUE_TIMEOUT = float(os.getenv("PDF_RENDER_QUEUE_TIMEOUT", "30"))  # seconds
     
     # Word Count Settings
     DEFAULT_WORD_COUNT = 800
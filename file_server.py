@@ -1,73 +1,265 @@
 """
-Simple Flask server for handling file downloads
-Runs alongside Gradio to serve exported articles
+Download and health routes for exported articles
+
+The routes are mounted on the FastAPI app Gradio already runs, so downloads
+share the UI's port, host and proxy setup instead of needing a second server.
 """
 
+import asyncio
+import hmac
+import inspect
 import os
-import threading
-from flask import Flask, send_file, abort
-from werkzeug.utils import secure_filename
+import time
+from src.ai.circuit_breaker import circuit_breaker_stats
+from src.ai.health import get_health_probe
+from src.utils.metrics import metrics
+
+# kind is "file", "memory" or "archive"; status is the HTTP status code
+DOWNLOADS = metrics.counter("story_downloads_total", "Download requests by kind and status", ("kind", "status"))
+DOWNLOAD_LATENCY = metrics.histogram(
+    "story_download_seconds", "Time to start a download response", ("kind", "status")
+)
+DOWNLOAD_BYTES = metrics.counter("story_download_bytes_total", "Bytes served from disk or memory", ("kind",))
 
 class FileServer:
-    def __init__(self, download_folder="downloads", port=5001):
+    def __init__(self, download_folder="downloads", retention=None, memory_store=None, archives=None):
         self.download_folder = download_folder
-        self.port = port
-        self.app = Flask(__name__)
-        self.setup_routes()
-        
+        self.retention = retention
+        # Bulk ZIP archives are built while they stream (ExportHandler.open_archive)
+        self.archives = archives
+        # In-memory exports are served from this store and never touch disk
+        self.memory_store = memory_store
+
         # Create downloads folder if it doesn't exist
-        if not os.path.exists(download_folder):
+        if memory_store is None and not os.path.exists(download_folder):
             os.makedirs(download_folder)
-    
-    def setup_routes(self):
-        """Set up Flask routes for file downloads"""
-        
-        @self.app.route('/download/<filename>')
-        def download_file(filename):
-            """Serve file for download with proper headers"""
-            try:
-                # Secure the filename to prevent directory traversal
-                safe_filename = secure_filename(filename)
-                file_path = os.path.join(self.download_folder, safe_filename)
-                
-                # Check if file exists
-                if not os.path.exists(file_path):
-                    abort(404)
-                
-                # Determine the correct mimetype and attachment name
-                if filename.endswith('.pdf'):
-                    mimetype = 'application/pdf'
-                elif filename.endswith('.txt'):
-                    mimetype = 'text/plain'
-                else:
-                    mimetype = 'application/octet-stream'
-                
-                # Send file with download headers
-                return send_file(
-                    file_path,
-                    as_attachment=True,
-                    download_name=filename,
-                    mimetype=mimetype
+
+    def resolve(self, filename):
+        """
+        Map a requested filename to a file in the download folder
+
+        Args:
+            filename (str): Filename from the URL
+
+        Returns:
+            str: Path to the file, or None if it is not a servable export
+        """
+        # Only plain names: no directories, and no hidden in-progress temp files
+        if not filename or filename != os.path.basename(filename) or filename.startswith("."):
+            return None
+        file_path = os.path.join(self.download_folder, filename)
+        return file_path if os.path.isfile(file_path) else None
+
+    async def current_user(self, request):
+        """
+        User signed in to the Gradio app serving the request
+
+        Uses the same session cookie (or auth dependency) as Gradio's own
+        login check, so the routes below are exactly as private as the UI.
+
+        Args:
+            request: FastAPI request; request.app is Gradio's app
+
+        Returns:
+            tuple: (auth_enabled, username or None)
+        """
+        app = request.app
+        auth_dependency = getattr(app, "auth_dependency", None)
+        if auth_dependency is not None:
+            user = auth_dependency(request)
+            if inspect.isawaitable(user):
+                user = await user
+            return True, user
+        if getattr(app, "auth", None) is None:
+            return False, None
+        cookie_id = getattr(app, "cookie_id", "")
+        token = (request.cookies.get(f"access-token-{cookie_id}")
+                 or request.cookies.get(f"access-token-unsecure-{cookie_id}"))
+        return True, app.tokens.get(token)
+
+    async def require_login(self, request):
+        """Route dependency: reject requests without a session when the UI requires login"""
+        from fastapi import HTTPException
+
+        auth_enabled, user = await self.current_user(request)
+        if auth_enabled and user is None:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+
+    async def require_metrics_access(self, request):
+        """Route dependency: allow the metrics token or a signed-in user"""
+        from config.settings import settings
+
+        authorization = request.headers.get("authorization", "")
+        if settings.METRICS_TOKEN and hmac.compare_digest(
+            authorization.encode("utf-8"), f"Bearer {settings.METRICS_TOKEN}".encode("utf-8")
+        ):
+            return
+        await self.require_login(request)
+
+    def _media_type(self, filename):
+        """Determine the correct mimetype for a download"""
+        if filename.endswith('.pdf'):
+            return 'application/pdf'
+        elif filename.endswith('.txt'):
+            return 'text/plain; charset=utf-8'
+        elif filename.endswith('.zip'):
+            return 'application/zip'
+        return 'application/octet-stream'
+
+    async def download_file(self, filename: str):
+        """Serve file for download with proper headers"""
+        from fastapi import HTTPException
+
+        started = time.perf_counter()
+        kind = "file"
+        if self.archives is not None and filename.endswith('.zip'):
+            kind = "archive"
+        elif self.memory_store is not None:
+            kind = "memory"
+        status = 200
+        try:
+            return self._download_response(filename, kind)
+        except HTTPException as e:
+            status = e.status_code
+            raise
+        except Exception:
+            status = 500
+            raise
+        finally:
+            DOWNLOADS.inc(kind=kind, status=status)
+            DOWNLOAD_LATENCY.observe(time.perf_counter() - started, kind=kind, status=status)
+
+    def _download_response(self, filename, kind):
+        """Build the response for download_file"""
+        from fastapi import HTTPException
+        from fastapi.responses import FileResponse, Response, StreamingResponse
+
+        if kind == "archive":
+            chunks = self.archives.open_archive(filename)
+            if chunks is not None:
+                # A sync iterator: Starlette runs each step in its thread pool
+                return StreamingResponse(
+                    chunks,
+                    media_type=self._media_type(filename),
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'}
                 )
-                
-            except Exception as e:
-                print(f"Error serving file {filename}: {str(e)}")
-                abort(500)
-        
-        @self.app.route('/health')
-        def health_check():
-            """Simple health check endpoint"""
-            return {"status": "running", "download_folder": self.download_folder}
-    
-    def start_server(self):
-        """Start the Flask server in a separate thread"""
-        def run_server():
-            self.app.run(host='127.0.0.1', port=self.port, debug=False, use_reloader=False)
-        
-        server_thread = threading.Thread(target=run_server, daemon=True)
-        server_thread.start()
-        print(f"File server started on http://127.0.0.1:{self.port}")
-        return server_thread
-
-# Global file server instance
-file_server = FileServer()
\ No newline at end of file
+            if self.memory_store is not None:
+                kind = "memory"
+
+        if kind == "memory":
+            # Released on download; the bytes only live as long as needed
+            data = self.memory_store.pop(filename)
+            if data is None:
+                raise HTTPException(status_code=404, detail="File not found")
+            DOWNLOAD_BYTES.inc(len(data), kind="memory")
+            return Response(
+                content=data,
+                media_type=self._media_type(filename),
+                headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+            )
+
+        file_path = self.resolve(filename)
+        if file_path is None:
+            raise HTTPException(status_code=404, detail="File not found")
+
+        if self.retention is not None:
+            self.retention.touch(filename)
+
+        DOWNLOAD_BYTES.inc(os.path.getsize(file_path), kind="file")
+        # Streamed from disk in chunks by the ASGI server
+        return FileResponse(
+            file_path,
+            media_type=self._media_type(filename),
+            filename=filename,
+            content_disposition_type="attachment"
+        )
+
+    async def health_check(self, request):
+        """
+        Health check endpoint
+
+        Reports "degraded" while the cached OpenAI probe fails or a circuit
+        breaker is open. When the UI requires login, callers without a
+        session only get local liveness and never trigger an OpenAI probe.
+        """
+        auth_enabled, user = await self.current_user(request)
+        if auth_enabled and user is None:
+            return {"status": "running"}
+
+        openai_health = await asyncio.to_thread(get_health_probe().check)
+        circuits = circuit_breaker_stats()
+        degraded = not openai_health["ok"] or any(circuit["state"] != "closed" for circuit in circuits.values())
+        health = {
+            "status": "degraded" if degraded else "running",
+            "download_folder": self.download_folder,
+            "openai": {**openai_health, "circuits": circuits}
+        }
+        if self.retention is not None:
+            health["downloads"] = self.retention.stats()
+        if self.memory_store is not None:
+            health["memory_exports"] = self.memory_store.stats()
+        return health
+
+    async def metrics_endpoint(self):
+        """Process metrics in the Prometheus text exposition format"""
+        from fastapi.responses import PlainTextResponse
+
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    def routes(self):
+        """
+        Build the routes to mount on Gradio's FastAPI app
+
+        Downloads and metrics need the same login as the UI when
+        authentication is on; /metrics also accepts METRICS_TOKEN, and
+        /health answers anonymous callers with liveness only.
+
+        Returns:
+            list: FastAPI routes for /download/{filename}, /health and /metrics
+        """
+        from fastapi import Depends, Request
+        from fastapi.routing import APIRoute
+
+        async def require_login(request: Request):
+            await self.require_login(request)
+
+        async def require_metrics_access(request: Request):
+            await self.require_metrics_access(request)
+
+        async def health_check(request: Request):
+            return await self.health_check(request)
+
+        return [
+            APIRoute("/download/{filename}", self.download_file, methods=["GET"], include_in_schema=False,
+                     dependencies=[Depends(require_login)]),
+            APIRoute("/health", health_check, methods=["GET"], include_in_schema=False),
+            APIRoute("/metrics", self.metrics_endpoint, methods=["GET"], include_in_schema=False,
+                     dependencies=[Depends(require_metrics_access)])
+        ]
+
+# Global file server instance, created on first use
+_file_server = None
+
+def get_file_server():
+    """
+    Get the global file server, creating it on first use
+
+    Returns:
+        FileServer: Shared file server
+    """
+    global _file_server
+    if _file_server is None:
+        from config.settings import settings
+        from src.export.export_handler import get_export_handler
+        if settings.EXPORT_STORAGE == "memory":
+            _file_server = FileServer(memory_store=get_export_handler().store, archives=get_export_handler())
+        else:
+            from src.export.retention import get_download_retention
+            _file_server = FileServer(retention=get_download_retention(), archives=get_export_handler())
+    return _file_server
+
+def __getattr__(name):
+    """Keep `from file_server import file_server` working"""
+    if name == "file_server":
+        return get_file_server()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
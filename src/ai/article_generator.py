@@ -2,18 +2,187 @@
 Article generation functionality using OpenAI
 """
 
-from openai import OpenAI
+import asyncio
+import json
+import logging
 from config.settings import settings
 from config.prompts import prompts
+from src.ai.circuit_breaker import CircuitOpenError
+from src.ai.health import get_health_probe
+from src.ai.llm_client import llm_client, PROMPT_BUILD
+from src.ai.response_cache import response_cache
+from src.ai.section_writer import SectionWriter, TOKENS_PER_WORD
+from src.ai.usage_ledger import BudgetExceededError
+
+logger = logging.getLogger(__name__)
 
 class ArticleGenerator:
     """Handles AI-powered full article generation from approved outlines"""
     
     def __init__(self):
-        """Initialize the OpenAI client"""
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        """Initialize the generator with the shared LLM client"""
+        self.llm = llm_client
+        self.section_writer = SectionWriter(self.llm)
+    
+    def _build_messages(self, outline, theme, audience, length, style, key_messages):
+        """
+        Build the chat messages for an article request
+        
+        Returns:
+            list: Messages for the chat completions API
+        """
+        # Format the article generation prompt
+        with PROMPT_BUILD.time(stage="article"):
+            user_prompt = prompts.ARTICLE_GENERATION.format(
+                outline=outline,
+                theme=theme,
+                audience=audience,
+                length=length,
+                style=style,
+                key_messages=key_messages
+            )
+        
+        return [
+            {"role": "system", "content": prompts.SYSTEM_MESSAGE},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _max_tokens(self, length):
+        """Completion token limit for a single-call article of `length` words"""
+        return min(settings.ARTICLE_MAX_TOKENS, max(2000, int(length * TOKENS_PER_WORD) + 300))
+    
+    def _plan_sections(self, outline, length, sectioned):
+        """
+        Decide whether to write the article section by section
+        
+        Args:
+            outline (str): Approved outline
+            length (int): Target word count
+            sectioned (bool): Force (True) or disable (False) sectioned mode;
+                None decides from settings and the target length
+            
+        Returns:
+            list: SectionTask objects, or an empty list for a single call
+        """
+        if sectioned is None:
+            sectioned = settings.SECTIONED_ARTICLES and length >= settings.SECTIONED_ARTICLE_MIN_WORDS
+        return self.section_writer.plan(outline, length) if sectioned else []
+    
+    def _cache_key(self, outline, theme, audience, length, style, key_messages, sectioned):
+        """Build the response cache key for an article request"""
+        params = {
+            "outline": outline,
+            "theme": theme,
+            "audience": audience,
+            "length": length,
+            "style": style,
+            "key_messages": key_messages,
+            "sectioned": sectioned
+        }
+        template = prompts.ARTICLE_SECTION_GENERATION if sectioned else prompts.ARTICLE_GENERATION
+        return response_cache.make_key("article", params, template, self._max_tokens(length))
+    
+    def _prepare_sections(self, tasks, cache_key, use_cache, draft, params):
+        """
+        Pre-fill section text from the response cache or the previous draft
+        
+        Sectioned results are cached as JSON so a cache hit still knows which
+        text belongs to which outline section.
+        
+        Returns:
+            tuple: (texts, transitions) lists with None where text must be written
+        """
+        if use_cache:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                try:
+                    data = json.loads(cached)
+                    if len(data["texts"]) == len(tasks):
+                        return data["texts"], data["transitions"]
+                except (ValueError, KeyError, TypeError):
+                    pass  # Written by an older version; regenerate
+        
+        if draft is not None:
+            texts, transitions = draft.reuse(tasks, params)
+            reused = sum(text is not None for text in texts)
+            if reused:
+                logger.info("Reusing %d of %d article sections from the previous draft", reused, len(tasks))
+            return texts, transitions
+        
+        return [None] * len(tasks), [None] * (len(tasks) - 1)
+    
+    def _finish_sections(self, tasks, texts, transitions, cache_key, draft, params):
+        """Cache and remember the written sections, and return the stitched article"""
+        response_cache.set(cache_key, json.dumps({"texts": texts, "transitions": transitions}))
+        if draft is not None:
+            draft.update(tasks, texts, transitions, params)
+        return self.section_writer.stitch(tasks, texts, transitions)
+    
+    def _write_sections(self, tasks, outline, theme, audience, length, style, key_messages, use_cache, draft):
+        """
+        Write the article section by section on worker threads
+        
+        Yields:
+            str: Stitched article so far; the last value is the final article
+        """
+        params = self._draft_params(theme, audience, length, style, key_messages)
+        cache_key = self._cache_key(outline, theme, audience, length, style, key_messages, True)
+        texts, transitions = self._prepare_sections(tasks, cache_key, use_cache, draft, params)
+        
+        yield from self.section_writer.write(
+            tasks, outline, theme, audience, style, key_messages, texts, transitions
+        )
+        yield self._finish_sections(tasks, texts, transitions, cache_key, draft, params)
     
-    def generate_article(self, outline, theme, audience, length, style, key_messages):
+    async def _awrite_sections(self, tasks, outline, theme, audience, length, style, key_messages, use_cache, draft):
+        """
+        Async version of _write_sections
+        
+        Yields:
+            str: Stitched article so far; the last value is the final article
+        """
+        params = self._draft_params(theme, audience, length, style, key_messages)
+        cache_key = self._cache_key(outline, theme, audience, length, style, key_messages, True)
+        texts, transitions = await asyncio.to_thread(
+            self._prepare_sections, tasks, cache_key, use_cache, draft, params
+        )
+        
+        async for article in self.section_writer.astream(
+            tasks, outline, theme, audience, style, key_messages, texts, transitions
+        ):
+            yield article
+        yield await asyncio.to_thread(
+            self._finish_sections, tasks, texts, transitions, cache_key, draft, params
+        )
+    
+    def _draft_params(self, theme, audience, length, style, key_messages):
+        """Parameters a draft was written for; changing any of them invalidates it"""
+        return {
+            "theme": theme,
+            "audience": audience,
+            "length": length,
+            "style": style,
+            "key_messages": key_messages
+        }
+    
+    def _format_article(self, article):
+        """Wrap generated article text with the success header"""
+        return f"✅ **Article Generated Successfully!**\n\n{article}"
+    
+    def _format_partial(self, article):
+        """Wrap partially streamed article text with the progress header"""
+        return f"⏳ **Generating Article...**\n\n{article}"
+    
+    def _format_error(self, error):
+        """Format an exception as a user-facing error message"""
+        if isinstance(error, CircuitOpenError):
+            return f"❌ **OpenAI is temporarily unavailable:** {str(error)}"
+        if isinstance(error, BudgetExceededError):
+            return f"❌ {str(error)}"
+        return f"❌ **Error generating article:** {str(error)}\n\nPlease check your OpenAI API key and try again."
+    
+    def generate_article(self, outline, theme, audience, length, style, key_messages,
+                         use_cache=True, sectioned=None, draft=None):
         """
         Generate a complete article from an approved outline using OpenAI
         
@@ -24,37 +193,164 @@ class ArticleGenerator:
             length (int): Desired word count
             style (str): Writing style description
             key_messages (str): Key messages to convey
+            use_cache (bool): Serve and store the result in the response cache
+            sectioned (bool): Write outline sections in parallel; None decides
+                automatically from the target length
+            draft (ArticleDraft): Sections from the previous version of this
+                article; only sections whose outline changed are regenerated,
+                and the draft is updated in place
             
         Returns:
             str: Generated article or error message
         """
         try:
-            # Format the article generation prompt
-            user_prompt = prompts.ARTICLE_GENERATION.format(
-                outline=outline,
-                theme=theme,
-                audience=audience,
-                length=length,
-                style=style,
-                key_messages=key_messages
+            tasks = self._plan_sections(outline, length, sectioned)
+            if tasks:
+                for article in self._write_sections(
+                    tasks, outline, theme, audience, length, style, key_messages, use_cache, draft
+                ):
+                    pass
+                return self._format_article(article)
+            
+            cache_key = self._cache_key(outline, theme, audience, length, style, key_messages, False)
+            if use_cache:
+                article = response_cache.get(cache_key)
+                if article is not None:
+                    return self._format_article(article)
+            
+            messages = self._build_messages(
+                outline, theme, audience, length, style, key_messages
             )
             
-            # Call OpenAI API with higher token limit for full articles
-            response = self.client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": prompts.SYSTEM_MESSAGE},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=2000,  # Higher limit for full articles
-                temperature=settings.TEMPERATURE
+            # Call OpenAI API with a token limit sized for the full article
+            article = self.llm.complete(messages, self._max_tokens(length), settings.TEMPERATURE, stage="article")
+            response_cache.set(cache_key, article)
+            
+            return self._format_article(article)
+            
+        except Exception as e:
+            return self._format_error(e)
+    
+    def generate_article_stream(self, outline, theme, audience, length, style, key_messages,
+                                use_cache=True, sectioned=None, draft=None):
+        """
+        Stream a complete article while OpenAI is still generating it
+        
+        Takes the same arguments as generate_article. Each yielded value is the
+        complete text received so far. Partial results carry a "⏳" header; the
+        final value carries the same "✅" header as generate_article. A cache
+        hit is yielded at once. In sectioned mode the article grows as
+        sections finish.
+        
+        Yields:
+            str: Partial article, final article or error message
+        """
+        article = ""
+        try:
+            tasks = self._plan_sections(outline, length, sectioned)
+            if tasks:
+                for article in self._write_sections(
+                    tasks, outline, theme, audience, length, style, key_messages, use_cache, draft
+                ):
+                    yield self._format_partial(article)
+                yield self._format_article(article)
+                return
+            
+            cache_key = self._cache_key(outline, theme, audience, length, style, key_messages, False)
+            if use_cache:
+                cached = response_cache.get(cache_key)
+                if cached is not None:
+                    yield self._format_article(cached)
+                    return
+            
+            messages = self._build_messages(
+                outline, theme, audience, length, style, key_messages
             )
             
-            article = response.choices[0].message.content
-            return f"✅ **Article Generated Successfully!**\n\n{article}"
+            for delta in self.llm.stream(messages, self._max_tokens(length), settings.TEMPERATURE, stage="article"):
+                article += delta
+                yield self._format_partial(article)
+            
+            response_cache.set(cache_key, article)
+            yield self._format_article(article)
             
         except Exception as e:
-            return f"❌ **Error generating article:** {str(e)}\n\nPlease check your OpenAI API key and try again."
+            yield self._format_error(e)
+    
+    async def agenerate_article(self, outline, theme, audience, length, style, key_messages,
+                                use_cache=True, sectioned=None, draft=None):
+        """
+        Async version of generate_article for use from an event loop
+        
+        Returns:
+            str: Generated article or error message
+        """
+        try:
+            tasks = self._plan_sections(outline, length, sectioned)
+            if tasks:
+                async for article in self._awrite_sections(
+                    tasks, outline, theme, audience, length, style, key_messages, use_cache, draft
+                ):
+                    pass
+                return self._format_article(article)
+            
+            cache_key = self._cache_key(outline, theme, audience, length, style, key_messages, False)
+            if use_cache:
+                article = await asyncio.to_thread(response_cache.get, cache_key)
+                if article is not None:
+                    return self._format_article(article)
+            
+            messages = self._build_messages(
+                outline, theme, audience, length, style, key_messages
+            )
+            
+            article = await self.llm.acomplete(messages, self._max_tokens(length), settings.TEMPERATURE, stage="article")
+            await asyncio.to_thread(response_cache.set, cache_key, article)
+            
+            return self._format_article(article)
+            
+        except Exception as e:
+            return self._format_error(e)
+    
+    async def agenerate_article_stream(self, outline, theme, audience, length, style, key_messages,
+                                       use_cache=True, sectioned=None, draft=None):
+        """
+        Async version of generate_article_stream for use from an event loop
+        
+        Yields:
+            str: Partial article, final article or error message
+        """
+        article = ""
+        try:
+            tasks = self._plan_sections(outline, length, sectioned)
+            if tasks:
+                async for article in self._awrite_sections(
+                    tasks, outline, theme, audience, length, style, key_messages, use_cache, draft
+                ):
+                    yield self._format_partial(article)
+                yield self._format_article(article)
+                return
+            
+            cache_key = self._cache_key(outline, theme, audience, length, style, key_messages, False)
+            if use_cache:
+                cached = await asyncio.to_thread(response_cache.get, cache_key)
+                if cached is not None:
+                    yield self._format_article(cached)
+                    return
+            
+            messages = self._build_messages(
+                outline, theme, audience, length, style, key_messages
+            )
+            
+            async for delta in self.llm.astream(messages, self._max_tokens(length), settings.TEMPERATURE, stage="article"):
+                article += delta
+                yield self._format_partial(article)
+            
+            await asyncio.to_thread(response_cache.set, cache_key, article)
+            yield self._format_article(article)
+            
+        except Exception as e:
+            yield self._format_error(e)
     
     def validate_api_connection(self):
         """
@@ -63,16 +359,26 @@ class ArticleGenerator:
         Returns:
             bool: True if connection is working, False otherwise
         """
-        try:
-            # Make a simple test call
-            response = self.client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=[{"role": "user", "content": "Test"}],
-                max_tokens=5
-            )
-            return True
-        except Exception:
-            return False
+        # Cached model lookup instead of a paid test completion
+        return get_health_probe().check()["ok"]
+
+# Global article generator instance, created on first use
+_article_generator = None
+
+def get_article_generator():
+    """
+    Get the global article generator, creating it on first use
+    
+    Returns:
+        ArticleGenerator: Shared article generator
+    """
+    global _article_generator
+    if _article_generator is None:
+        _article_generator = ArticleGenerator()
+    return _article_generator
 
-# Create global article generator instance
-article_generator = ArticleGenerator()
\ No newline at end of file
+def __getattr__(name):
+    """Keep `from src.ai.article_generator import article_generator` working"""
+    if name == "article_generator":
+        return get_article_generator()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,296 @@
+"""
+Circuit breaker around the OpenAI backends
+
+When OpenAI is degraded, every request would otherwise wait out the client
+timeout and its retries. Each provider gets a breaker that watches its
+recent attempts: once too many of them fail with outage errors (dropped
+connections, timeouts, 5xx) or are too slow, the breaker opens and requests
+fail at once with CircuitOpenError. After a cool-down it lets a single trial
+request through (half-open); the trial's outcome closes the breaker again or
+reopens it. Throttling (429) means OpenAI is up, so it neither trips the
+breaker nor counts as success; the rate limiter deals with it.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from config.settings import settings
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_TRANSITIONS = metrics.counter(
+    "story_circuit_transitions_total", "Circuit breaker state changes", ("breaker", "state")
+)
+CIRCUIT_REJECTIONS = metrics.counter(
+    "story_circuit_rejections_total", "Requests refused because the circuit was open", ("breaker",)
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+def outage_errors():
+    """
+    Errors that suggest the backend is down: dropped connections, timeouts and 5xx
+
+    Returns:
+        tuple: Exception classes
+    """
+    import openai
+
+    return (
+        openai.APIConnectionError,  # Includes APITimeoutError
+        openai.InternalServerError
+    )
+
+def throttling_errors():
+    """
+    Errors that only mean the backend is busy (429)
+
+    Returns:
+        tuple: Exception classes
+    """
+    import openai
+
+    return (openai.RateLimitError,)
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit is open"""
+
+    def __init__(self, breaker, retry_after):
+        """
+        Args:
+            breaker (str): Name of the breaker that refused the request
+            retry_after (float): Seconds until the next trial request
+        """
+        self.breaker = breaker
+        self.retry_after = retry_after
+        seconds = max(round(retry_after), 1)
+        super().__init__(
+            f"Requests to OpenAI are paused after repeated failures or slow responses. "
+            f"Please try again in {seconds} second{'' if seconds == 1 else 's'}."
+        )
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by recent error rate and latency"""
+
+    def __init__(self, name="primary", enabled=None, window=None, min_calls=None, failure_rate=None,
+                 slow_call_seconds=None, slow_call_rate=None, open_seconds=None):
+        """
+        Args:
+            name (str): Breaker name for metrics and messages
+            enabled (bool): Trip at all; a disabled breaker lets everything through
+            window (int): Recent attempts considered
+            min_calls (int): Attempts needed in the window before it can trip
+            failure_rate (float): Share of failed attempts that trips it
+            slow_call_seconds (float): Attempts at least this slow count as slow; 0 disables
+            slow_call_rate (float): Share of slow attempts that trips it
+            open_seconds (float): Cool-down before a trial request is let through
+        """
+        self.name = name
+        self.enabled = settings.CIRCUIT_BREAKER_ENABLED if enabled is None else enabled
+        self.min_calls = settings.CIRCUIT_MIN_CALLS if min_calls is None else min_calls
+        self.failure_rate = settings.CIRCUIT_FAILURE_RATE if failure_rate is None else failure_rate
+        self.slow_call_seconds = settings.CIRCUIT_SLOW_CALL_SECONDS if slow_call_seconds is None else slow_call_seconds
+        self.slow_call_rate = settings.CIRCUIT_SLOW_CALL_RATE if slow_call_rate is None else slow_call_rate
+        self.open_seconds = settings.CIRCUIT_OPEN_SECONDS if open_seconds is None else open_seconds
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=settings.CIRCUIT_WINDOW if window is None else window)  # (failed, slow)
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state):
+        """Switch state (caller holds the lock)"""
+        if state == self.state:
+            return
+        logger.log(logging.WARNING if state == OPEN else logging.INFO,
+                   "OpenAI circuit breaker %s: %s -> %s", self.name, self.state, state)
+        self.state = state
+        CIRCUIT_TRANSITIONS.inc(breaker=self.name, state=state)
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        elif state == CLOSED:
+            self._outcomes.clear()
+
+    def _retry_after(self):
+        """Seconds left in the cool-down (caller holds the lock)"""
+        return max(self.open_seconds - (time.monotonic() - self._opened_at), 0.0)
+
+    def allow(self):
+        """
+        Ask to send one request
+
+        Returns:
+            bool: True if the request is the half-open trial
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or a trial is already running
+        """
+        if not self.enabled:
+            return False
+        with self._lock:
+            if self.state == OPEN and not self._retry_after():
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return False
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            retry_after = self._retry_after() if self.state == OPEN else 1.0
+        CIRCUIT_REJECTIONS.inc(breaker=self.name)
+        raise CircuitOpenError(self.name, retry_after)
+
+    def record(self, trial, failed, latency):
+        """
+        Record the outcome of a request let through by allow()
+
+        Args:
+            trial (bool): What allow() returned
+            failed (bool): Whether it failed with an outage error
+            latency (float): Seconds it took
+        """
+        if not self.enabled:
+            return
+        bad = failed or bool(self.slow_call_seconds and latency >= self.slow_call_seconds)
+        with self._lock:
+            if trial:
+                self._trial_running = False
+                self._transition(OPEN if bad else CLOSED)
+                return
+            if self.state != CLOSED:
+                # Started before the circuit opened; the trial decides
+                return
+            self._outcomes.append((failed, bad and not failed))
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(failed for failed, _ in self._outcomes)
+            slow = sum(slow for _, slow in self._outcomes)
+            too_slow = self.slow_call_seconds and slow >= self.slow_call_rate * calls
+            if failures >= self.failure_rate * calls or too_slow:
+                self._transition(OPEN)
+
+    def release(self, trial):
+        """Give back a request that ended without an outcome, e.g. when cancelled"""
+        if trial:
+            with self._lock:
+                self._trial_running = False
+
+    def call(self, fn):
+        """
+        Run one blocking request attempt under the breaker
+
+        Args:
+            fn (callable): Sends the request
+
+        Returns:
+            The value fn returned
+        """
+        trial = self.allow()
+        started = time.perf_counter()
+        try:
+            result = fn()
+        except throttling_errors():
+            # OpenAI is up but busy; the rate limiter backs off, the breaker ignores it
+            self.release(trial)
+            raise
+        except outage_errors():
+            self.record(trial, True, time.perf_counter() - started)
+            raise
+        except Exception:
+            # The backend answered (bad request, auth, ...); that is not an outage
+            self.record(trial, False, time.perf_counter() - started)
+            raise
+        except BaseException:
+            self.release(trial)
+            raise
+        self.record(trial, False, time.perf_counter() - started)
+        return result
+
+    async def acall(self, fn):
+        """
+        Async version of call()
+
+        Args:
+            fn (callable): Returns an awaitable that sends the request
+
+        Returns:
+            The value the awaitable resolved to
+        """
+        trial = self.allow()
+        started = time.perf_counter()
+        try:
+            result = await fn()
+        except throttling_errors():
+            self.release(trial)
+            raise
+        except outage_errors():
+            self.record(trial, True, time.perf_counter() - started)
+            raise
+        except Exception:
+            self.record(trial, False, time.perf_counter() - started)
+            raise
+        except BaseException:
+            # Cancelled, e.g. a losing hedge
+            self.release(trial)
+            raise
+        self.record(trial, False, time.perf_counter() - started)
+        return result
+
+    def stats(self):
+        """
+        Current state for the health endpoint
+
+        Returns:
+            dict: State, recent attempts and failure/slow rates, and the
+                seconds until the next trial while open
+        """
+        with self._lock:
+            if self.state == OPEN and not self._retry_after():
+                self._transition(HALF_OPEN)
+            calls = len(self._outcomes)
+            stats = {
+                "state": self.state,
+                "recent_calls": calls,
+                "failure_rate": round(sum(failed for failed, _ in self._outcomes) / calls, 3) if calls else 0.0,
+                "slow_call_rate": round(sum(slow for _, slow in self._outcomes) / calls, 3) if calls else 0.0
+            }
+            if self.state == OPEN:
+                stats["retry_after"] = round(self._retry_after(), 1)
+        return stats
+
+# One breaker per provider, created on first use
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(name="primary"):
+    """
+    Get the breaker of a provider, creating it on first use
+
+    Args:
+        name (str): "primary" or "secondary"
+
+    Returns:
+        CircuitBreaker: Shared breaker for that provider
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+def circuit_breaker_stats():
+    """
+    State of every breaker in use
+
+    Returns:
+        dict: Breaker name -> CircuitBreaker.stats()
+    """
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.stats() for name, breaker in breakers.items()}
@@ -0,0 +1,141 @@
+"""
+Shared OpenAI clients for every generator
+
+The clients are created on first use (so importing a generator never needs an
+API key) and then reused, so the outline and article steps share one warm
+connection pool instead of opening their own.
+"""
+
+import importlib
+import logging
+import threading
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+_secondary_async_client = None
+
+def _http2_enabled():
+    """Return True if HTTP/2 is requested and the optional h2 package is installed"""
+    if not settings.OPENAI_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("OPENAI_HTTP2 is enabled but the 'h2' package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+def _httpx():
+    """
+    The httpx package the installed OpenAI SDK is built on
+    
+    Newer SDK releases moved to the httpx2 fork; pool and timeout objects
+    must come from the same package as the client they configure.
+    """
+    from openai import DefaultHttpxClient
+    
+    return importlib.import_module(DefaultHttpxClient.__mro__[1].__module__.partition(".")[0])
+
+def _http_options():
+    """Connection pool, keep-alive and timeout options for the HTTP client"""
+    httpx = _httpx()
+    
+    return {
+        "limits": httpx.Limits(
+            max_connections=settings.OPENAI_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY
+        ),
+        "timeout": httpx.Timeout(
+            settings.OPENAI_TIMEOUT,
+            connect=settings.OPENAI_CONNECT_TIMEOUT
+        ),
+        "http2": _http2_enabled()
+    }
+
+def _client_options():
+    """Keyword arguments shared by the sync and async OpenAI clients"""
+    return {
+        "api_key": settings.OPENAI_API_KEY,
+        "base_url": settings.OPENAI_BASE_URL,
+        # Retries are handled by the shared rate limiter, not the SDK
+        "max_retries": 0
+    }
+
+def get_openai_client():
+    """
+    Get the shared synchronous OpenAI client, creating it on first use
+    
+    Returns:
+        OpenAI: Client backed by a pooled, keep-alive HTTP connection pool
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                # openai is imported on first use to keep startup fast
+                from openai import OpenAI, DefaultHttpxClient
+                
+                _client = OpenAI(
+                    http_client=DefaultHttpxClient(**_http_options()),
+                    **_client_options()
+                )
+    return _client
+
+def get_async_openai_client():
+    """
+    Get the shared asynchronous OpenAI client, creating it on first use
+    
+    Returns:
+        AsyncOpenAI: Client backed by a pooled, keep-alive HTTP connection pool
+    """
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+                
+                _async_client = AsyncOpenAI(
+                    http_client=DefaultAsyncHttpxClient(**_http_options()),
+                    **_client_options()
+                )
+    return _async_client
+
+def get_secondary_async_client():
+    """
+    Get the async client for the secondary provider, creating it on first use
+    
+    Returns:
+        AsyncOpenAI: Client for OPENAI_SECONDARY_BASE_URL, or None if unset
+    """
+    global _secondary_async_client
+    if settings.OPENAI_SECONDARY_BASE_URL is None:
+        return None
+    if _secondary_async_client is None:
+        with _lock:
+            if _secondary_async_client is None:
+                from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+                
+                _secondary_async_client = AsyncOpenAI(
+                    http_client=DefaultAsyncHttpxClient(**_http_options()),
+                    **{
+                        **_client_options(),
+                        "api_key": settings.OPENAI_SECONDARY_API_KEY,
+                        "base_url": settings.OPENAI_SECONDARY_BASE_URL
+                    }
+                )
+    return _secondary_async_client
+
+def close_clients():
+    """Close the shared sync client and forget all, e.g. after changing settings"""
+    global _client, _async_client, _secondary_async_client
+    with _lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _async_client = None
+        _secondary_async_client = None
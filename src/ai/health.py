@@ -0,0 +1,87 @@
+"""
+Cheap, cached health probe for the OpenAI backend
+
+Looks up the configured model (GET /models/{model}), which checks the
+endpoint, the API key and the model name without spending tokens. The
+result is cached for a short TTL, so the health endpoint and connection
+checks can be polled freely.
+"""
+
+import logging
+import threading
+import time
+from config.settings import settings
+from src.ai.client_factory import get_openai_client
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PROBES = metrics.counter("story_openai_health_probes_total", "OpenAI health probes by result", ("result",))
+
+class HealthProbe:
+    """Checks that OpenAI answers, at most once per TTL"""
+
+    def __init__(self, ttl=None, timeout=None):
+        """
+        Args:
+            ttl (float): Seconds a probe result is reused
+            timeout (float): Seconds before a probe counts as failed
+        """
+        self.ttl = settings.HEALTH_PROBE_TTL if ttl is None else ttl
+        self.timeout = settings.HEALTH_PROBE_TIMEOUT if timeout is None else timeout
+        self._result = None
+        self._checked_at = 0.0
+        # Held while probing, so concurrent callers wait for one probe
+        self._lock = threading.Lock()
+
+    def check(self, force=False):
+        """
+        Probe OpenAI, or return the cached result while it is fresh
+
+        Args:
+            force (bool): Probe even if the cached result is fresh
+
+        Returns:
+            dict: ok (bool), latency (seconds), error (str or None),
+                checked_at (UNIX time) and age (seconds since the probe)
+        """
+        with self._lock:
+            if force or self._result is None or time.monotonic() - self._checked_at >= self.ttl:
+                self._result = self._probe()
+                self._checked_at = time.monotonic()
+            return {**self._result, "age": round(time.monotonic() - self._checked_at, 1)}
+
+    def _probe(self):
+        """Look up the configured model once"""
+        started = time.perf_counter()
+        error = None
+        try:
+            get_openai_client().models.retrieve(settings.OPENAI_MODEL, timeout=self.timeout)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            logger.warning("OpenAI health probe failed: %s", error)
+        HEALTH_PROBES.inc(result="ok" if error is None else "error")
+        return {
+            "ok": error is None,
+            "latency": round(time.perf_counter() - started, 3),
+            "error": error,
+            "checked_at": round(time.time(), 1)
+        }
+
+# Global health probe, created on first use
+_health_probe = None
+_health_probe_lock = threading.Lock()
+
+def get_health_probe():
+    """
+    Get the shared health probe, creating it on first use
+
+    Returns:
+        HealthProbe: Probe shared by the health endpoint and the generators
+    """
+    global _health_probe
+    if _health_probe is None:
+        with _health_probe_lock:
+            if _health_probe is None:
+                _health_probe = HealthProbe()
+    return _health_probe
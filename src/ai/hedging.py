@@ -0,0 +1,215 @@
+"""
+Hedged requests for the async OpenAI calls
+
+A call that is still running when it passes a high percentile of recent
+latencies for its stage gets a duplicate: to the same endpoint, or to the
+secondary OpenAI-compatible provider when one is configured. Whichever
+answers first wins and the other is cancelled. A cap on the share of hedged
+calls keeps a slow provider from doubling the load. When the original call
+fails with a transient error (or the primary's circuit is open) and a
+secondary provider exists, the call fails over to it.
+
+Streams are hedged on time to first token.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import deque
+from config.settings import settings
+from src.ai.circuit_breaker import CircuitOpenError
+from src.ai.rate_limiter import retryable_errors
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+HEDGES = metrics.counter("story_openai_hedges_total", "Duplicate requests sent for slow calls", ("stage", "target"))
+HEDGES_CAPPED = metrics.counter(
+    "story_openai_hedges_capped_total", "Slow calls not hedged because of the hedge-rate cap", ("stage",)
+)
+HEDGE_WINS = metrics.counter(
+    "story_openai_hedge_wins_total", "Which request answered first in hedged calls", ("stage", "winner")
+)
+FAILOVERS = metrics.counter(
+    "story_openai_failovers_total", "Calls retried on the secondary provider after the primary failed", ("stage",)
+)
+
+def percentile(values, q):
+    """
+    Nearest-rank percentile
+
+    Args:
+        values (iterable): Samples
+        q (float): Percentile between 0 and 100
+
+    Returns:
+        float: The percentile, or None without samples
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered), max(1, math.ceil(q / 100 * len(ordered)))) - 1
+    return ordered[index]
+
+class HedgePolicy:
+    """Decides when to hedge, from recent latencies and the hedge-rate cap"""
+
+    def __init__(self, enabled=None, percentile=None, min_delay=None, max_rate=None,
+                 min_samples=None, window=200):
+        """
+        Args:
+            enabled (bool): Send hedges at all (failover works either way)
+            percentile (float): Latency percentile after which a call is hedged
+            min_delay (float): Never hedge sooner than this many seconds
+            max_rate (float): Largest share of recent calls that may be hedged
+            min_samples (int): Latencies needed per stage before hedging starts
+            window (int): Recent calls remembered per stage and for the cap
+        """
+        self.enabled = settings.HEDGE_ENABLED if enabled is None else enabled
+        self.percentile = settings.HEDGE_PERCENTILE if percentile is None else percentile
+        self.min_delay = settings.HEDGE_MIN_DELAY if min_delay is None else min_delay
+        self.max_rate = settings.HEDGE_MAX_RATE if max_rate is None else max_rate
+        self.min_samples = settings.HEDGE_MIN_SAMPLES if min_samples is None else min_samples
+        self.window = window
+        self._latencies = {}  # stage -> deque of seconds
+        self._decisions = deque(maxlen=window)  # True for each recent hedged call
+        self._lock = threading.Lock()
+
+    def delay(self, stage):
+        """
+        Seconds after which a call of this stage should be hedged
+
+        Returns:
+            float: The delay, or None if hedging is off or still warming up
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            samples = self._latencies.get(stage)
+            if not samples or len(samples) < self.min_samples:
+                return None
+            return max(self.min_delay, percentile(samples, self.percentile))
+
+    def allow_hedge(self):
+        """
+        Whether one more hedge keeps the recent hedge rate under the cap
+
+        Returns:
+            bool: True if the hedge may be sent
+        """
+        with self._lock:
+            calls = len(self._decisions) + 1
+            return sum(self._decisions) + 1 <= self.max_rate * calls
+
+    def observe(self, stage, latency, hedged):
+        """
+        Record a finished call
+
+        Args:
+            stage (str): Pipeline stage
+            latency (float): Seconds until the answer (or first token)
+            hedged (bool): Whether a duplicate was sent
+        """
+        with self._lock:
+            samples = self._latencies.get(stage)
+            if samples is None:
+                samples = self._latencies[stage] = deque(maxlen=self.window)
+            samples.append(latency)
+            self._decisions.append(hedged)
+
+def _settle_loser(task, discard):
+    """Collect a losing attempt: retrieve its error, release its result"""
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is None and discard is not None:
+        asyncio.ensure_future(discard(task.result()))
+
+async def hedged_call(stage, attempt, has_secondary, policy=None, discard=None):
+    """
+    Run an attempt, hedging it when it is slow and failing over when it fails
+
+    Args:
+        stage (str): Pipeline stage, selects the latency history
+        attempt (callable): Takes secondary (bool) and returns an awaitable
+            that performs one request against that provider
+        has_secondary (bool): Whether a secondary provider is configured
+        policy (HedgePolicy): Defaults to the shared policy
+        discard (callable): Async cleanup for the result of an attempt that
+            finished but lost, e.g. closing a stream
+
+    Returns:
+        tuple: (result, secondary) where secondary tells which provider answered
+    """
+    policy = policy or get_hedge_policy()
+    started = time.perf_counter()
+    tasks = {asyncio.ensure_future(attempt(False)): ("original", False)}
+    delay = policy.delay(stage)
+    hedged = failed_over = False
+    try:
+        while tasks:
+            timeout = None
+            if delay is not None and not hedged:
+                timeout = max(delay - (time.perf_counter() - started), 0)
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                # The original is slower than the hedge threshold
+                delay = None
+                if not policy.allow_hedge():
+                    HEDGES_CAPPED.inc(stage=stage)
+                    continue
+                hedged = True
+                HEDGES.inc(stage=stage, target="secondary" if has_secondary else "primary")
+                logger.info("Hedging slow %s call after %.2fs", stage, time.perf_counter() - started)
+                tasks[asyncio.ensure_future(attempt(has_secondary))] = ("hedge", has_secondary)
+                continue
+
+            error = None
+            for task in done:
+                role, secondary = tasks.pop(task)
+                if task.exception() is None:
+                    if hedged or failed_over:
+                        HEDGE_WINS.inc(stage=stage, winner=role)
+                    if not failed_over:
+                        # Failovers include the primary's retries; keep them out of the history
+                        policy.observe(stage, time.perf_counter() - started, hedged)
+                    return task.result(), secondary
+                error = task.exception()
+                logger.warning("%s %s request failed: %s", stage, role, error)
+
+            if not tasks:
+                transient = isinstance(error, retryable_errors() + (CircuitOpenError,))
+                if has_secondary and not (hedged or failed_over) and transient:
+                    # Primary gave up on a transient error after its own
+                    # retries, or its circuit is open; try the other provider
+                    failed_over = True
+                    delay = None
+                    FAILOVERS.inc(stage=stage)
+                    tasks[asyncio.ensure_future(attempt(True))] = ("failover", True)
+                    continue
+                raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+            task.add_done_callback(lambda task: _settle_loser(task, discard))
+
+# Global hedge policy, created on first use
+_hedge_policy = None
+_hedge_policy_lock = threading.Lock()
+
+def get_hedge_policy():
+    """
+    Get the shared hedge policy, creating it on first use
+
+    Returns:
+        HedgePolicy: Policy shared by all async calls
+    """
+    global _hedge_policy
+    if _hedge_policy is None:
+        with _hedge_policy_lock:
+            if _hedge_policy is None:
+                _hedge_policy = HedgePolicy()
+    return _hedge_policy
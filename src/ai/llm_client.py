@@ -0,0 +1,478 @@
+"""
+Thin wrapper around the OpenAI chat completions API shared by the generators
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import hashlib
+import json
+import logging
+import threading
+import time
+from config.settings import settings
+from src.ai.circuit_breaker import get_circuit_breaker
+from src.ai.client_factory import get_openai_client, get_async_openai_client, get_secondary_async_client
+from src.ai.hedging import hedged_call
+from src.ai.rate_limiter import rate_limiter
+from src.ai.single_flight import single_flight, async_single_flight
+from src.ai.usage_ledger import cached_prompt_tokens, get_usage_ledger
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+OPENAI_REQUESTS = metrics.counter(
+    "story_openai_requests_total", "OpenAI chat completion calls", ("model", "stage", "outcome")
+)
+OPENAI_ERRORS = metrics.counter(
+    "story_openai_errors_total", "Failed OpenAI calls by exception class", ("model", "stage", "error")
+)
+OPENAI_LATENCY = metrics.histogram(
+    "story_openai_request_seconds", "OpenAI call latency including retries", ("model", "stage", "outcome")
+)
+OPENAI_FIRST_TOKEN = metrics.histogram(
+    "story_openai_first_token_seconds", "Time until a streamed call returned its first text", ("model", "stage")
+)
+OPENAI_TOKENS = metrics.counter(
+    "story_openai_tokens_total", "Tokens reported by the OpenAI API", ("model", "kind")
+)
+# kind="cached" counts prompt tokens served from the provider's prompt cache;
+# they are also included in kind="prompt"
+PROMPT_BUILD = metrics.histogram(
+    "story_prompt_build_seconds", "Time spent formatting prompts", ("stage",)
+)
+
+# Usage totals for the current context (thread or asyncio task), if tracked
+_current_usage = contextvars.ContextVar("llm_usage", default=None)
+
+# Who and what the calls in the current context are for (username, structure_type)
+_call_context = contextvars.ContextVar("llm_call_context", default={})
+
+class UsageTotals:
+    """Token usage accumulated across the calls made inside track_usage()"""
+    
+    def __init__(self):
+        """Start all counters at zero"""
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0  # Prompt tokens served from the prompt cache
+        self._lock = threading.Lock()
+    
+    @property
+    def total_tokens(self):
+        """Prompt plus completion tokens"""
+        return self.prompt_tokens + self.completion_tokens
+    
+    def add(self, usage):
+        """
+        Add the usage block of one API response
+        
+        Args:
+            usage: The `usage` object of a chat completion (may be None)
+        """
+        with self._lock:
+            self.calls += 1
+            if usage is not None:
+                self.prompt_tokens += usage.prompt_tokens or 0
+                self.completion_tokens += usage.completion_tokens or 0
+                self.cached_tokens += cached_prompt_tokens(usage)
+
+@contextlib.contextmanager
+def track_usage():
+    """
+    Collect token usage for every LLM call made in this context
+    
+    The totals follow the current thread or asyncio task, so concurrent
+    callers each see only their own calls. Worker threads must run with a
+    copy of the caller's context to be included.
+    
+    Yields:
+        UsageTotals: Counters updated as calls complete
+    """
+    totals = UsageTotals()
+    token = _current_usage.set(totals)
+    try:
+        yield totals
+    finally:
+        _current_usage.reset(token)
+
+@contextlib.contextmanager
+def call_context(**values):
+    """
+    Attribute the LLM calls made in this context to a user and story
+    
+    The values (username, structure_type) are written to the usage ledger
+    with every call, and username selects the daily budget checked before
+    each call. Like track_usage(), they follow the current thread or
+    asyncio task.
+    """
+    token = _call_context.set({**_call_context.get(), **values})
+    try:
+        yield
+    finally:
+        try:
+            _call_context.reset(token)
+        except ValueError:
+            # An abandoned async generator is closed from another context
+            pass
+
+def current_username():
+    """Signed-in user the calls in the current context are for, or None"""
+    return _call_context.get().get("username")
+
+def _record_usage(usage):
+    """Add a response's usage to the active tracker, if any"""
+    totals = _current_usage.get()
+    if totals is not None:
+        totals.add(usage)
+
+async def _chain(received, chunks):
+    """Chunks already read while opening a stream, then the rest of it"""
+    for chunk in received:
+        yield chunk
+    async for chunk in chunks:
+        yield chunk
+
+class LLMClient:
+    """Runs chat completions through the sync or async OpenAI client"""
+    
+    @property
+    def client(self):
+        """Shared synchronous OpenAI client"""
+        return get_openai_client()
+    
+    @property
+    def async_client(self):
+        """Shared asynchronous OpenAI client"""
+        return get_async_openai_client()
+    
+    def _request_args(self, messages, max_tokens, temperature, response_format=None):
+        """Build keyword arguments for chat.completions.create"""
+        args = {
+            "model": settings.OPENAI_MODEL,
+            "messages": messages,
+            "max_tokens": max_tokens
+        }
+        if temperature is not None:
+            args["temperature"] = temperature
+        if response_format is not None:
+            args["response_format"] = response_format
+        return args
+    
+    def _stream_args(self, messages, max_tokens, temperature):
+        """Build keyword arguments for a streaming request that reports usage"""
+        args = self._request_args(messages, max_tokens, temperature)
+        args["stream"] = True
+        args["stream_options"] = {"include_usage": True}
+        return args
+    
+    def _handle_raw(self, raw):
+        """Feed rate-limit headers to the scheduler and parse the response"""
+        rate_limiter.update_from_headers(raw.headers)
+        return raw.parse()
+    
+    def _settle(self, cost, usage, secondary=False):
+        """Record usage and correct the scheduler's token estimate"""
+        _record_usage(usage)
+        # The secondary provider's usage does not count against the primary's limits
+        rate_limiter.settle(cost, usage.total_tokens if usage is not None and not secondary else None)
+        if usage is not None:
+            model = self._model(secondary)
+            OPENAI_TOKENS.inc(usage.prompt_tokens or 0, model=model, kind="prompt")
+            OPENAI_TOKENS.inc(usage.completion_tokens or 0, model=model, kind="completion")
+            OPENAI_TOKENS.inc(cached_prompt_tokens(usage), model=model, kind="cached")
+    
+    def _model(self, secondary=False):
+        """Model name used on the primary or secondary provider"""
+        return settings.OPENAI_SECONDARY_MODEL if secondary else settings.OPENAI_MODEL
+    
+    def _check_budget(self):
+        """Refuse the call if the current user has used up today's budget"""
+        ledger = get_usage_ledger()
+        if ledger is not None:
+            ledger.check_budget(current_username())
+    
+    async def _acheck_budget(self):
+        """Async version of _check_budget; a SQLite lookup runs on a worker thread"""
+        ledger = get_usage_ledger()
+        if ledger is not None and ledger.daily_budget:
+            await asyncio.to_thread(ledger.check_budget, current_username())
+    
+    def _observe(self, stage, started, error=None, usage=None, secondary=False):
+        """Record the outcome and latency of one call, retries included"""
+        model = self._model(secondary)
+        outcome = "ok" if error is None else "error"
+        latency = time.perf_counter() - started
+        OPENAI_REQUESTS.inc(model=model, stage=stage, outcome=outcome)
+        OPENAI_LATENCY.observe(latency, model=model, stage=stage, outcome=outcome)
+        if error is not None:
+            OPENAI_ERRORS.inc(model=model, stage=stage, error=type(error).__name__)
+        
+        ledger = get_usage_ledger()
+        if ledger is not None:
+            context = _call_context.get()
+            try:
+                ledger.record(
+                    model, stage, usage, latency, outcome,
+                    username=context.get("username"), structure_type=context.get("structure_type")
+                )
+            except Exception as e:
+                # Bookkeeping must never fail a generation
+                logger.warning("Could not write usage ledger entry: %s", e)
+    
+    def _observe_first_token(self, stage, started, secondary=False):
+        """Record the time until a stream produced its first text"""
+        OPENAI_FIRST_TOKEN.observe(time.perf_counter() - started, model=self._model(secondary), stage=stage)
+    
+    def _create(self, args):
+        """Send one blocking request attempt through the circuit breaker"""
+        return get_circuit_breaker().call(
+            lambda: self._handle_raw(self.client.chat.completions.with_raw_response.create(**args))
+        )
+    
+    async def _acreate(self, args, cost, secondary):
+        """
+        Send one async request to the primary or secondary provider
+        
+        The secondary provider has its own quota, so its requests bypass the
+        primary's scheduler and retries. Each provider has its own circuit
+        breaker, checked on every attempt.
+        """
+        request = {**args, "model": self._model(secondary)}
+        if secondary:
+            return await get_circuit_breaker("secondary").acall(
+                lambda: get_secondary_async_client().chat.completions.create(**request)
+            )
+        
+        async def call():
+            raw = await self.async_client.chat.completions.with_raw_response.create(**request)
+            return self._handle_raw(raw)
+        
+        breaker = get_circuit_breaker()
+        return await rate_limiter.arun(lambda: breaker.acall(call), cost)
+    
+    async def _aopen_stream(self, args, cost, secondary):
+        """
+        Open a stream and read up to its first text, so hedges race on time to first token
+        
+        Returns:
+            tuple: (stream, chunk iterator, chunks read so far)
+        """
+        stream = await self._acreate(args, cost, secondary)
+        chunks = stream.__aiter__()
+        received = []
+        try:
+            async for chunk in chunks:
+                received.append(chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    break
+        except BaseException as e:
+            # Also runs when a losing hedge is cancelled
+            await stream.close()
+            if isinstance(e, asyncio.CancelledError) and not secondary:
+                rate_limiter.settle(cost, 0)
+            raise
+        return stream, chunks, received
+    
+    @staticmethod
+    async def _close_stream(opened):
+        """Close the stream of an attempt that finished but lost the race"""
+        await opened[0].close()
+    
+    def _flight_key(self, args):
+        """
+        Key identifying identical requests for single-flight coalescing
+        
+        Whitespace in message contents is collapsed, so prompts that differ
+        only in spacing or line breaks share an upstream request.
+        """
+        normalized = {
+            **args,
+            "messages": [
+                {**message, "content": " ".join(str(message.get("content", "")).split())}
+                for message in args["messages"]
+            ]
+        }
+        encoded = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+    
+    def complete(self, messages, max_tokens, temperature=None, response_format=None, stage="other"):
+        """
+        Run a blocking chat completion
+        
+        Identical calls already in flight are joined instead of repeated
+        (see src.ai.single_flight).
+        
+        Args:
+            messages (list): Chat messages
+            max_tokens (int): Completion token limit
+            temperature (float): Sampling temperature, or None for the API default
+            response_format (dict): Optional output format, e.g. {"type": "json_object"}
+            stage (str): Pipeline stage the call belongs to, for metrics
+            
+        Returns:
+            str: Generated text
+        """
+        self._check_budget()
+        args = self._request_args(messages, max_tokens, temperature, response_format)
+        if not settings.COALESCE_REQUESTS:
+            return self._complete(args, stage)
+        return single_flight.call(self._flight_key(args), lambda: self._complete(args, stage), stage)
+    
+    def _complete(self, args, stage):
+        """Send one blocking chat completion upstream"""
+        cost = rate_limiter.estimate_tokens(args["messages"], args["max_tokens"])
+        
+        started = time.perf_counter()
+        try:
+            response = rate_limiter.run(lambda: self._create(args), cost)
+        except Exception as e:
+            self._observe(stage, started, e)
+            raise
+        self._settle(cost, response.usage)
+        self._observe(stage, started, usage=response.usage)
+        return response.choices[0].message.content
+    
+    def stream(self, messages, max_tokens, temperature=None, stage="other"):
+        """
+        Run a streaming chat completion
+        
+        A caller joining an identical stream already in flight first receives
+        the text produced so far, then the live deltas.
+        
+        Yields:
+            str: Text deltas in the order they arrive
+        """
+        self._check_budget()
+        args = self._stream_args(messages, max_tokens, temperature)
+        if not settings.COALESCE_REQUESTS:
+            yield from self._stream(args, stage)
+            return
+        yield from single_flight.stream(self._flight_key(args), lambda: self._stream(args, stage), stage)
+    
+    def _stream(self, args, stage):
+        """Read one streaming chat completion from upstream"""
+        cost = rate_limiter.estimate_tokens(args["messages"], args["max_tokens"])
+        
+        started = time.perf_counter()
+        first_token = True
+        usage = None
+        try:
+            stream = rate_limiter.run(lambda: self._create(args), cost)
+            try:
+                for chunk in stream:
+                    if chunk.usage is not None:
+                        usage = chunk.usage
+                        self._settle(cost, usage)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if first_token:
+                            self._observe_first_token(stage, started)
+                            first_token = False
+                        yield delta
+            finally:
+                # Also runs when the consumer stops early (GeneratorExit)
+                stream.close()
+                if usage is None:
+                    rate_limiter.settle(cost, 0)
+        except Exception as e:
+            self._observe(stage, started, e, usage)
+            raise
+        self._observe(stage, started, usage=usage)
+    
+    async def acomplete(self, messages, max_tokens, temperature=None, response_format=None, stage="other"):
+        """
+        Run a chat completion without blocking the event loop
+        
+        Identical calls already in flight are joined, slow calls are hedged
+        and failed calls fail over to the secondary provider (see
+        src.ai.single_flight and src.ai.hedging).
+        
+        Returns:
+            str: Generated text
+        """
+        await self._acheck_budget()
+        args = self._request_args(messages, max_tokens, temperature, response_format)
+        if not settings.COALESCE_REQUESTS:
+            return await self._acomplete(args, stage)
+        return await async_single_flight.call(self._flight_key(args), lambda: self._acomplete(args, stage), stage)
+    
+    async def _acomplete(self, args, stage):
+        """Send one async chat completion upstream, hedged"""
+        cost = rate_limiter.estimate_tokens(args["messages"], args["max_tokens"])
+        
+        started = time.perf_counter()
+        try:
+            response, secondary = await hedged_call(
+                stage, lambda secondary: self._acreate(args, cost, secondary),
+                settings.OPENAI_SECONDARY_BASE_URL is not None
+            )
+        except Exception as e:
+            self._observe(stage, started, e)
+            raise
+        self._settle(cost, response.usage, secondary)
+        self._observe(stage, started, usage=response.usage, secondary=secondary)
+        return response.choices[0].message.content
+    
+    async def astream(self, messages, max_tokens, temperature=None, stage="other"):
+        """
+        Run a streaming chat completion without blocking the event loop
+        
+        Identical streams in flight are shared like stream(), and streams slow
+        to produce their first text are hedged like acomplete().
+        
+        Yields:
+            str: Text deltas in the order they arrive
+        """
+        await self._acheck_budget()
+        args = self._stream_args(messages, max_tokens, temperature)
+        if settings.COALESCE_REQUESTS:
+            deltas = async_single_flight.stream(self._flight_key(args), lambda: self._astream(args, stage), stage)
+        else:
+            deltas = self._astream(args, stage)
+        try:
+            async for delta in deltas:
+                yield delta
+        finally:
+            await deltas.aclose()
+    
+    async def _astream(self, args, stage):
+        """Read one async streaming chat completion from upstream, hedged"""
+        cost = rate_limiter.estimate_tokens(args["messages"], args["max_tokens"])
+        
+        started = time.perf_counter()
+        first_token = True
+        usage = None
+        secondary = False
+        try:
+            (stream, chunks, received), secondary = await hedged_call(
+                stage, lambda secondary: self._aopen_stream(args, cost, secondary),
+                settings.OPENAI_SECONDARY_BASE_URL is not None, discard=self._close_stream
+            )
+            try:
+                async for chunk in _chain(received, chunks):
+                    if chunk.usage is not None:
+                        usage = chunk.usage
+                        self._settle(cost, usage, secondary)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if first_token:
+                            self._observe_first_token(stage, started, secondary)
+                            first_token = False
+                        yield delta
+            finally:
+                await stream.close()
+                if usage is None and not secondary:
+                    rate_limiter.settle(cost, 0)
+        except Exception as e:
+            self._observe(stage, started, e, usage, secondary)
+            raise
+        self._observe(stage, started, usage=usage, secondary=secondary)
+
+# Create global LLM client instance shared by all generators
+llm_client = LLMClient()
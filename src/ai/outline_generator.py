@@ -2,18 +2,184 @@
 Outline generation functionality using OpenAI
 """
 
-from openai import OpenAI
+import asyncio
+import logging
 from config.settings import settings
 from config.prompts import prompts
+from src.ai.circuit_breaker import CircuitOpenError
+from src.ai.health import get_health_probe
+from src.ai.llm_client import current_username, llm_client, PROMPT_BUILD
+from src.ai.outline_sections import Outline
+from src.ai.response_cache import response_cache
+from src.ai.similar_outlines import get_similar_outline_index
+from src.ai.usage_ledger import BudgetExceededError
+
+logger = logging.getLogger(__name__)
+
+# Model name prefixes that accept response_format={"type": "json_object"}
+JSON_MODE_MODELS = ("gpt-3.5-turbo", "gpt-4-turbo", "gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+
+def json_mode_enabled():
+    """
+    Check whether non-streaming outline calls should use JSON mode
+    
+    Returns:
+        bool: True if OUTLINE_JSON_MODE is on, or "auto" with a supported model
+    """
+    if settings.OUTLINE_JSON_MODE == "auto":
+        return settings.OPENAI_MODEL.startswith(JSON_MODE_MODELS)
+    return settings.OUTLINE_JSON_MODE in ("true", "on", "1")
 
 class OutlineGenerator:
     """Handles AI-powered outline generation"""
     
     def __init__(self):
-        """Initialize the OpenAI client"""
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        """Initialize the generator with the shared LLM client"""
+        self.llm = llm_client
+    
+    def _build_messages(self, structure_type, theme, audience, length, style, key_messages, json_mode=False):
+        """
+        Build the chat messages for an outline request
+        
+        Args:
+            json_mode (bool): Ask for the JSON outline format
+        
+        Returns:
+            list: Messages for the chat completions API
+        """
+        # Get the appropriate prompt template for the selected structure
+        with PROMPT_BUILD.time(stage="outline"):
+            user_prompt = prompts.get_outline_prompt(
+                structure_type, theme, audience, length, style, key_messages, json_format=json_mode
+            )
+        
+        return [
+            {"role": "system", "content": prompts.SYSTEM_MESSAGE},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _cache_key(self, structure_type, theme, audience, length, style, key_messages, json_mode=False):
+        """
+        Build the response cache key for an outline request
+        
+        Args:
+            json_mode (bool): Whether the request asks for the JSON outline
+                format; JSON-mode and markdown results are cached separately
+        """
+        template = prompts.OUTLINE_TEMPLATES.get(
+            structure_type, prompts.OUTLINE_TEMPLATES["personal_journey"]
+        )
+        if json_mode:
+            template += prompts.OUTLINE_JSON_FORMAT
+        params = {
+            "structure_type": structure_type,
+            "theme": theme,
+            "audience": audience,
+            "length": length,
+            "style": style,
+            "key_messages": key_messages,
+            "json_mode": json_mode
+        }
+        return response_cache.make_key("outline", params, template, settings.MAX_TOKENS)
+    
+    def _response_format(self, json_mode):
+        """response_format for a non-streaming outline call"""
+        return {"type": "json_object"} if json_mode else None
+    
+    def _parse_outline(self, raw, json_mode):
+        """
+        Turn model output into outline markdown
+        
+        JSON-mode output is rendered into the numbered markdown format the
+        section parser reads back; anything that does not parse is kept as is.
+        
+        Returns:
+            str: Outline markdown
+        """
+        if not json_mode:
+            return raw
+        try:
+            return Outline.from_json(raw).to_markdown()
+        except ValueError as e:
+            logger.warning("Could not parse JSON outline (%s); keeping the raw text", e)
+            return raw
+    
+    def _find_similar(self, structure_type, theme, audience, key_messages):
+        """
+        Look for an earlier outline generated for near-identical parameters
+        
+        Returns:
+            str: The earlier outline formatted for display, or None
+        """
+        index = get_similar_outline_index()
+        if index is None:
+            return None
+        try:
+            match = index.find(structure_type, theme, audience, key_messages, current_username())
+        except Exception as e:
+            logger.warning("Similar outline lookup failed: %s", e)
+            return None
+        if match is None:
+            return None
+        return self._format_reused(structure_type, match)
+    
+    def _store(self, cache_key, structure_type, theme, audience, key_messages, outline):
+        """Keep a fresh outline in the response cache and the similar-outline index"""
+        response_cache.set(cache_key, outline)
+        index = get_similar_outline_index()
+        if index is not None:
+            try:
+                index.add(structure_type, theme, audience, key_messages, outline, current_username())
+            except Exception as e:
+                logger.warning("Could not index outline for reuse: %s", e)
+    
+    def _format_outline(self, structure_type, outline):
+        """
+        Wrap generated outline text with the success header
+        
+        Args:
+            structure_type (str): Selected story structure type
+            outline (str): Raw outline text from the model
+            
+        Returns:
+            str: Outline formatted for display
+        """
+        # Get the structure name for display
+        structure_name = prompts.STORY_STRUCTURES.get(structure_type, "Personal Journey")
+        
+        return f"✅ **Outline Generated Successfully!**\n\n**Structure Used:** {structure_name}\n\n{outline}"
+    
+    def _format_reused(self, structure_type, match):
+        """
+        Wrap an outline reused from a similar earlier request with its header
+        
+        Args:
+            structure_type (str): Selected story structure type
+            match (SimilarOutline): The earlier outline and how similar its request was
+            
+        Returns:
+            str: Outline formatted for display
+        """
+        structure_name = prompts.STORY_STRUCTURES.get(structure_type, "Personal Journey")
+        
+        return (
+            f"✅ **Reused a Similar Outline** ({match.similarity:.0%} match with one of your earlier requests; "
+            f"force fresh generation for a new one)\n\n**Structure Used:** {structure_name}\n\n{match.outline}"
+        )
+    
+    def _format_partial(self, outline):
+        """Wrap partially streamed outline text with the progress header"""
+        return f"⏳ **Generating Outline...**\n\n{outline}"
     
-    def generate_outline(self, structure_type, theme, audience, length, style, key_messages):
+    def _format_error(self, error):
+        """Format an exception as a user-facing error message"""
+        if isinstance(error, CircuitOpenError):
+            return f"❌ **OpenAI is temporarily unavailable:** {str(error)}"
+        if isinstance(error, BudgetExceededError):
+            return f"❌ {str(error)}"
+        return f"❌ **Error generating outline:** {str(error)}\n\nPlease check your OpenAI API key and try again."
+    
+    def generate_outline(self, structure_type, theme, audience, length, style, key_messages, use_cache=True):
         """
         Generate a detailed story outline using OpenAI with selected structure
         
@@ -24,36 +190,145 @@ class OutlineGenerator:
             length (int): Desired word count
             style (str): Writing style description
             key_messages (str): Key messages to convey
+            use_cache (bool): Serve cached or near-duplicate earlier outlines and store the result
             
         Returns:
             str: Generated outline or error message
         """
         try:
-            # Get the appropriate prompt template for the selected structure
-            user_prompt = prompts.get_outline_prompt(
-                structure_type, theme, audience, length, style, key_messages
+            json_mode = json_mode_enabled()
+            cache_key = self._cache_key(structure_type, theme, audience, length, style, key_messages, json_mode)
+            if use_cache:
+                outline = response_cache.get(cache_key)
+                if outline is not None:
+                    return self._format_outline(structure_type, outline)
+                reused = self._find_similar(structure_type, theme, audience, key_messages)
+                if reused is not None:
+                    return reused
+            
+            messages = self._build_messages(
+                structure_type, theme, audience, length, style, key_messages, json_mode
             )
             
             # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": prompts.SYSTEM_MESSAGE},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=settings.MAX_TOKENS,
-                temperature=settings.TEMPERATURE
+            raw = self.llm.complete(
+                messages, settings.MAX_TOKENS, settings.TEMPERATURE, self._response_format(json_mode),
+                stage="outline"
+            )
+            outline = self._parse_outline(raw, json_mode)
+            self._store(cache_key, structure_type, theme, audience, key_messages, outline)
+            
+            return self._format_outline(structure_type, outline)
+            
+        except Exception as e:
+            return self._format_error(e)
+    
+    def generate_outline_stream(self, structure_type, theme, audience, length, style, key_messages, use_cache=True):
+        """
+        Stream a story outline while OpenAI is still generating it
+        
+        Takes the same arguments as generate_outline. Each yielded value is the
+        complete text received so far, so callers can simply replace what they
+        display. Partial results carry a "⏳" header; the final value carries the
+        same "✅" header as generate_outline. A cache hit is yielded at once.
+        
+        Yields:
+            str: Partial outline, final outline or error message
+        """
+        outline = ""
+        try:
+            cache_key = self._cache_key(structure_type, theme, audience, length, style, key_messages)
+            if use_cache:
+                cached = response_cache.get(cache_key)
+                if cached is not None:
+                    yield self._format_outline(structure_type, cached)
+                    return
+                reused = self._find_similar(structure_type, theme, audience, key_messages)
+                if reused is not None:
+                    yield reused
+                    return
+            
+            messages = self._build_messages(
+                structure_type, theme, audience, length, style, key_messages
+            )
+            
+            for delta in self.llm.stream(messages, settings.MAX_TOKENS, settings.TEMPERATURE, stage="outline"):
+                outline += delta
+                yield self._format_partial(outline)
+            
+            self._store(cache_key, structure_type, theme, audience, key_messages, outline)
+            yield self._format_outline(structure_type, outline)
+            
+        except Exception as e:
+            yield self._format_error(e)
+    
+    async def agenerate_outline(self, structure_type, theme, audience, length, style, key_messages, use_cache=True):
+        """
+        Async version of generate_outline for use from an event loop
+        
+        Returns:
+            str: Generated outline or error message
+        """
+        try:
+            json_mode = json_mode_enabled()
+            cache_key = self._cache_key(structure_type, theme, audience, length, style, key_messages, json_mode)
+            if use_cache:
+                outline = await asyncio.to_thread(response_cache.get, cache_key)
+                if outline is not None:
+                    return self._format_outline(structure_type, outline)
+                reused = await asyncio.to_thread(self._find_similar, structure_type, theme, audience, key_messages)
+                if reused is not None:
+                    return reused
+            
+            messages = self._build_messages(
+                structure_type, theme, audience, length, style, key_messages, json_mode
             )
             
-            outline = response.choices[0].message.content
+            raw = await self.llm.acomplete(
+                messages, settings.MAX_TOKENS, settings.TEMPERATURE, self._response_format(json_mode),
+                stage="outline"
+            )
+            outline = self._parse_outline(raw, json_mode)
+            await asyncio.to_thread(self._store, cache_key, structure_type, theme, audience, key_messages, outline)
             
-            # Get the structure name for display
-            structure_name = prompts.STORY_STRUCTURES.get(structure_type, "Personal Journey")
+            return self._format_outline(structure_type, outline)
             
-            return f"✅ **Outline Generated Successfully!**\n\n**Structure Used:** {structure_name}\n\n{outline}"
+        except Exception as e:
+            return self._format_error(e)
+    
+    async def agenerate_outline_stream(self, structure_type, theme, audience, length, style, key_messages, use_cache=True):
+        """
+        Async version of generate_outline_stream for use from an event loop
+        
+        Yields:
+            str: Partial outline, final outline or error message
+        """
+        outline = ""
+        try:
+            cache_key = self._cache_key(structure_type, theme, audience, length, style, key_messages)
+            if use_cache:
+                cached = await asyncio.to_thread(response_cache.get, cache_key)
+                if cached is not None:
+                    yield self._format_outline(structure_type, cached)
+                    return
+                reused = await asyncio.to_thread(self._find_similar, structure_type, theme, audience, key_messages)
+                if reused is not None:
+                    yield reused
+                    return
+            
+            messages = self._build_messages(
+                structure_type, theme, audience, length, style, key_messages
+            )
+            
+            async for delta in self.llm.astream(messages, settings.MAX_TOKENS, settings.TEMPERATURE, stage="outline"):
+                outline += delta
+                yield self._format_partial(outline)
+            
+            await asyncio.to_thread(self._store, cache_key, structure_type, theme, audience, key_messages, outline)
+            yield self._format_outline(structure_type, outline)
             
         except Exception as e:
-            return f"❌ **Error generating outline:** {str(e)}\n\nPlease check your OpenAI API key and try again."
+            yield self._format_error(e)
     
     def validate_api_connection(self):
         """
@@ -62,16 +337,26 @@ class OutlineGenerator:
         Returns:
             bool: True if connection is working, False otherwise
         """
-        try:
-            # Make a simple test call
-            response = self.client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=[{"role": "user", "content": "Test"}],
-                max_tokens=5
-            )
-            return True
-        except Exception:
-            return False
+        # Cached model lookup instead of a paid test completion
+        return get_health_probe().check()["ok"]
+
+# Global outline generator instance, created on first use
+_outline_generator = None
+
+def get_outline_generator():
+    """
+    Get the global outline generator, creating it on first use
+    
+    Returns:
+        OutlineGenerator: Shared outline generator
+    """
+    global _outline_generator
+    if _outline_generator is None:
+        _outline_generator = OutlineGenerator()
+    return _outline_generator
 
-# Create global outline generator instance
-outline_generator = OutlineGenerator()
\ No newline at end of file
+def __getattr__(name):
+    """Keep `from src.ai.outline_generator import outline_generator` working"""
+    if name == "outline_generator":
+        return get_outline_generator()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,164 @@
+"""
+Structured outline model
+
+Outlines are parsed into numbered sections, either from the model's JSON-mode
+output or, as a fallback, from the free-form markdown the templates produce.
+Each section has a fingerprint so article text written from it can be matched
+back to it after the user edits the outline.
+"""
+
+import hashlib
+import json
+import re
+import textwrap
+
+# A top-level numbered line, optionally styled as a markdown heading or bold:
+# "1. HOOK", "## 2) The Catalyst", "**3. STARTING POINT** - ...", "IV. Reflection"
+_SECTION_LINE = re.compile(
+    r"^(?:#{1,6}\s*)?(?:\*\*)?\s*(?P<number>\d{1,2}|[IVX]{1,5})[.)]\s+(?P<title>.+?)\s*$"
+)
+
+# Separates a short section name from its description: "HOOK - Engaging opening"
+_TITLE_SEPARATOR = re.compile(r"\s+[-–—]\s+|:\s+")
+
+def _clean_title(title):
+    """
+    Split a numbered line into a clean section name and its inline description
+    
+    Returns:
+        tuple: (title, description)
+    """
+    title = title.replace("**", "").replace("__", "").strip()
+    parts = _TITLE_SEPARATOR.split(title, maxsplit=1)
+    name = parts[0].rstrip(":").strip()
+    description = parts[1].strip() if len(parts) > 1 else ""
+    if name.isupper():
+        name = name.title()
+    return name, description
+
+def split_outline_sections(outline):
+    """
+    Split an outline into its top-level numbered sections
+    
+    Only unindented numbered lines start a section, so nested numbered
+    lists stay inside their parent section.
+    
+    Args:
+        outline (str): Outline text (without the status header)
+        
+    Returns:
+        tuple: (preamble, sections) where preamble is the text before the
+            first section and sections is a list of (title, notes) tuples
+    """
+    preamble = []
+    sections = []
+    
+    for line in outline.splitlines():
+        match = _SECTION_LINE.match(line) if line[:1] not in (" ", "\t") else None
+        if match:
+            title, description = _clean_title(match.group("title"))
+            sections.append([title, [description] if description else []])
+        elif sections:
+            sections[-1][1].append(line)
+        else:
+            preamble.append(line)
+    
+    return (
+        "\n".join(preamble).strip(),
+        [(title, textwrap.dedent("\n".join(notes)).strip()) for title, notes in sections]
+    )
+
+class OutlineSection:
+    """One numbered section of an outline"""
+    
+    def __init__(self, title, notes=""):
+        """
+        Args:
+            title (str): Section name, e.g. "The Catalyst"
+            notes (str): Planned content for the section (bullets or prose)
+        """
+        self.title = title
+        self.notes = notes
+    
+    @property
+    def fingerprint(self):
+        """Stable hash of the section content, ignoring case and whitespace layout"""
+        normalized = " ".join(f"{self.title}\n{self.notes}".lower().split())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+    
+    def to_markdown(self, number):
+        """Render the section as a numbered item with indented notes"""
+        lines = [f"{number}. **{self.title}**"]
+        for line in self.notes.splitlines():
+            if line.strip():
+                lines.append(f"   {line.strip()}")
+        return "\n".join(lines)
+
+class Outline:
+    """An outline as an optional preamble followed by numbered sections"""
+    
+    def __init__(self, sections, preamble=""):
+        """
+        Args:
+            sections (list): OutlineSection objects in order
+            preamble (str): Text before the first section (e.g. a title)
+        """
+        self.sections = sections
+        self.preamble = preamble
+    
+    @classmethod
+    def parse(cls, text):
+        """
+        Parse free-form outline markdown
+        
+        Args:
+            text (str): Outline text (without the status header)
+            
+        Returns:
+            Outline: Parsed outline (with no sections if none were found)
+        """
+        preamble, sections = split_outline_sections(text)
+        return cls([OutlineSection(title, notes) for title, notes in sections], preamble)
+    
+    @classmethod
+    def from_json(cls, text):
+        """
+        Parse JSON-mode model output
+        
+        Expects {"title": str, "sections": [{"title": str, "points": [str, ...]}]}.
+        
+        Args:
+            text (str): Raw JSON returned by the model
+            
+        Returns:
+            Outline: Parsed outline
+            
+        Raises:
+            ValueError: If the JSON is invalid or has no usable sections
+        """
+        data = json.loads(text)
+        if not isinstance(data, dict) or not isinstance(data.get("sections"), list):
+            raise ValueError("Outline JSON must contain a 'sections' list")
+        
+        sections = []
+        for item in data["sections"]:
+            if not isinstance(item, dict) or not str(item.get("title", "")).strip():
+                continue
+            points = item.get("points") or []
+            if isinstance(points, str):
+                points = [points]
+            notes = "\n".join(f"- {str(point).strip()}" for point in points if str(point).strip())
+            sections.append(OutlineSection(str(item["title"]).strip(), notes))
+        
+        if not sections:
+            raise ValueError("Outline JSON has no sections")
+        
+        title = str(data.get("title") or "").strip()
+        return cls(sections, f"# {title}" if title else "")
+    
+    def to_markdown(self):
+        """Render the outline in the numbered format the parser reads back"""
+        parts = [self.preamble] if self.preamble else []
+        parts.extend(section.to_markdown(number) for number, section in enumerate(self.sections, start=1))
+        return "\n\n".join(parts)
+
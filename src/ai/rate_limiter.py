@@ -0,0 +1,320 @@
+"""
+Rate-limit-aware scheduling for OpenAI calls
+
+Every chat completion goes through a shared RateLimitScheduler. It keeps
+requests-per-minute and tokens-per-minute token buckets, makes callers wait
+for capacity instead of failing, follows the x-ratelimit-* headers OpenAI
+returns, and retries throttled or transient failures with jittered
+exponential backoff.
+"""
+
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from config.settings import settings
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+OPENAI_RETRIES = metrics.counter(
+    "story_openai_retries_total", "OpenAI attempts retried after a transient error", ("error",)
+)
+
+def retryable_errors():
+    """
+    Errors worth retrying: throttling, timeouts, dropped connections and 5xx
+    
+    Resolved lazily so importing this module does not import openai.
+    
+    Returns:
+        tuple: Exception classes
+    """
+    import openai
+    
+    return (
+        openai.RateLimitError,
+        openai.APIConnectionError,  # Includes APITimeoutError
+        openai.InternalServerError
+    )
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def parse_reset_duration(value):
+    """
+    Parse an OpenAI reset header such as "1s", "6m0s" or "250ms"
+    
+    Args:
+        value (str): Header value
+        
+    Returns:
+        float: Seconds, or None if the value cannot be parsed
+    """
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+class TokenBucket:
+    """Thread-safe token bucket that hands out reservations"""
+    
+    def __init__(self, capacity, per_minute):
+        """
+        Initialize a full bucket
+        
+        Args:
+            capacity (float): Maximum number of tokens held
+            per_minute (float): Refill rate
+        """
+        self.capacity = float(capacity)
+        self.rate = per_minute / 60.0
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now):
+        """Add tokens for the time elapsed since the last update (caller holds the lock)"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def reserve(self, amount):
+        """
+        Take tokens now, letting the balance go negative if necessary
+        
+        Reservations are granted in call order, so waiting callers form a
+        queue instead of competing for the next refill.
+        
+        Args:
+            amount (float): Tokens needed (capped at the bucket capacity)
+            
+        Returns:
+            float: Seconds to wait before the reservation is covered
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+    
+    def adjust(self, amount):
+        """Give back (positive) or charge (negative) tokens after the fact"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+    
+    def sync(self, remaining, reset_seconds=None):
+        """
+        Align the bucket with the server's view of remaining capacity
+        
+        Only ever lowers the local balance; the server may count requests
+        from other processes sharing the same API key.
+        
+        Args:
+            remaining (float): Remaining capacity reported by the server
+            reset_seconds (float): Time until the server window fully resets
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if remaining < self.tokens:
+                self.tokens = float(remaining)
+            if reset_seconds and self.tokens < 0:
+                self.tokens = max(self.tokens, -reset_seconds * self.rate)
+
+class RateLimitScheduler:
+    """Shared gatekeeper for all OpenAI calls made by the generators"""
+    
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None,
+                 max_retries=None, base_delay=None, max_delay=None):
+        """
+        Initialize the buckets and retry policy from settings
+        
+        Args:
+            requests_per_minute (int): Request budget; 0 disables the limit
+            tokens_per_minute (int): Token budget; 0 disables the limit
+            max_retries (int): Retries after the first attempt
+            base_delay (float): First backoff delay in seconds
+            max_delay (float): Upper bound for a single backoff delay
+        """
+        rpm = settings.OPENAI_RPM_LIMIT if requests_per_minute is None else requests_per_minute
+        tpm = settings.OPENAI_TPM_LIMIT if tokens_per_minute is None else tokens_per_minute
+        self.request_bucket = TokenBucket(rpm, rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm, tpm) if tpm else None
+        
+        self.max_retries = settings.OPENAI_MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = settings.OPENAI_RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = settings.OPENAI_RETRY_MAX_DELAY if max_delay is None else max_delay
+    
+    @staticmethod
+    def estimate_tokens(messages, max_tokens):
+        """
+        Estimate the token cost of a request before it is sent
+        
+        Uses roughly four characters per prompt token plus the full
+        completion budget, which is what OpenAI counts against the limit.
+        
+        Args:
+            messages (list): Chat messages
+            max_tokens (int): Completion token limit
+            
+        Returns:
+            int: Estimated tokens
+        """
+        prompt_chars = sum(len(message.get("content") or "") for message in messages)
+        return prompt_chars // 4 + len(messages) * 4 + max_tokens
+    
+    def _reserve(self, cost):
+        """Reserve one request and `cost` tokens, returning the wait in seconds"""
+        wait = 0.0
+        if self.request_bucket:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket:
+            wait = max(wait, self.token_bucket.reserve(cost))
+        if wait > 0:
+            logger.info("Rate limiter queued request (%d tokens) for %.2fs", cost, wait)
+        return wait
+    
+    def settle(self, estimated, actual):
+        """
+        Correct the token bucket once the real usage is known
+        
+        Args:
+            estimated (int): Tokens reserved before the call
+            actual (int): Tokens reported in the response usage, or None
+        """
+        if self.token_bucket and actual is not None:
+            self.token_bucket.adjust(estimated - actual)
+    
+    def update_from_headers(self, headers):
+        """
+        Sync the buckets with x-ratelimit-* response headers when present
+        
+        Args:
+            headers (Mapping): Response headers
+        """
+        if headers is None:
+            return
+        for bucket, kind in ((self.request_bucket, "requests"), (self.token_bucket, "tokens")):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if bucket is None or remaining is None:
+                continue
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                continue
+            bucket.sync(remaining, parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}")))
+    
+    def backoff_delay(self, attempt, error=None):
+        """
+        Delay before the next retry
+        
+        Honors retry-after headers on the error response, otherwise uses
+        full-jitter exponential backoff.
+        
+        Args:
+            attempt (int): Zero-based retry number
+            error (Exception): The error that triggered the retry
+            
+        Returns:
+            float: Seconds to wait
+        """
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if headers is not None:
+            self.update_from_headers(headers)
+            retry_after_ms = headers.get("retry-after-ms")
+            retry_after = headers.get("retry-after")
+            try:
+                if retry_after_ms is not None:
+                    return min(float(retry_after_ms) / 1000, self.max_delay)
+                if retry_after is not None:
+                    return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(self.base_delay / 2, max(ceiling, self.base_delay / 2))
+    
+    def run(self, call, cost):
+        """
+        Run a blocking API call under the rate limits, retrying transient failures
+        
+        Args:
+            call (callable): Performs the request; takes no arguments
+            cost (int): Estimated token cost from estimate_tokens()
+            
+        Returns:
+            The value returned by `call`
+        """
+        retryable = retryable_errors()
+        attempt = 0
+        while True:
+            wait = self._reserve(cost)
+            if wait:
+                time.sleep(wait)
+            try:
+                return call()
+            except retryable as e:
+                self.settle(cost, 0)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                logger.warning("OpenAI call failed (%s), retry %d/%d in %.2fs",
+                               type(e).__name__, attempt + 1, self.max_retries, delay)
+                OPENAI_RETRIES.inc(error=type(e).__name__)
+                time.sleep(delay)
+                attempt += 1
+            except Exception:
+                # Failed without using tokens (bad request, open circuit, ...)
+                self.settle(cost, 0)
+                raise
+    
+    async def arun(self, call, cost):
+        """
+        Async version of run(); waits without blocking the event loop
+        
+        Args:
+            call (callable): Returns an awaitable that performs the request
+            cost (int): Estimated token cost from estimate_tokens()
+            
+        Returns:
+            The value the awaitable resolves to
+        """
+        retryable = retryable_errors()
+        attempt = 0
+        while True:
+            wait = self._reserve(cost)
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+                return await call()
+            except asyncio.CancelledError:
+                # A losing hedge or abandoned request; give its reservation back
+                self.settle(cost, 0)
+                raise
+            except retryable as e:
+                self.settle(cost, 0)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                logger.warning("OpenAI call failed (%s), retry %d/%d in %.2fs",
+                               type(e).__name__, attempt + 1, self.max_retries, delay)
+                OPENAI_RETRIES.inc(error=type(e).__name__)
+                await asyncio.sleep(delay)
+                attempt += 1
+            except Exception:
+                # Failed without using tokens (bad request, open circuit, ...)
+                self.settle(cost, 0)
+                raise
+
+# Create global scheduler instance shared by all generators
+rate_limiter = RateLimitScheduler()
@@ -0,0 +1,268 @@
+"""
+Two-level response cache for outline and article generation
+
+Recently used entries live in an in-memory LRU; everything is persisted to a
+local SQLite file so identical requests are served after a restart as well.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config.settings import settings
+from config.prompts import prompts
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """In-memory LRU backed by an on-disk SQLite store, with TTL and size-based eviction"""
+    
+    def __init__(self, db_path=None, ttl_seconds=None, max_memory_entries=None, max_disk_bytes=None):
+        """
+        Initialize the cache; the SQLite store is opened on first use
+        
+        Args:
+            db_path (str): SQLite file path
+            ttl_seconds (float): Entry lifetime; 0 disables expiry
+            max_memory_entries (int): Number of entries kept in memory
+            max_disk_bytes (int): Total size of stored values before LRU eviction
+        """
+        self.db_path = db_path or settings.RESPONSE_CACHE_PATH
+        self.ttl_seconds = settings.RESPONSE_CACHE_TTL if ttl_seconds is None else ttl_seconds
+        self.max_memory_entries = max_memory_entries or settings.RESPONSE_CACHE_MEMORY_ENTRIES
+        self.max_disk_bytes = max_disk_bytes or settings.RESPONSE_CACHE_MAX_BYTES
+        self.enabled = settings.RESPONSE_CACHE_ENABLED
+        
+        self._memory = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._disk_bytes = 0
+    
+    def _open(self):
+        """Open the SQLite store on first use and load the current stored size"""
+        if self._conn is not None:
+            return
+        
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_expires_at ON responses (expires_at)"
+        )
+        self._conn.commit()
+        
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        self._disk_bytes = row[0]
+    
+    @staticmethod
+    def make_key(stage, params, template, max_tokens):
+        """
+        Build a cache key for a generation request
+        
+        Args:
+            stage (str): "outline" or "article"
+            params (dict): Request parameters (structure, theme, audience, ...)
+            template (str): Prompt template used for the request
+            max_tokens (int): Completion token limit
+            
+        Returns:
+            str: Hex digest identifying the request
+        """
+        # Normalize free-text fields so whitespace-only differences share an entry
+        normalized = {
+            name: value.strip() if isinstance(value, str) else value
+            for name, value in params.items()
+        }
+        prompt_version = hashlib.sha256(
+            (prompts.SYSTEM_MESSAGE + template).encode("utf-8")
+        ).hexdigest()
+        
+        payload = json.dumps({
+            "stage": stage,
+            "params": normalized,
+            "model": settings.OPENAI_MODEL,
+            "temperature": settings.TEMPERATURE,
+            "max_tokens": max_tokens,
+            "prompt_version": prompt_version
+        }, sort_keys=True)
+        
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key):
+        """
+        Look up a cached response
+        
+        Args:
+            key (str): Key from make_key
+            
+        Returns:
+            str: Cached response, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        
+        started = time.perf_counter()
+        now = time.time()
+        
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if not expires_at or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._log_hit(key, "memory", started)
+                    return value
+                del self._memory[key]
+            
+            try:
+                self._open()
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                
+                value, expires_at = row
+                if expires_at and expires_at <= now:
+                    self._delete(key)
+                    return None
+                
+                self._conn.execute(
+                    "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+                )
+                self._conn.commit()
+            except (sqlite3.Error, OSError) as e:
+                # A broken store must not fail the request; treat it as a miss
+                logger.warning("Response cache lookup failed: %s", e)
+                return None
+            self._remember(key, value, expires_at)
+        
+        self._log_hit(key, "disk", started)
+        return value
+    
+    def set(self, key, value):
+        """
+        Store a response in memory and on disk
+        
+        Args:
+            key (str): Key from make_key
+            value (str): Response text
+        """
+        if not self.enabled or not value:
+            return
+        
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else 0
+        size = len(value.encode("utf-8"))
+        
+        with self._lock:
+            self._remember(key, value, expires_at)
+            
+            try:
+                self._open()
+                old = self._conn.execute(
+                    "SELECT size FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, expires_at, now)
+                )
+                self._disk_bytes += size - (old[0] if old else 0)
+                self._evict(now)
+                self._conn.commit()
+            except (sqlite3.Error, OSError) as e:
+                # The response is already paid for; keep it in memory and carry on
+                logger.warning("Could not store response in the cache: %s", e)
+                self._rollback()
+    
+    def clear(self):
+        """Remove every cached response"""
+        if not self.enabled:
+            return
+        
+        with self._lock:
+            self._open()
+            self._memory.clear()
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._disk_bytes = 0
+    
+    def _rollback(self):
+        """Undo a failed write and re-read the stored size (caller holds the lock)"""
+        if self._conn is None:
+            return
+        try:
+            self._conn.rollback()
+            row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+            self._disk_bytes = row[0]
+        except sqlite3.Error:
+            pass
+    
+    def _remember(self, key, value, expires_at):
+        """Put an entry in the in-memory LRU (caller holds the lock)"""
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+    
+    def _delete(self, key):
+        """Remove one entry from disk (caller holds the lock)"""
+        row = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+            self._disk_bytes -= row[0]
+    
+    def _evict(self, now):
+        """Drop expired entries, then least recently used ones until under the size limit"""
+        expired = self._conn.execute(
+            "SELECT key, size FROM responses WHERE expires_at > 0 AND expires_at <= ?", (now,)
+        ).fetchall()
+        if expired:
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k, _ in expired])
+            self._disk_bytes -= sum(size for _, size in expired)
+        
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        
+        rows = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_access ASC"
+        ).fetchall()
+        victims = []
+        for key, size in rows:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            victims.append((key,))
+            self._disk_bytes -= size
+            self._memory.pop(key, None)
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        logger.info("Response cache evicted %d entries to stay under %d bytes",
+                    len(victims), self.max_disk_bytes)
+    
+    def _log_hit(self, key, level, started):
+        """Log a cache hit with its lookup latency"""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info("Response cache hit (%s) for %s in %.2f ms", level, key[:12], elapsed_ms)
+
+# Create global response cache instance
+response_cache = ResponseCache()
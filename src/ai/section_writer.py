@@ -0,0 +1,353 @@
+"""
+Parallel section-by-section article generation
+
+Long articles are split along the numbered sections of the approved outline.
+Every section is written concurrently from a shared context header (outline,
+parameters, neighbouring section titles) with its own word budget, then the
+sections are stitched back together in order. An optional consistency pass
+writes short bridges between neighbouring sections, also in parallel, so the
+wall-clock time depends on the longest section rather than the whole article.
+"""
+
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config.settings import settings
+from config.prompts import prompts
+from src.ai.llm_client import PROMPT_BUILD
+from src.ai.outline_sections import Outline
+
+logger = logging.getLogger(__name__)
+
+# English prose averages about 1.3 tokens per word; budget a little more so
+# sections are not cut off, plus headroom for the heading
+TOKENS_PER_WORD = 1.6
+SECTION_TOKEN_HEADROOM = 150
+TRANSITION_MAX_TOKENS = 120
+
+# Characters of each neighbouring section shown to the transition writer
+TRANSITION_CONTEXT_CHARS = 600
+
+class SectionTask:
+    """One section of the article to be written"""
+
+    def __init__(self, index, title, notes, words, fingerprint):
+        """
+        Args:
+            index (int): Zero-based position in the article
+            title (str): Section title from the outline
+            notes (str): Outline notes for this section
+            words (int): Word budget for the section
+            fingerprint (str): Fingerprint of the outline section
+        """
+        self.index = index
+        self.title = title
+        self.notes = notes
+        self.words = words
+        self.fingerprint = fingerprint
+
+    @property
+    def max_tokens(self):
+        """Completion token limit that comfortably fits the word budget"""
+        return min(settings.MAX_TOKENS, int(self.words * TOKENS_PER_WORD) + SECTION_TOKEN_HEADROOM)
+
+class SectionWriter:
+    """Writes an article as independent sections and stitches them together"""
+
+    def __init__(self, llm):
+        """
+        Args:
+            llm (LLMClient): Client used for every section and transition call
+        """
+        self.llm = llm
+
+    def plan(self, outline, length):
+        """
+        Split an outline into section tasks with word budgets
+
+        Budgets are proportional to how much the outline plans for each
+        section, damped so short sections still get a reasonable share.
+
+        Args:
+            outline (str): Approved outline text
+            length (int): Target word count for the whole article
+
+        Returns:
+            list: SectionTask objects, or an empty list if the outline has
+                fewer than two numbered sections
+        """
+        sections = Outline.parse(outline).sections
+        if len(sections) < 2:
+            return []
+
+        weights = [len(section.notes) + 200 for section in sections]
+        total_weight = sum(weights)
+        return [
+            SectionTask(
+                index, section.title, section.notes,
+                max(60, round(length * weight / total_weight)),
+                section.fingerprint
+            )
+            for index, (section, weight) in enumerate(zip(sections, weights))
+        ]
+
+    def build_messages(self, task, tasks, outline, theme, audience, style, key_messages):
+        """
+        Build the chat messages for one section
+
+        Returns:
+            list: Messages for the chat completions API
+        """
+        previous_title = tasks[task.index - 1].title if task.index > 0 else "(none - this opens the article)"
+        next_title = tasks[task.index + 1].title if task.index + 1 < len(tasks) else "(none - this closes the article)"
+
+        with PROMPT_BUILD.time(stage="article_section"):
+            user_prompt = prompts.ARTICLE_SECTION_GENERATION.format(
+                outline=outline,
+                theme=theme,
+                audience=audience,
+                style=style,
+                key_messages=key_messages,
+                position=task.index + 1,
+                total=len(tasks),
+                title=task.title,
+                section_notes=task.notes,
+                previous_title=previous_title,
+                next_title=next_title,
+                words=task.words
+            )
+
+        return [
+            {"role": "system", "content": prompts.SYSTEM_MESSAGE},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _normalize(self, task, text):
+        """Make sure a section starts with exactly one heading for its title"""
+        text = (text or "").strip()
+        first_line = text.split("\n", 1)[0]
+        if first_line.lstrip("#* ").lower().startswith(task.title.lower()):
+            text = text.split("\n", 1)[1].strip() if "\n" in text else ""
+        return f"## {task.title}\n\n{text}"
+
+    def _transition_messages(self, left_task, left_text, right_task, right_text):
+        """Build the chat messages for the bridge between two sections"""
+        user_prompt = prompts.SECTION_TRANSITION.format(
+            previous_title=left_task.title,
+            previous_text=left_text[-TRANSITION_CONTEXT_CHARS:],
+            next_title=right_task.title,
+            next_text=right_text[:TRANSITION_CONTEXT_CHARS]
+        )
+        return [
+            {"role": "system", "content": prompts.SYSTEM_MESSAGE},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def stitch(self, tasks, texts, transitions=None):
+        """
+        Join sections in outline order
+
+        Args:
+            tasks (list): SectionTask objects
+            texts (list): Section text per task (None for sections not written yet)
+            transitions (list): Optional bridge text after each section but the last
+
+        Returns:
+            str: Article markdown
+        """
+        parts = []
+        for task, text in zip(tasks, texts):
+            if text is None:
+                continue
+            section = self._normalize(task, text)
+            if transitions and task.index < len(transitions) and transitions[task.index]:
+                section = f"{section}\n\n{transitions[task.index].strip()}"
+            parts.append(section)
+        return "\n\n".join(parts)
+
+    def write(self, tasks, outline, theme, audience, style, key_messages, texts=None, transitions=None):
+        """
+        Write all sections concurrently on worker threads (sync API)
+
+        Args:
+            texts (list): Section text per task; None entries are written,
+                others are kept. Filled in place.
+            transitions (list): Bridge text after each section but the last;
+                None entries are written. Filled in place.
+
+        Yields:
+            str: The article stitched from the sections finished so far, and
+                finally the complete article after the consistency pass
+        """
+        texts = texts if texts is not None else [None] * len(tasks)
+        transitions = transitions if transitions is not None else [None] * (len(tasks) - 1)
+        pending = [task for task in tasks if texts[task.index] is None]
+        with ThreadPoolExecutor(max_workers=max(1, min(len(tasks), settings.SECTION_MAX_CONCURRENCY))) as pool:
+            futures = {
+                # Copy the context so usage tracking follows each call
+                pool.submit(
+                    contextvars.copy_context().run,
+                    self.llm.complete,
+                    self.build_messages(task, tasks, outline, theme, audience, style, key_messages),
+                    task.max_tokens,
+                    settings.TEMPERATURE,
+                    stage="article_section"
+                ): task
+                for task in pending
+            }
+            for future in as_completed(futures):
+                texts[futures[future].index] = future.result()
+                yield self.stitch(tasks, texts)
+
+            if settings.SECTION_TRANSITIONS:
+                transition_futures = {
+                    pool.submit(
+                        contextvars.copy_context().run,
+                        self.llm.complete,
+                        self._transition_messages(tasks[i], texts[i], tasks[i + 1], texts[i + 1]),
+                        TRANSITION_MAX_TOKENS,
+                        settings.TEMPERATURE,
+                        stage="section_transition"
+                    ): i
+                    for i in range(len(tasks) - 1)
+                    if transitions[i] is None
+                }
+                for future, i in transition_futures.items():
+                    try:
+                        transitions[i] = future.result()
+                    except Exception as e:
+                        # Bridges are optional; the sections are already paid for
+                        logger.warning("Transition after section %d failed: %s", i + 1, e)
+
+        yield self.stitch(tasks, texts, transitions)
+
+    async def astream(self, tasks, outline, theme, audience, style, key_messages, texts=None, transitions=None):
+        """
+        Stream all sections concurrently on the event loop
+
+        Args:
+            texts (list): Section text per task; None entries are written,
+                others are kept. Filled in place.
+            transitions (list): Bridge text after each section but the last;
+                None entries are written. Filled in place.
+
+        Yields:
+            str: The article stitched from all text received so far, and
+                finally the complete article after the consistency pass
+        """
+        texts = texts if texts is not None else [None] * len(tasks)
+        transitions = transitions if transitions is not None else [None] * (len(tasks) - 1)
+        pending = [task for task in tasks if texts[task.index] is None]
+        semaphore = asyncio.Semaphore(settings.SECTION_MAX_CONCURRENCY)
+        updates = asyncio.Queue()
+
+        async def write_section(task):
+            async with semaphore:
+                messages = self.build_messages(task, tasks, outline, theme, audience, style, key_messages)
+                async for delta in self.llm.astream(
+                    messages, task.max_tokens, settings.TEMPERATURE, stage="article_section"
+                ):
+                    texts[task.index] = (texts[task.index] or "") + delta
+                    updates.put_nowait(task.index)
+
+        workers = [asyncio.create_task(write_section(task)) for task in pending]
+        done = asyncio.gather(*workers)
+        try:
+            while not done.done() or not updates.empty():
+                getter = asyncio.ensure_future(updates.get())
+                await asyncio.wait({getter, done}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    continue
+                # Coalesce bursts of deltas into one update
+                while not updates.empty():
+                    updates.get_nowait()
+                yield self.stitch(tasks, texts)
+            await done  # Re-raise the first section error, if any
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+        if settings.SECTION_TRANSITIONS:
+            missing = [i for i in range(len(tasks) - 1) if transitions[i] is None]
+            results = await asyncio.gather(*[
+                self.llm.acomplete(
+                    self._transition_messages(tasks[i], texts[i] or "", tasks[i + 1], texts[i + 1] or ""),
+                    TRANSITION_MAX_TOKENS,
+                    settings.TEMPERATURE,
+                    stage="section_transition"
+                )
+                for i in missing
+            ], return_exceptions=True)
+            for i, result in zip(missing, results):
+                if isinstance(result, Exception):
+                    # Bridges are optional; the sections are already paid for
+                    logger.warning("Transition after section %d failed: %s", i + 1, result)
+                    continue
+                transitions[i] = result
+
+        yield self.stitch(tasks, texts, transitions)
+
+class ArticleDraft:
+    """
+    Article text remembered by the outline section it was written from
+
+    Lets an edited outline reuse every article section whose outline section
+    did not change, so only the affected sections are regenerated.
+    """
+
+    def __init__(self):
+        """Start with an empty draft"""
+        self.params = None
+        self.sections = {}  # outline section fingerprint -> section text
+        self.transitions = {}  # "left|right" fingerprints -> bridge text
+
+    @staticmethod
+    def _pair(left_task, right_task):
+        """Key for the bridge between two neighbouring sections"""
+        return f"{left_task.fingerprint}|{right_task.fingerprint}"
+
+    def reuse(self, tasks, params):
+        """
+        Pre-fill section and bridge text for a new plan
+
+        Args:
+            tasks (list): SectionTask objects for the edited outline
+            params (dict): Parameters the article is written for; any change
+                invalidates the whole draft
+
+        Returns:
+            tuple: (texts, transitions) lists with None where text must be written
+        """
+        if params != self.params:
+            return [None] * len(tasks), [None] * (len(tasks) - 1)
+        texts = [self.sections.get(task.fingerprint) for task in tasks]
+        transitions = [
+            self.transitions.get(self._pair(tasks[i], tasks[i + 1]))
+            for i in range(len(tasks) - 1)
+        ]
+        return texts, transitions
+
+    def to_dict(self):
+        """Plain-data form of the draft, for saving with a project"""
+        return {"params": self.params, "sections": self.sections, "transitions": self.transitions}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a draft saved with to_dict()"""
+        draft = cls()
+        draft.params = data.get("params")
+        draft.sections = dict(data.get("sections") or {})
+        draft.transitions = dict(data.get("transitions") or {})
+        return draft
+
+    def update(self, tasks, texts, transitions, params):
+        """Remember the text written for the current outline"""
+        self.params = dict(params)
+        self.sections = {task.fingerprint: text for task, text in zip(tasks, texts)}
+        self.transitions = {
+            self._pair(tasks[i], tasks[i + 1]): transitions[i]
+            for i in range(len(tasks) - 1)
+            if transitions[i]
+        }
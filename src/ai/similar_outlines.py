@@ -0,0 +1,299 @@
+"""
+Near-duplicate lookup of earlier outline requests
+
+Many requests differ only in wording ("overcoming fear of failure" vs
+"overcoming the fear of failing"). Every generated outline is indexed by a
+MinHash signature of its theme, audience and key messages, and a new request
+with the same story structure and a similar enough signature is served the
+earlier outline instead of a new OpenAI call. Outlines are only reused for
+the user who requested them, so one user never sees another's story.
+
+Candidates are found with LSH banding: the signature is cut into bands and
+two requests become candidates when any band matches exactly, so a lookup
+is a handful of dict probes regardless of how many outlines are stored.
+Signatures and band buckets are kept in memory (under 2 KB per outline); the
+outlines themselves stay in a local SQLite file and are read on a hit.
+"""
+
+import array
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter, namedtuple
+from config.settings import settings
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SIMILAR_LOOKUPS = metrics.counter(
+    "story_similar_outline_lookups_total", "Near-duplicate outline lookups by result", ("result",)
+)
+SIMILAR_LOOKUP_LATENCY = metrics.histogram(
+    "story_similar_outline_lookup_seconds", "Time to look up a near-duplicate outline",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05)
+)
+
+# Signature length and banding: 16 bands of 4 rows make requests sharing
+# about half their shingles likely candidates; the threshold is then
+# checked on the full signature
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# Candidates (by number of shared bands) whose full signature is compared
+MAX_CANDIDATES = 8
+
+# Fixed seed: signatures are stored, so the permutations must never change
+_MASKS = random.Random(0x5EED).sample(range(1 << 32), NUM_PERM)
+
+_WORD = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from in into is it its my of on or our the their to with your".split()
+)
+# Crude suffix stripping so "failure", "failing" and "failed" share a stem
+_SUFFIXES = ("ations", "ation", "ments", "ment", "ness", "ures", "ure", "ings", "ing",
+             "ies", "ied", "ed", "es", "ly", "s")
+
+SimilarOutline = namedtuple("SimilarOutline", "outline similarity")
+
+def _stem(word):
+    """Strip one common suffix and a final "e", keeping at least three letters"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    # "forgive" and "forgiving" both become "forgiv"
+    if word.endswith("e") and len(word) > 3:
+        word = word[:-1]
+    return word
+
+def shingles(theme, audience, key_messages):
+    """
+    Word and word-pair shingles of a request's free-text fields
+
+    Stop words are dropped and words are stemmed, and each shingle is tagged
+    with its field so a word in the theme does not match the same word in
+    the audience.
+
+    Returns:
+        set: Shingle strings
+    """
+    result = set()
+    for field, text in (("t", theme), ("a", audience), ("k", key_messages)):
+        words = [_stem(word) for word in _WORD.findall((text or "").lower()) if word not in STOP_WORDS]
+        result.update(f"{field}:{word}" for word in words)
+        result.update(f"{field}:{first} {second}" for first, second in zip(words, words[1:]))
+    return result
+
+def signature(items):
+    """
+    MinHash signature of a shingle set
+
+    Each permutation XORs the shingles' CRC32 with a fixed random mask and
+    keeps the minimum.
+
+    Returns:
+        array.array: NUM_PERM unsigned 32-bit values, or None for an empty set
+    """
+    if not items:
+        return None
+    hashes = [zlib.crc32(item.encode("utf-8")) for item in items]
+    return array.array("I", [min([value ^ mask for value in hashes]) for mask in _MASKS])
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures (share of equal values)"""
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+class SimilarOutlineIndex:
+    """MinHash/LSH index over the parameters of previously generated outlines"""
+
+    def __init__(self, db_path=None, threshold=None):
+        """
+        Initialize the index; the SQLite file is loaded on first use
+
+        Args:
+            db_path (str): SQLite file path
+            threshold (float): Smallest estimated similarity served as a match
+        """
+        self.db_path = db_path or settings.SIMILAR_OUTLINES_PATH
+        self.threshold = settings.SIMILAR_OUTLINE_THRESHOLD if threshold is None else threshold
+        self._lock = threading.Lock()
+        self._conn = None
+        self._ids = array.array("q")  # row id per loaded entry
+        self._signatures = array.array("I")  # NUM_PERM values per loaded entry
+        self._buckets = {}  # band key -> entry position, or list of positions
+
+    def _open(self):
+        """Open the SQLite file and load every stored signature (caller holds the lock)"""
+        if self._conn is not None:
+            return
+
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS outlines (
+                id INTEGER PRIMARY KEY,
+                created_at REAL NOT NULL,
+                structure_type TEXT NOT NULL,
+                username TEXT,
+                theme TEXT,
+                audience TEXT,
+                key_messages TEXT,
+                signature BLOB NOT NULL,
+                outline TEXT NOT NULL
+            )"""
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(outlines)")]
+        if "username" not in columns:
+            # Files written before reuse was scoped per user; their rows count as anonymous
+            self._conn.execute("ALTER TABLE outlines ADD COLUMN username TEXT")
+        self._conn.commit()
+
+        started = time.perf_counter()
+        rows = self._conn.execute("SELECT id, username, structure_type, signature FROM outlines ORDER BY id")
+        for row_id, username, structure_type, blob in rows:
+            self._insert(row_id, username, structure_type, array.array("I", blob))
+        if self._ids:
+            logger.info("Loaded %d outline signatures in %.2fs", len(self._ids), time.perf_counter() - started)
+
+    def _band_keys(self, username, structure_type, values):
+        """Bucket keys of a signature; requests only match within one user and structure"""
+        return [
+            hash((username, structure_type, band, values[band * ROWS:(band + 1) * ROWS].tobytes()))
+            for band in range(BANDS)
+        ]
+
+    def _insert(self, row_id, username, structure_type, values):
+        """Add a signature to the in-memory index (caller holds the lock)"""
+        position = len(self._ids)
+        self._ids.append(row_id)
+        self._signatures.extend(values)
+        for key in self._band_keys(username, structure_type, values):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # Most buckets hold one entry; store it bare to save memory
+                self._buckets[key] = position
+            elif isinstance(bucket, int):
+                self._buckets[key] = [bucket, position]
+            else:
+                bucket.append(position)
+
+    def add(self, structure_type, theme, audience, key_messages, outline, username=None):
+        """
+        Index a freshly generated outline
+
+        Args:
+            structure_type (str): Story structure the outline follows
+            theme (str): Theme of the request
+            audience (str): Target audience of the request
+            key_messages (str): Key messages of the request
+            outline (str): Outline text, without the status header
+            username (str): Signed-in user the outline was made for, or None
+        """
+        values = signature(shingles(theme, audience, key_messages))
+        if values is None or not outline:
+            return
+        with self._lock:
+            self._open()
+            cursor = self._conn.execute(
+                "INSERT INTO outlines (created_at, structure_type, username, theme, audience, key_messages, "
+                "signature, outline) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), structure_type, username, theme, audience, key_messages, values.tobytes(), outline)
+            )
+            self._conn.commit()
+            self._insert(cursor.lastrowid, username, structure_type, values)
+
+    def find(self, structure_type, theme, audience, key_messages, username=None):
+        """
+        Find the most similar earlier request of the same user with the same structure
+
+        Args:
+            structure_type (str): Story structure of the new request
+            theme (str): Theme of the new request
+            audience (str): Target audience of the new request
+            key_messages (str): Key messages of the new request
+            username (str): Signed-in user making the request, or None
+
+        Returns:
+            SimilarOutline: (outline, similarity) of the best match at or
+                above the threshold, or None
+        """
+        started = time.perf_counter()
+        values = signature(shingles(theme, audience, key_messages))
+        match = None
+        if values is not None:
+            with self._lock:
+                self._open()
+                best = self._best_candidate(username, structure_type, values)
+                if best is not None and best[0] >= self.threshold:
+                    row = self._conn.execute(
+                        "SELECT outline FROM outlines WHERE id = ?", (self._ids[best[1]],)
+                    ).fetchone()
+                    if row is not None:
+                        match = SimilarOutline(row[0], best[0])
+
+        SIMILAR_LOOKUPS.inc(result="hit" if match else "miss")
+        SIMILAR_LOOKUP_LATENCY.observe(time.perf_counter() - started)
+        return match
+
+    def _best_candidate(self, username, structure_type, values):
+        """
+        Most similar indexed entry sharing at least one band (caller holds the lock)
+
+        Returns:
+            tuple: (similarity, position), or None without candidates
+        """
+        shared = Counter()
+        for key in self._band_keys(username, structure_type, values):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            if isinstance(bucket, int):
+                shared[bucket] += 1
+            else:
+                shared.update(bucket)
+
+        best = None
+        # Entries sharing more bands are more similar; only verify the top few
+        for position, _ in shared.most_common(MAX_CANDIDATES):
+            start = position * NUM_PERM
+            score = similarity(values, self._signatures[start:start + NUM_PERM])
+            # Prefer the newest entry on ties
+            if best is None or score > best[0] or (score == best[0] and position > best[1]):
+                best = (score, position)
+        return best
+
+    def __len__(self):
+        """Number of indexed outlines"""
+        with self._lock:
+            self._open()
+            return len(self._ids)
+
+# Global similar-outline index, created on first use
+_similar_outline_index = None
+_similar_outline_index_lock = threading.Lock()
+
+def get_similar_outline_index():
+    """
+    Get the global similar-outline index, creating it on first use
+
+    Returns:
+        SimilarOutlineIndex: Shared index, or None when reuse is disabled
+    """
+    global _similar_outline_index
+    if not settings.SIMILAR_OUTLINES_ENABLED:
+        return None
+    if _similar_outline_index is None:
+        with _similar_outline_index_lock:
+            if _similar_outline_index is None:
+                _similar_outline_index = SimilarOutlineIndex()
+    return _similar_outline_index
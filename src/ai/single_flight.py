@@ -0,0 +1,261 @@
+"""
+Single-flight coalescing of identical in-flight OpenAI requests
+
+When the same request is already running (a double-clicked button, a team
+sharing one parameter preset), later callers attach to it instead of sending
+their own. Everyone receives the same result; for streams, a caller that
+joins late first gets the text produced so far and then the live deltas.
+
+The upstream request runs detached from any single caller (a pump thread or
+task started with the first caller's context), so one caller giving up does
+not cut off the others. It is cancelled only once every caller has left.
+"""
+
+import asyncio
+import contextvars
+import threading
+from src.utils.metrics import metrics
+
+COALESCED = metrics.counter(
+    "story_coalesced_requests_total", "Calls that joined an identical in-flight OpenAI request", ("stage", "mode")
+)
+
+class _Flight:
+    """State of one in-flight request shared by its callers"""
+
+    def __init__(self):
+        self.chunks = []  # stream deltas received so far
+        self.result = None
+        self.error = None
+        self.done = False
+        self.abandoned = False
+        self.subscribers = 1
+
+class SingleFlight:
+    """Coalesces identical blocking calls made from different threads"""
+
+    def __init__(self):
+        self._flights = {}  # (mode, key) -> _Flight
+        self._lock = threading.Lock()
+
+    def _join(self, mode, key, stage):
+        """Attach to the running flight for a key, or register a new one"""
+        with self._lock:
+            flight = self._flights.get((mode, key))
+            if flight is not None and not flight.abandoned:
+                flight.subscribers += 1
+                COALESCED.inc(stage=stage, mode=mode)
+                return flight, False
+            flight = self._flights[(mode, key)] = _Flight()
+            flight.condition = threading.Condition()
+            return flight, True
+
+    def _finish(self, mode, key, flight):
+        """Unregister a flight and wake everyone waiting on it"""
+        with self._lock:
+            if self._flights.get((mode, key)) is flight:
+                del self._flights[(mode, key)]
+        with flight.condition:
+            flight.done = True
+            flight.condition.notify_all()
+
+    def call(self, key, fn, stage="other"):
+        """
+        Run fn once for all concurrent callers with the same key
+
+        Args:
+            key (str): Identifies the request
+            fn (callable): Performs the request
+            stage (str): Pipeline stage, for metrics
+
+        Returns:
+            The value fn returned
+        """
+        flight, leader = self._join("complete", key, stage)
+        if leader:
+            try:
+                flight.result = fn()
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                self._finish("complete", key, flight)
+            return flight.result
+
+        with flight.condition:
+            flight.condition.wait_for(lambda: flight.done)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stream(self, key, fn, stage="other"):
+        """
+        Share one stream between all concurrent callers with the same key
+
+        Args:
+            key (str): Identifies the request
+            fn (callable): Returns an iterator of text deltas
+            stage (str): Pipeline stage, for metrics
+
+        Yields:
+            str: Every delta of the shared stream, from the beginning
+        """
+        flight, leader = self._join("stream", key, stage)
+        if leader:
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run, args=(self._pump, key, fn, flight), name="llm-stream-pump", daemon=True
+            ).start()
+
+        index = 0
+        try:
+            while True:
+                with flight.condition:
+                    flight.condition.wait_for(lambda: index < len(flight.chunks) or flight.done)
+                    new = flight.chunks[index:]
+                    done = flight.done
+                index += len(new)
+                yield from new
+                if done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            with self._lock:
+                flight.subscribers -= 1
+                if flight.subscribers == 0 and not flight.done:
+                    # Everyone left: stop the upstream stream and let new callers start afresh
+                    flight.abandoned = True
+                    if self._flights.get(("stream", key)) is flight:
+                        del self._flights[("stream", key)]
+
+    def _pump(self, key, fn, flight):
+        """Read the upstream stream into the flight (runs in its own thread)"""
+        deltas = fn()
+        try:
+            for delta in deltas:
+                if flight.abandoned:
+                    break
+                with flight.condition:
+                    flight.chunks.append(delta)
+                    flight.condition.notify_all()
+        except BaseException as e:
+            flight.error = e
+        finally:
+            close = getattr(deltas, "close", None)
+            if close is not None:
+                close()
+            self._finish("stream", key, flight)
+
+class AsyncSingleFlight:
+    """Coalesces identical async calls running on the same event loop"""
+
+    def __init__(self):
+        self._flights = {}  # (loop id, mode, key) -> _Flight
+        self._lock = threading.Lock()
+
+    def _join(self, mode, key, stage):
+        """Attach to the running flight for a key, or register a new one"""
+        registry_key = (id(asyncio.get_running_loop()), mode, key)
+        with self._lock:
+            flight = self._flights.get(registry_key)
+            if flight is not None and not flight.abandoned:
+                flight.subscribers += 1
+                COALESCED.inc(stage=stage, mode=mode)
+                return flight, registry_key, False
+            flight = self._flights[registry_key] = _Flight()
+            return flight, registry_key, True
+
+    def _leave(self, registry_key, flight):
+        """Drop one caller; cancel the upstream work once nobody is left"""
+        with self._lock:
+            flight.subscribers -= 1
+            if flight.subscribers or flight.done:
+                return
+            flight.abandoned = True
+            if self._flights.get(registry_key) is flight:
+                del self._flights[registry_key]
+        flight.task.cancel()
+
+    def _finish(self, registry_key, flight):
+        """Unregister a flight once its upstream work has ended"""
+        with self._lock:
+            flight.done = True
+            if self._flights.get(registry_key) is flight:
+                del self._flights[registry_key]
+
+    async def call(self, key, fn, stage="other"):
+        """
+        Await fn once for all concurrent callers with the same key
+
+        Args:
+            key (str): Identifies the request
+            fn (callable): Returns an awaitable that performs the request
+            stage (str): Pipeline stage, for metrics
+
+        Returns:
+            The value the awaitable resolved to
+        """
+        flight, registry_key, leader = self._join("complete", key, stage)
+        if leader:
+            flight.task = asyncio.ensure_future(fn())
+            flight.task.add_done_callback(lambda task: self._finish(registry_key, flight))
+        try:
+            # Shielded so one caller's cancellation does not cancel the others' request
+            return await asyncio.shield(flight.task)
+        finally:
+            self._leave(registry_key, flight)
+
+    async def stream(self, key, fn, stage="other"):
+        """
+        Share one async stream between all concurrent callers with the same key
+
+        Args:
+            key (str): Identifies the request
+            fn (callable): Returns an async iterator of text deltas
+            stage (str): Pipeline stage, for metrics
+
+        Yields:
+            str: Every delta of the shared stream, from the beginning
+        """
+        flight, registry_key, leader = self._join("stream", key, stage)
+        if leader:
+            flight.changed = asyncio.Event()
+            flight.task = asyncio.ensure_future(self._pump(registry_key, fn, flight))
+
+        index = 0
+        try:
+            while True:
+                if index == len(flight.chunks) and not flight.done:
+                    await flight.changed.wait()
+                    continue
+                new = flight.chunks[index:]
+                index += len(new)
+                for delta in new:
+                    yield delta
+                if flight.done and index == len(flight.chunks):
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            self._leave(registry_key, flight)
+
+    async def _pump(self, registry_key, fn, flight):
+        """Read the upstream stream into the flight (runs as its own task)"""
+        deltas = fn()
+        try:
+            async for delta in deltas:
+                flight.chunks.append(delta)
+                # Wake the current waiters; later waits use a fresh event
+                flight.changed.set()
+                flight.changed = asyncio.Event()
+        except Exception as e:
+            flight.error = e
+        finally:
+            await deltas.aclose()
+            self._finish(registry_key, flight)
+            flight.changed.set()
+
+# Shared coalescers used by the LLM client
+single_flight = SingleFlight()
+async_single_flight = AsyncSingleFlight()
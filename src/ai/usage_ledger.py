@@ -0,0 +1,408 @@
+"""
+Append-only ledger of OpenAI token usage
+
+Every chat completion is logged to a local SQLite file with its model,
+pipeline stage, signed-in user, story structure, token counts, latency and
+estimated cost. Rows are only ever inserted, so the ledger doubles as an
+audit trail; rollup() aggregates it for billing questions, and
+check_budget() enforces an optional per-user daily token budget before a
+call is made.
+
+record() only queues the row: a background thread writes queued rows in
+batches, so recording never blocks a request (or the event loop) on SQLite.
+Budget checks use a per-user daily total kept in memory, read from SQLite
+once per user and day.
+"""
+
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# USD per million tokens as (prompt, cached prompt, completion), matched by
+# model name prefix; the longest matching prefix wins
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4-turbo": (10.00, 10.00, 30.00),
+    "gpt-4": (30.00, 30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+}
+
+# Columns rollup() can group by
+ROLLUP_COLUMNS = ("day", "username", "model", "stage", "structure_type", "outcome")
+
+class BudgetExceededError(Exception):
+    """Raised before an OpenAI call when the user has used up today's budget"""
+
+def cached_prompt_tokens(usage):
+    """
+    Prompt tokens a response reports as served from the provider's prompt cache
+
+    Args:
+        usage: The `usage` object of a chat completion (may be None)
+
+    Returns:
+        int: Cached prompt tokens, 0 if not reported
+    """
+    details = getattr(usage, "prompt_tokens_details", None) if usage is not None else None
+    return (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    """
+    Estimate the price of one call from MODEL_PRICES
+
+    Args:
+        model (str): Model name
+        prompt_tokens (int): Prompt tokens, cached ones included
+        completion_tokens (int): Completion tokens
+        cached_tokens (int): Prompt tokens served from the prompt cache
+
+    Returns:
+        float: Cost in USD, or None for models without a known price
+    """
+    matches = [prefix for prefix in MODEL_PRICES if (model or "").startswith(prefix)]
+    if not matches:
+        return None
+    prompt_price, cached_price, completion_price = MODEL_PRICES[max(matches, key=len)]
+    uncached = max(prompt_tokens - cached_tokens, 0)
+    return (uncached * prompt_price + cached_tokens * cached_price
+            + completion_tokens * completion_price) / 1_000_000
+
+def _today():
+    """Current UTC date as YYYY-MM-DD, the ledger's budget period"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+class UsageLedger:
+    """SQLite-backed, insert-only log of OpenAI calls"""
+
+    def __init__(self, db_path=None, daily_budget=None):
+        """
+        Initialize the ledger; the SQLite file is opened on first use
+
+        Args:
+            db_path (str): SQLite file path
+            daily_budget (int): Tokens each user may use per UTC day; 0 disables
+        """
+        self.db_path = db_path or settings.USAGE_LEDGER_PATH
+        self.daily_budget = settings.USER_DAILY_TOKEN_BUDGET if daily_budget is None else daily_budget
+        self._lock = threading.Lock()  # Guards the connection
+        self._conn = None
+        # Rows waiting for the writer thread, and (username, day) -> tokens
+        # for the users whose budget has been checked
+        self._pending = []
+        self._usage = {}
+        self._loading = {}  # (username, day) -> tokens recorded while its total is read
+        self._pending_ready = threading.Condition()
+        self._writer = None
+
+    def _open(self):
+        """Open the SQLite file and create the schema (caller holds the lock)"""
+        if self._conn is not None:
+            return
+
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_calls (
+                id INTEGER PRIMARY KEY,
+                created_at REAL NOT NULL,
+                day TEXT NOT NULL,
+                username TEXT,
+                model TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                structure_type TEXT,
+                outcome TEXT NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                cached_tokens INTEGER NOT NULL,
+                latency REAL NOT NULL,
+                cost_usd REAL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_calls_user_day ON llm_calls (username, day)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_day ON llm_calls (day)")
+        # Append-only: refuse to rewrite history
+        for action in ("UPDATE", "DELETE"):
+            self._conn.execute(
+                f"""CREATE TRIGGER IF NOT EXISTS llm_calls_no_{action.lower()}
+                BEFORE {action} ON llm_calls
+                BEGIN SELECT RAISE(ABORT, 'usage ledger is append-only'); END"""
+            )
+        self._conn.commit()
+
+    def record(self, model, stage, usage=None, latency=0.0, outcome="ok", username=None, structure_type=None):
+        """
+        Append one call to the ledger
+
+        Args:
+            model (str): Model the call used
+            stage (str): Pipeline stage, e.g. "outline" or "article_section"
+            usage: The `usage` object of the response (None if unknown)
+            latency (float): Seconds the call took, retries included
+            outcome (str): "ok" or "error"
+            username (str): Signed-in user, or None
+            structure_type (str): Story structure, or None
+        """
+        prompt_tokens = completion_tokens = cached_tokens = 0
+        if usage is not None:
+            prompt_tokens = usage.prompt_tokens or 0
+            completion_tokens = usage.completion_tokens or 0
+            cached_tokens = cached_prompt_tokens(usage)
+
+        now = time.time()
+        row = (
+            now, datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d"),
+            username, model, stage, structure_type, outcome,
+            prompt_tokens, completion_tokens, cached_tokens, latency,
+            estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        )
+        with self._pending_ready:
+            self._pending.append(row)
+            key = (username, row[1])
+            if key in self._usage:
+                self._usage[key] += prompt_tokens + completion_tokens
+            elif key in self._loading:
+                self._loading[key] += prompt_tokens + completion_tokens
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="usage-ledger", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+            self._pending_ready.notify()
+
+    def _write_pending(self):
+        """Insert every queued row in one transaction (caller holds the lock)"""
+        with self._pending_ready:
+            rows, self._pending = self._pending, []
+        self._insert(rows)
+
+    def _insert(self, rows):
+        """Insert rows in one transaction (caller holds the lock)"""
+        if not rows:
+            return
+        self._open()
+        self._conn.executemany(
+            "INSERT INTO llm_calls (created_at, day, username, model, stage, structure_type, outcome, "
+            "prompt_tokens, completion_tokens, cached_tokens, latency, cost_usd) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        self._conn.commit()
+
+    def flush(self):
+        """Write queued rows now"""
+        try:
+            with self._lock:
+                self._write_pending()
+        except Exception as e:
+            logger.warning("Could not write usage ledger entries: %s", e)
+
+    def _write_loop(self):
+        """Writer thread: write rows as they are queued; bursts share a transaction"""
+        while True:
+            with self._pending_ready:
+                while not self._pending:
+                    self._pending_ready.wait()
+            self.flush()
+
+    def tokens_used(self, username, day=None):
+        """
+        Tokens a user has used on one UTC day
+
+        Args:
+            username (str): User to look up
+            day (str): YYYY-MM-DD, today if omitted
+
+        Returns:
+            int: Prompt plus completion tokens
+        """
+        with self._lock:
+            self._write_pending()
+            self._open()
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM llm_calls "
+                "WHERE username = ? AND day = ?",
+                (username, day or _today())
+            ).fetchone()
+        return row[0]
+
+    def check_budget(self, username):
+        """
+        Refuse a call when the user has used up today's token budget
+
+        Anonymous calls (no signed-in user) are not budgeted.
+
+        Args:
+            username (str): Signed-in user, or None
+
+        Raises:
+            BudgetExceededError: If the budget is set and already used up
+        """
+        if not self.daily_budget or not username:
+            return
+        key = (username, _today())
+        with self._pending_ready:
+            used = self._usage.get(key)
+        if used is None:
+            used = self._load_usage(key)
+        if used >= self.daily_budget:
+            raise BudgetExceededError(
+                f"Daily token budget reached for {username} "
+                f"({used:,} of {self.daily_budget:,} tokens). It resets at midnight UTC."
+            )
+
+    def _load_usage(self, key):
+        """
+        Read a user's total for the day from the database into memory
+
+        Queued rows are written before the read, and calls recorded while it
+        runs are counted in _loading, so none is missed or counted twice.
+
+        Args:
+            key (tuple): (username, day)
+
+        Returns:
+            int: Tokens used
+        """
+        with self._lock:
+            with self._pending_ready:
+                if key in self._usage:
+                    # Loaded by a concurrent check while this one waited
+                    return self._usage[key]
+                rows, self._pending = self._pending, []
+                self._loading[key] = 0
+            try:
+                self._insert(rows)
+                self._open()
+                row = self._conn.execute(
+                    "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM llm_calls "
+                    "WHERE username = ? AND day = ?",
+                    key
+                ).fetchone()
+            finally:
+                with self._pending_ready:
+                    recorded = self._loading.pop(key)
+            with self._pending_ready:
+                # Forget earlier days
+                self._usage = {
+                    other: tokens for other, tokens in self._usage.items() if other[1] == key[1]
+                }
+                used = self._usage[key] = row[0] + recorded
+        return used
+
+    def rollup(self, group_by=("day",), since=None, until=None, username=None):
+        """
+        Aggregate the ledger
+
+        Args:
+            group_by (tuple): Columns from ROLLUP_COLUMNS to group by
+            since (str): First day to include (YYYY-MM-DD), inclusive
+            until (str): Last day to include (YYYY-MM-DD), inclusive
+            username (str): Only include this user's calls
+
+        Returns:
+            list: One dict per group with calls, errors, token totals,
+                average latency and cost_usd, largest token total first
+        """
+        group_by = tuple(group_by)
+        unknown = [column for column in group_by if column not in ROLLUP_COLUMNS]
+        if unknown:
+            raise ValueError(f"Cannot group usage by {', '.join(unknown)}")
+
+        where, args = [], []
+        for clause, value in (("day >= ?", since), ("day <= ?", until), ("username = ?", username)):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+
+        columns = ", ".join(group_by)
+        query = (
+            f"SELECT {columns + ', ' if columns else ''}COUNT(*), "
+            "SUM(outcome != 'ok'), SUM(prompt_tokens), SUM(completion_tokens), "
+            "SUM(cached_tokens), AVG(latency), SUM(cost_usd) FROM llm_calls"
+        )
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        if columns:
+            query += f" GROUP BY {columns}"
+        query += " ORDER BY SUM(prompt_tokens + completion_tokens) DESC"
+
+        with self._lock:
+            self._write_pending()
+            self._open()
+            rows = self._conn.execute(query, args).fetchall()
+
+        results = []
+        for row in rows:
+            keys = dict(zip(group_by, row))
+            calls, errors, prompt_tokens, completion_tokens, cached_tokens, latency, cost = row[len(group_by):]
+            if not calls:
+                continue
+            results.append({
+                **keys,
+                "calls": calls,
+                "errors": errors,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cached_tokens": cached_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "avg_latency": round(latency, 3),
+                "cost_usd": round(cost, 6) if cost is not None else None
+            })
+        return results
+
+# Global usage ledger instance, created on first use
+_usage_ledger = None
+_usage_ledger_lock = threading.Lock()
+
+def get_usage_ledger():
+    """
+    Get the global usage ledger, creating it on first use
+
+    Returns:
+        UsageLedger: Shared ledger, or None when the ledger is disabled
+    """
+    global _usage_ledger
+    if not settings.USAGE_LEDGER_ENABLED:
+        return None
+    if _usage_ledger is None:
+        with _usage_ledger_lock:
+            if _usage_ledger is None:
+                _usage_ledger = UsageLedger()
+    return _usage_ledger
+
+def main(argv=None):
+    """Print a usage rollup, e.g. `python -m src.ai.usage_ledger --by username day`"""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Summarize OpenAI token usage from the ledger")
+    parser.add_argument("--by", nargs="*", default=["day"], choices=ROLLUP_COLUMNS,
+                        help="Columns to group by (default: day)")
+    parser.add_argument("--since", help="First day to include, YYYY-MM-DD")
+    parser.add_argument("--until", help="Last day to include, YYYY-MM-DD")
+    parser.add_argument("--user", help="Only this user's calls")
+    args = parser.parse_args(argv)
+
+    ledger = UsageLedger()
+    rows = ledger.rollup(group_by=args.by, since=args.since, until=args.until, username=args.user)
+    print(json.dumps(rows, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+Headless batch generation for the Reflective Story Article Generator
+
+Reads story parameters from a JSONL file (one JSON object per line) and runs
+outline -> article -> export for every line without the Gradio UI:
+
+    python src/batch.py stories.jsonl --output results.jsonl --concurrency 8
+
+Each input line accepts the same fields as the UI: structure_type, theme,
+audience, length, style and key_messages, plus an optional "id". Results are
+appended to the output file as soon as each item finishes. The output file is
+also the checkpoint: re-running the same command skips items that already
+completed, so an interrupted run resumes where it stopped.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import sys
+import time
+
+# Add parent directory to Python path so we can import config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import settings
+from src.ai.llm_client import call_context, track_usage
+from src.ai.outline_generator import get_outline_generator
+from src.ai.article_generator import get_article_generator
+from src.export.bulk_export import stream_zip
+from src.export.export_handler import ExportHandler
+from src.utils.validators import validator
+from src.utils.text import strip_status_header
+
+# Result statuses that count as finished when resuming
+FINAL_STATUSES = ("ok", "invalid")
+
+def read_items(input_path):
+    """
+    Read story parameter items from a JSONL file
+    
+    Args:
+        input_path (str): Path to the JSONL input
+        
+    Yields:
+        dict: Item with an "id" (defaults to the 1-based line number)
+    """
+    with open(input_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                item = {"_error": f"Invalid JSON on line {line_number}: {e}"}
+            if not isinstance(item, dict):
+                item = {"_error": f"Invalid JSON on line {line_number}: expected an object, "
+                                  f"got {type(item).__name__}"}
+            item["id"] = str(item.get("id", line_number))
+            yield item
+
+def load_checkpoint(output_path):
+    """
+    Collect the ids of items already finished in a previous run
+    
+    Args:
+        output_path (str): Path to the results JSONL
+        
+    Returns:
+        set: Ids with a final status
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partially written line from an interrupted run
+            if result.get("status") in FINAL_STATUSES:
+                done.add(str(result.get("id")))
+    return done
+
+class BatchRunner:
+    """Runs the generation pipeline over many items with bounded concurrency"""
+    
+    def __init__(self, output_path, concurrency=4, formats=("txt", "pdf"),
+                 export_dir="batch_output", use_cache=True):
+        """
+        Initialize the runner
+        
+        Args:
+            output_path (str): Results JSONL, also used as the checkpoint
+            concurrency (int): Maximum number of items in flight
+            formats (tuple): Export formats to produce ("txt", "pdf")
+            export_dir (str): Directory for exported files; keep it apart from
+                the UI's downloads/, whose retention deletes old files
+            use_cache (bool): Allow cached outline/article responses
+        """
+        self.output_path = output_path
+        self.concurrency = max(1, concurrency)
+        self.formats = formats
+        self.use_cache = use_cache
+        self.export_handler = ExportHandler(export_dir)
+        
+        self.started = None
+        self.completed = 0
+        self.failed = 0
+        self.tokens = 0
+        self._write_lock = asyncio.Lock()
+    
+    async def run(self, items, total=None):
+        """
+        Process items, writing each result as soon as it is ready
+        
+        Args:
+            items (iterable): Items from read_items() not yet completed
+            total (int): Number of items to process, for progress output
+        """
+        self.started = time.monotonic()
+        self.total = total
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        
+        with open(self.output_path, "a", encoding="utf-8") as output:
+            workers = [
+                asyncio.create_task(self._worker(queue, output))
+                for _ in range(self.concurrency)
+            ]
+            for item in items:
+                await queue.put(item)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        
+        self._print_summary()
+    
+    async def _worker(self, queue, output):
+        """Take items off the queue until the stop marker arrives"""
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            result = await self.process_item(item)
+            await self._write_result(output, result)
+    
+    async def process_item(self, item):
+        """
+        Run validation, outline, article and exports for one item
+        
+        Args:
+            item (dict): Story parameters
+            
+        Returns:
+            dict: Result record for the output file
+        """
+        started = time.monotonic()
+        result = {"id": item["id"]}
+        
+        if "_error" in item:
+            result.update(status="invalid", error=item["_error"])
+            return result
+        
+        structure_type = item.get("structure_type", "")
+        theme = item.get("theme", "")
+        audience = item.get("audience", "")
+        style = item.get("style", "")
+        key_messages = item.get("key_messages", "")
+        try:
+            length = int(item.get("length", settings.DEFAULT_WORD_COUNT))
+        except (TypeError, ValueError):
+            result.update(status="invalid", error="❌ Word count must be a number.")
+            return result
+        
+        is_valid, error_message = validator.validate_parameters(
+            structure_type, theme, audience, length, style, key_messages
+        )
+        if not is_valid:
+            result.update(status="invalid", error=error_message)
+            return result
+        
+        with track_usage() as usage, call_context(structure_type=structure_type):
+            outline = await get_outline_generator().agenerate_outline(
+                structure_type, theme, audience, length, style, key_messages,
+                use_cache=self.use_cache
+            )
+            if not outline.startswith("✅"):
+                result.update(status="error", stage="outline", error=outline)
+                return self._finish(result, usage, started)
+            outline_content = strip_status_header(outline)
+            
+            article = await get_article_generator().agenerate_article(
+                outline_content, theme, audience, length, style, key_messages,
+                use_cache=self.use_cache
+            )
+            if not article.startswith("✅"):
+                result.update(status="error", stage="article", outline=outline_content, error=article)
+                return self._finish(result, usage, started)
+        
+        result.update(outline=outline_content, article=strip_status_header(article))
+        
+        try:
+            result["files"] = await self._export(article, structure_type, theme, audience, length)
+        except Exception as e:
+            result.update(status="error", stage="export", error=str(e))
+            return self._finish(result, usage, started)
+        
+        result["status"] = "ok"
+        return self._finish(result, usage, started)
+    
+    async def _export(self, article, structure_type, theme, audience, length):
+        """Write the requested export formats off the event loop"""
+        exporters = {
+            "txt": self.export_handler.export_to_txt,
+            "pdf": self.export_handler.export_to_pdf
+        }
+        loop = asyncio.get_running_loop()
+        files = {}
+        for fmt in self.formats:
+            filename, _ = await loop.run_in_executor(
+                None,
+                functools.partial(exporters[fmt], article, theme, audience, length, structure_type)
+            )
+            files[fmt] = os.path.join(self.export_handler.downloads_dir, filename)
+        return files
+    
+    def _finish(self, result, usage, started):
+        """Attach token usage and timing to a result"""
+        result["tokens"] = {
+            "prompt": usage.prompt_tokens,
+            "completion": usage.completion_tokens,
+            "cached": usage.cached_tokens,
+            "total": usage.total_tokens
+        }
+        result["seconds"] = round(time.monotonic() - started, 2)
+        return result
+    
+    async def _write_result(self, output, result):
+        """Append one result line and report progress"""
+        async with self._write_lock:
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            os.fsync(output.fileno())
+            
+            self.completed += 1
+            if result["status"] != "ok":
+                self.failed += 1
+            self.tokens += result.get("tokens", {}).get("total", 0)
+            self._print_progress(result)
+    
+    def _rates(self):
+        """Return (items per minute, tokens per minute) since the run started"""
+        minutes = max(time.monotonic() - self.started, 1e-6) / 60
+        return self.completed / minutes, self.tokens / minutes
+    
+    def _print_progress(self, result):
+        """Print one progress line for a finished item"""
+        items_per_min, tokens_per_min = self._rates()
+        icon = "✅" if result["status"] == "ok" else "❌"
+        total = f"/{self.total}" if self.total is not None else ""
+        print(f"[{self.completed}{total}] {icon} {result['id']} ({result['status']}) | "
+              f"{items_per_min:.1f} items/min | {tokens_per_min:,.0f} tokens/min")
+    
+    def _print_summary(self):
+        """Print totals for the run"""
+        items_per_min, tokens_per_min = self._rates()
+        elapsed = time.monotonic() - self.started
+        print(f"Done: {self.completed} items ({self.failed} failed) in {elapsed:.1f}s | "
+              f"{items_per_min:.1f} items/min | {tokens_per_min:,.0f} tokens/min")
+
+def write_zip(results_path, zip_path, export_handler):
+    """
+    Package the exported files of all successful results into one ZIP
+    
+    The archive streams to disk member by member, so its size is not
+    limited by memory. Resumed runs include files from earlier runs.
+    
+    Args:
+        results_path (str): Results JSONL written by BatchRunner
+        zip_path (str): Archive to create
+        export_handler (ExportHandler): Handler whose store holds the files
+        
+    Returns:
+        int: Number of files added
+    """
+    entries = []
+    with open(results_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if result.get("status") != "ok":
+                continue
+            for fmt, path in result.get("files", {}).items():
+                entries.append((f"{result['id']}.{fmt}", os.path.basename(path)))
+    
+    with open(zip_path, "wb") as archive:
+        for chunk in stream_zip(export_handler.store, entries):
+            archive.write(chunk)
+    return len(entries)
+
+def parse_args(argv=None):
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Generate reflective story articles in bulk from a JSONL parameter file."
+    )
+    parser.add_argument("input", help="JSONL file with one set of story parameters per line")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl",
+                        help="Results JSONL, also used to resume interrupted runs (default: %(default)s)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4,
+                        help="Number of items generated at the same time (default: %(default)s)")
+    parser.add_argument("--formats", default="txt,pdf",
+                        help="Comma-separated export formats: txt, pdf (default: %(default)s)")
+    parser.add_argument("--export-dir", default="batch_output",
+                        help="Directory for exported files (default: %(default)s)")
+    parser.add_argument("--zip", metavar="PATH",
+                        help="Also package every exported file of the run into this ZIP archive")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always call the model instead of reusing cached responses")
+    
+    args = parser.parse_args(argv)
+    args.formats = tuple(fmt.strip().lower() for fmt in args.formats.split(",") if fmt.strip())
+    unknown = [fmt for fmt in args.formats if fmt not in ("txt", "pdf")]
+    if unknown:
+        parser.error(f"unknown export format(s): {', '.join(unknown)}")
+    return args
+
+def main(argv=None):
+    """Run a batch from the command line"""
+    args = parse_args(argv)
+    logging.basicConfig(level=settings.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    
+    done = load_checkpoint(args.output)
+    pending = [item for item in read_items(args.input) if item["id"] not in done]
+    if done:
+        print(f"Resuming: {len(done)} items already completed in {args.output}")
+    print(f"📚 Processing {len(pending)} items with concurrency {args.concurrency}")
+    
+    runner = BatchRunner(
+        args.output,
+        concurrency=args.concurrency,
+        formats=args.formats,
+        export_dir=args.export_dir,
+        use_cache=not args.no_cache
+    )
+    asyncio.run(runner.run(pending, total=len(pending)))
+    
+    if args.zip:
+        count = write_zip(args.output, args.zip, runner.export_handler)
+        print(f"📦 Wrote {count} files to {args.zip}")
+
+if __name__ == "__main__":
+    main()
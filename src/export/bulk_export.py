@@ -0,0 +1,83 @@
+"""
+Streaming ZIP archives of exported articles
+
+The archive is produced while it is being sent: each member is rendered (or
+taken from the export store), compressed into the ZIP stream and handed to
+the caller chunk by chunk. Only the current chunk is held in memory, never
+the whole archive.
+"""
+
+import re
+import zipfile
+
+class _ZipPipe:
+    """
+    Write-only, non-seekable file object that collects ZIP output
+
+    zipfile writes data descriptors instead of seeking back when the target
+    cannot seek, which is what makes streaming possible.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Return and forget everything written since the last drain"""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def member_name(index, theme, fmt):
+    """
+    Archive path for one article export, e.g. "03_finding-courage.pdf"
+
+    Args:
+        index (int): One-based article position
+        theme (str): Article theme, used as a readable slug
+        fmt (str): File extension
+
+    Returns:
+        str: Member name
+    """
+    slug = re.sub(r"[^a-z0-9]+", "-", (theme or "").lower()).strip("-")[:40] or "article"
+    return f"{index:02d}_{slug}.{fmt}"
+
+def stream_zip(store, entries):
+    """
+    Build a ZIP archive from stored exports as a stream of chunks
+
+    Args:
+        store (ExportStore or MemoryExportStore): Where the exports live
+        entries (iterable): (member_name, stored_filename) pairs; consumed
+            lazily, so members can be rendered while the archive streams
+
+    Yields:
+        bytes: Consecutive chunks of the archive
+    """
+    pipe = _ZipPipe()
+    archive = zipfile.ZipFile(pipe, "w", compression=zipfile.ZIP_DEFLATED)
+    try:
+        for name, filename in entries:
+            with archive.open(name, "w") as member:
+                for chunk in store.iter_bytes(filename):
+                    member.write(chunk)
+                    data = pipe.drain()
+                    if data:
+                        yield data
+            yield pipe.drain()
+    finally:
+        # Writes the central directory
+        archive.close()
+    yield pipe.drain()
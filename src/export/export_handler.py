@@ -1,30 +1,60 @@
 """
-Export functionality for generated articles with Flask server integration
+Export functionality for generated articles served by the download routes
 """
 
+import json
 import os
-import shutil
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_LEFT, TA_CENTER
+from xml.sax.saxutils import escape
+from config.settings import settings
+from src.export.bulk_export import member_name, stream_zip
+from src.export.export_store import ExportStore, MemoryExportStore
+from src.export.markdown_document import parse_markdown
+from src.export.pdf_renderer import get_pdf_renderer
+from src.utils.metrics import metrics
+
+# Bulk archives waiting to be downloaded; older ones are forgotten first
+MAX_BULK_ARCHIVES = 64
+
+# result is "created" (rendered now), "cached" (already stored) or "error"
+EXPORTS = metrics.counter("story_exports_total", "Article exports by format and result", ("format", "result"))
+EXPORT_LATENCY = metrics.histogram(
+    "story_export_seconds", "Time to produce an export, including rendering", ("format", "result")
+)
 
 class ExportHandler:
     """Handles exporting articles to various formats"""
     
-    def __init__(self):
-        """Initialize the export handler"""
-        # Create downloads directory for Flask server
-        self.downloads_dir = "downloads"
-        if not os.path.exists(self.downloads_dir):
-            os.makedirs(self.downloads_dir)
+    def __init__(self, downloads_dir="downloads", retention=None, store=None):
+        """
+        Initialize the export handler
+        
+        Args:
+            downloads_dir (str): Directory exported files are written to
+            retention (DownloadRetention): Optional age/size limits for the directory
+            store (MemoryExportStore): Keep exports in memory instead of
+                writing them to downloads_dir
+        """
+        self.downloads_dir = downloads_dir
+        if store is not None:
+            self.store = store
+        else:
+            # Create downloads directory served by the download route
+            self.store = ExportStore(self.downloads_dir, retention=retention)
+        
+        # Bulk archive filename -> (articles, formats), streamed on download
+        self._archives = OrderedDict()
+        self._archives_lock = threading.Lock()
     
     def export_to_txt(self, article_content, theme, audience, word_count, structure_type=None):
         """
         Export article to plain text file for download
         
+        Exporting the same article with the same metadata again returns the
+        existing file.
+        
         Args:
             article_content (str): The generated article content
             theme (str): Article theme
@@ -36,32 +66,37 @@ class ExportHandler:
             tuple: (filename, download_url) for the created file
         """
         try:
-            # Clean the article content (remove markdown formatting if present)
-            clean_content = self._clean_content_for_txt(article_content)
-            
-            # Create filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"reflective_article_{timestamp}.txt"
-            filepath = os.path.join(self.downloads_dir, filename)
+            key = self.store.make_key(
+                "txt", article_content, theme=theme, audience=audience,
+                word_count=word_count, structure_type=structure_type
+            )
             
-            # Create the text file with metadata header
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write("=" * 60 + "\n")
-                f.write("REFLECTIVE STORY ARTICLE\n")
-                f.write("=" * 60 + "\n\n")
-                f.write(f"Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}\n")
-                f.write(f"Theme: {theme}\n")
-                f.write(f"Target Audience: {audience}\n")
+            def write(f):
+                # Markdown becomes plain text (parsed once per article for all formats)
+                clean_content = parse_markdown(article_content).to_text()
+                
+                # Create the text file with metadata header
+                lines = [
+                    "=" * 60 + "\n",
+                    "REFLECTIVE STORY ARTICLE\n",
+                    "=" * 60 + "\n\n",
+                    f"Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}\n",
+                    f"Theme: {theme}\n",
+                    f"Target Audience: {audience}\n"
+                ]
                 if structure_type:
-                    f.write(f"Story Structure: {structure_type}\n")
-                f.write(f"Target Word Count: {word_count} words\n")
-                f.write("\n" + "-" * 60 + "\n\n")
-                f.write(clean_content)
-                f.write("\n\n" + "-" * 60 + "\n")
-                f.write("Generated by Reflective Story Article Generator\n")
+                    lines.append(f"Story Structure: {structure_type}\n")
+                lines.append(f"Target Word Count: {word_count} words\n")
+                lines.append("\n" + "-" * 60 + "\n\n")
+                lines.append(clean_content)
+                lines.append("\n\n" + "-" * 60 + "\n")
+                lines.append("Generated by Reflective Story Article Generator\n")
+                f.write("".join(lines).encode("utf-8"))
+            
+            filename = self._save(key, "txt", write)
             
             # Return filename and download URL
-            download_url = f"http://127.0.0.1:5001/download/{filename}"
+            download_url = self.download_url(filename)
             return filename, download_url
             
         except Exception as e:
@@ -71,6 +106,9 @@ class ExportHandler:
         """
         Export article to PDF file for download
         
+        Exporting the same article with the same metadata again returns the
+        existing file without rendering it again.
+        
         Args:
             article_content (str): The generated article content
             theme (str): Article theme
@@ -82,137 +120,120 @@ class ExportHandler:
             tuple: (filename, download_url) for the created file
         """
         try:
-            # Create filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"reflective_article_{timestamp}.pdf"
-            filepath = os.path.join(self.downloads_dir, filename)
-            
-            # Create PDF document
-            doc = SimpleDocTemplate(filepath, pagesize=letter,
-                                  rightMargin=72, leftMargin=72,
-                                  topMargin=72, bottomMargin=18)
-            
-            # Get styles
-            styles = getSampleStyleSheet()
-            
-            # Create custom styles
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=18,
-                spaceAfter=30,
-                alignment=TA_CENTER
-            )
-            
-            meta_style = ParagraphStyle(
-                'MetaInfo',
-                parent=styles['Normal'],
-                fontSize=10,
-                spaceAfter=6,
-                leftIndent=20
-            )
-            
-            body_style = ParagraphStyle(
-                'BodyText',
-                parent=styles['Normal'],
-                fontSize=12,
-                spaceAfter=12,
-                alignment=TA_LEFT,
-                leftIndent=0,
-                rightIndent=0,
-                firstLineIndent=20
+            key = self.store.make_key(
+                "pdf", article_content, theme=theme, audience=audience,
+                word_count=word_count, structure_type=structure_type
             )
             
-            # Build PDF content
-            story = []
-            
-            # Title
-            story.append(Paragraph("Reflective Story Article", title_style))
-            story.append(Spacer(1, 20))
-            
-            # Metadata
-            story.append(Paragraph(f"<b>Generated on:</b> {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", meta_style))
-            story.append(Paragraph(f"<b>Theme:</b> {theme}", meta_style))
-            story.append(Paragraph(f"<b>Target Audience:</b> {audience}", meta_style))
-            if structure_type:
-                story.append(Paragraph(f"<b>Story Structure:</b> {structure_type}", meta_style))
-            story.append(Paragraph(f"<b>Target Word Count:</b> {word_count} words", meta_style))
-            
-            story.append(Spacer(1, 30))
-            
-            # Article content
-            clean_content = self._clean_content_for_pdf(article_content)
-            paragraphs = clean_content.split('\n\n')
-            
-            for para in paragraphs:
-                if para.strip():
-                    story.append(Paragraph(para.strip(), body_style))
-                    story.append(Spacer(1, 12))
-            
-            # Footer
-            story.append(Spacer(1, 30))
-            footer_style = ParagraphStyle(
-                'Footer',
-                parent=styles['Normal'],
-                fontSize=9,
-                alignment=TA_CENTER
-            )
-            story.append(Paragraph("Generated by Reflective Story Article Generator", footer_style))
+            def write(f):
+                # Article content as escaped reportlab markup
+                blocks = parse_markdown(article_content).to_pdf_blocks()
+                
+                # Metadata shown under the title
+                metadata = [
+                    ("Generated on", datetime.now().strftime('%B %d, %Y at %I:%M %p')),
+                    ("Theme", escape(str(theme))),
+                    ("Target Audience", escape(str(audience)))
+                ]
+                if structure_type:
+                    metadata.append(("Story Structure", escape(str(structure_type))))
+                metadata.append(("Target Word Count", f"{escape(str(word_count))} words"))
+                
+                # Layout runs in the render pool so it does not hold this process's GIL
+                f.write(get_pdf_renderer().render(blocks, metadata))
             
-            # Build PDF
-            doc.build(story)
+            filename = self._save(key, "pdf", write)
             
             # Return filename and download URL
-            download_url = f"http://127.0.0.1:5001/download/{filename}"
+            download_url = self.download_url(filename)
             return filename, download_url
             
         except Exception as e:
             raise Exception(f"Error creating PDF file: {str(e)}")
     
-    def _clean_content_for_txt(self, content):
+    def _save(self, key, fmt, write):
+        """Store an export, recording whether it was rendered or reused"""
+        with EXPORT_LATENCY.time(format=fmt, result="error") as labels:
+            try:
+                filename, created = self.store.save(key, fmt, write)
+            except Exception:
+                EXPORTS.inc(format=fmt, result="error")
+                raise
+            labels["result"] = "created" if created else "cached"
+        EXPORTS.inc(format=fmt, result=labels["result"])
+        return filename
+    
+    def export_bulk(self, articles, formats=("txt", "pdf")):
         """
-        Clean content for text export (remove markdown, etc.)
+        Register a ZIP archive of many articles in one or more formats
+        
+        Nothing is rendered here. The archive is built and streamed when its
+        download link is opened, reusing any exports that already exist.
         
         Args:
-            content (str): Raw content
+            articles (list): Dicts with article_content, theme, audience,
+                word_count and optionally structure_type
+            formats (tuple): Formats to include per article ("txt", "pdf")
             
         Returns:
-            str: Cleaned content
+            tuple: (filename, download_url) for the archive
         """
-        # Remove success message if present
-        if content.startswith("✅"):
-            lines = content.split('\n')
-            if len(lines) > 2:
-                content = '\n'.join(lines[2:])
+        unknown = [fmt for fmt in formats if fmt not in ("txt", "pdf")]
+        if unknown:
+            raise ValueError(f"Unknown export format(s): {', '.join(unknown)}")
+        if not articles:
+            raise ValueError("No articles to export")
         
-        # Basic markdown cleanup
-        cleaned = content.replace('**', '')  # Remove bold markers
-        cleaned = cleaned.replace('*', '')   # Remove italic markers
-        cleaned = cleaned.replace('#', '')   # Remove header markers
+        articles = [dict(article) for article in articles]
+        key = self.store.make_key("zip", json.dumps(articles, sort_keys=True, default=str), formats=list(formats))
+        filename = f"reflective_articles_{key[:20]}.zip"
+        with self._archives_lock:
+            self._archives[filename] = (articles, tuple(formats))
+            self._archives.move_to_end(filename)
+            while len(self._archives) > MAX_BULK_ARCHIVES:
+                self._archives.popitem(last=False)
         
-        return cleaned.strip()
+        return filename, self.download_url(filename)
+    
+    def _bulk_entries(self, articles, formats):
+        """Export each article lazily and yield (member name, stored filename)"""
+        exporters = {"txt": self.export_to_txt, "pdf": self.export_to_pdf}
+        for index, article in enumerate(articles, start=1):
+            for fmt in formats:
+                filename, _ = exporters[fmt](
+                    article["article_content"], article.get("theme", ""), article.get("audience", ""),
+                    article.get("word_count", ""), article.get("structure_type")
+                )
+                yield member_name(index, article.get("theme"), fmt), filename
     
-    def _clean_content_for_pdf(self, content):
+    def open_archive(self, filename):
         """
-        Clean content for PDF export (handle basic formatting)
+        Stream a registered bulk archive
         
         Args:
-            content (str): Raw content
+            filename (str): Archive filename from export_bulk
             
         Returns:
-            str: Content with basic HTML formatting for PDF
+            iterator: ZIP bytes in chunks, or None if the archive is unknown
         """
-        # Remove success message if present
-        if content.startswith("✅"):
-            lines = content.split('\n')
-            if len(lines) > 2:
-                content = '\n'.join(lines[2:])
-        
-        # Convert basic markdown to HTML for PDF
-        cleaned = content.replace('**', '<b>', 1)  # First bold
-        cleaned = cleaned.replace('**', '</b>', 1)  # Close bold
+        with self._archives_lock:
+            job = self._archives.get(filename)
+        if job is None:
+            return None
+        articles, formats = job
+        return stream_zip(self.store, self._bulk_entries(articles, formats))
+    
+    def download_url(self, filename):
+        """
+        Build the link the UI shows for an exported file
         
-        return cleaned.strip()
+        Args:
+            filename (str): Exported filename
+            
+        Returns:
+            str: URL under DOWNLOAD_BASE_URL, or a root-relative URL
+        """
+        return f"{settings.DOWNLOAD_BASE_URL}/download/{filename}"
     
     def get_file_size(self, filepath):
         """
@@ -225,15 +246,53 @@ class ExportHandler:
             str: File size string
         """
         try:
-            size_bytes = os.path.getsize(filepath)
-            if size_bytes < 1024:
-                return f"{size_bytes} bytes"
-            elif size_bytes < 1024 * 1024:
-                return f"{size_bytes / 1024:.1f} KB"
-            else:
-                return f"{size_bytes / (1024 * 1024):.1f} MB"
+            return self._format_size(os.path.getsize(filepath))
         except:
             return "Unknown size"
+    
+    def get_export_size(self, filename):
+        """
+        Get the size of an export in human-readable format, wherever it is stored
+        
+        Args:
+            filename (str): Exported filename
+            
+        Returns:
+            str: File size string
+        """
+        size_bytes = self.store.size(filename)
+        return "Unknown size" if size_bytes is None else self._format_size(size_bytes)
+    
+    def _format_size(self, size_bytes):
+        """Format a byte count for display"""
+        if size_bytes < 1024:
+            return f"{size_bytes} bytes"
+        elif size_bytes < 1024 * 1024:
+            return f"{size_bytes / 1024:.1f} KB"
+        else:
+            return f"{size_bytes / (1024 * 1024):.1f} MB"
+
+# Global export handler instance, created on first use
+_export_handler = None
+
+def get_export_handler():
+    """
+    Get the global export handler, creating it on first use
+    
+    Returns:
+        ExportHandler: Shared export handler
+    """
+    global _export_handler
+    if _export_handler is None:
+        if settings.EXPORT_STORAGE == "memory":
+            _export_handler = ExportHandler(store=MemoryExportStore())
+        else:
+            from src.export.retention import get_download_retention
+            _export_handler = ExportHandler(retention=get_download_retention())
+    return _export_handler
 
-# Create global export handler instance
-export_handler = ExportHandler()
\ No newline at end of file
+def __getattr__(name):
+    """Keep `from src.export.export_handler import export_handler` working"""
+    if name == "export_handler":
+        return get_export_handler()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
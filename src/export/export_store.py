@@ -0,0 +1,304 @@
+"""
+Content-addressed storage for exported files
+
+Every export is named after a hash of its format, content and metadata, so
+exporting the same article twice returns the file that already exists instead
+of rendering it again, and different articles can never overwrite each other.
+Files are written to a temporary name in the same directory and renamed into
+place, so the file server never sees a half-written file.
+
+MemoryExportStore keeps the same names but holds the bytes in a bounded
+in-memory cache, for deployments that cannot or should not write to disk.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class ExportStore:
+    """Writes export files atomically under content-derived names"""
+
+    def __init__(self, directory, prefix="reflective_article", retention=None):
+        """
+        Args:
+            directory (str): Directory the files live in (created if missing)
+            prefix (str): Filename prefix before the content hash
+            retention (DownloadRetention): Optional retention notified of
+                every file returned or created
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.retention = retention
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._key_locks = {}  # key -> [lock, waiters]
+
+    @staticmethod
+    def make_key(fmt, content, **metadata):
+        """
+        Hash an export's format, content and metadata
+
+        Args:
+            fmt (str): File extension, e.g. "txt" or "pdf"
+            content (str): Article content as it will be exported
+            **metadata: Values shown in the file (theme, audience, ...)
+
+        Returns:
+            str: Hex digest identifying the export
+        """
+        payload = json.dumps(
+            {"format": fmt, "content": content, "metadata": metadata},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def filename_for(self, key, fmt):
+        """Filename for a key; 20 hex characters keep collisions out of reach"""
+        return f"{self.prefix}_{key[:20]}.{fmt}"
+
+    def path_for(self, filename):
+        """Absolute location of a stored file"""
+        return os.path.join(self.directory, filename)
+
+    def size(self, filename):
+        """Size of a stored file in bytes, or None if it does not exist"""
+        try:
+            return os.path.getsize(self.path_for(filename))
+        except OSError:
+            return None
+
+    def iter_bytes(self, filename, chunk_size=64 * 1024):
+        """
+        Read a stored file in chunks
+
+        Yields:
+            bytes: Consecutive chunks of the file
+
+        Raises:
+            FileNotFoundError: If the file does not exist
+        """
+        with open(self.path_for(filename), "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def _refresh(self, path):
+        """
+        Mark an existing file as just used by updating its mtime
+
+        Retention ages files by their last use, so a file returned from the
+        store is not swept before it is downloaded.
+
+        Returns:
+            bool: False if the file does not exist
+        """
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _touch(self, filename, added_bytes=0):
+        """Tell the retention manager a file was used (and how big a new one is)"""
+        if self.retention is not None:
+            self.retention.touch(filename, added_bytes)
+
+    def _acquire(self, key):
+        """Serialize writers of the same key within this process"""
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        return entry
+
+    def _release(self, key, entry):
+        """Release a key lock and forget it once nobody waits for it"""
+        entry[0].release()
+        with self._lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._key_locks.pop(key, None)
+
+    def save(self, key, fmt, write):
+        """
+        Return the stored file for a key, creating it if needed
+
+        Args:
+            key (str): Key from make_key
+            fmt (str): File extension
+            write (callable): Called with a binary file object to write the export to
+
+        Returns:
+            tuple: (filename, created) where created is False when the file
+                already existed and write was not called
+        """
+        filename = self.filename_for(key, fmt)
+        path = self.path_for(filename)
+        if self._refresh(path):
+            self._touch(filename)
+            return filename, False
+
+        entry = self._acquire(key)
+        try:
+            # Another thread may have finished the same export while we waited
+            if self._refresh(path):
+                self._touch(filename)
+                return filename, False
+
+            fd, tmp_path = tempfile.mkstemp(prefix=f".{filename}.", suffix=".tmp", dir=self.directory)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    write(f)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            logger.debug("Stored export %s", filename)
+            self._touch(filename, os.path.getsize(path))
+            return filename, True
+        finally:
+            self._release(key, entry)
+
+class MemoryExportStore:
+    """Keeps exports in a bounded in-memory cache instead of on disk"""
+
+    def __init__(self, max_bytes=None, ttl=None, prefix="reflective_article"):
+        """
+        Args:
+            max_bytes (int): Total bytes kept; least recently used exports go first
+            ttl (float): Seconds an export stays available if never downloaded
+            prefix (str): Filename prefix before the content hash
+        """
+        self.max_bytes = settings.EXPORT_MEMORY_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl = settings.EXPORT_MEMORY_TTL if ttl is None else ttl
+        self.prefix = prefix
+        self._entries = OrderedDict()  # filename -> (data, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    make_key = staticmethod(ExportStore.make_key)
+
+    def filename_for(self, key, fmt):
+        """Filename for a key, matching ExportStore"""
+        return f"{self.prefix}_{key[:20]}.{fmt}"
+
+    def _drop(self, filename):
+        """Remove one entry (lock held)"""
+        data, _ = self._entries.pop(filename)
+        self._bytes -= len(data)
+
+    def _purge(self, now):
+        """Drop expired entries, then least recently used ones over the cap (lock held)"""
+        for filename in [name for name, (_, expires) in self._entries.items() if expires <= now]:
+            self._drop(filename)
+        while self._bytes > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+
+    def save(self, key, fmt, write):
+        """
+        Return the cached export for a key, rendering it if needed
+
+        Args:
+            key (str): Key from make_key
+            fmt (str): File extension
+            write (callable): Called with a BytesIO to write the export to
+
+        Returns:
+            tuple: (filename, created)
+
+        Raises:
+            ValueError: If the export alone is larger than max_bytes; it
+                would be evicted at once and its link would not work
+        """
+        filename = self.filename_for(key, fmt)
+        with self._lock:
+            if filename in self._entries:
+                data, _ = self._entries[filename]
+                self._entries[filename] = (data, time.time() + self.ttl)
+                self._entries.move_to_end(filename)
+                return filename, False
+
+        buffer = io.BytesIO()
+        write(buffer)
+        data = buffer.getvalue()
+        if len(data) > self.max_bytes:
+            raise ValueError(
+                f"The export is {len(data):,} bytes, more than the {self.max_bytes:,} bytes "
+                f"kept in memory (EXPORT_MEMORY_MAX_BYTES)"
+            )
+
+        with self._lock:
+            now = time.time()
+            if filename in self._entries:
+                self._drop(filename)
+            self._entries[filename] = (data, now + self.ttl)
+            self._bytes += len(data)
+            self._purge(now)
+        return filename, True
+
+    def get(self, filename):
+        """
+        Bytes of an export that has not expired
+
+        Returns:
+            bytes: Export content, or None if unknown or expired
+        """
+        with self._lock:
+            self._purge(time.time())
+            entry = self._entries.get(filename)
+            return entry[0] if entry is not None else None
+
+    def pop(self, filename):
+        """
+        Take an export out of the cache, e.g. once it has been downloaded
+
+        Returns:
+            bytes: Export content, or None if unknown or expired
+        """
+        with self._lock:
+            self._purge(time.time())
+            if filename not in self._entries:
+                return None
+            data, _ = self._entries[filename]
+            self._drop(filename)
+            return data
+
+    def iter_bytes(self, filename, chunk_size=64 * 1024):
+        """
+        Read a cached export in chunks, matching ExportStore.iter_bytes
+
+        Raises:
+            FileNotFoundError: If the export is unknown or expired
+        """
+        data = self.get(filename)
+        if data is None:
+            raise FileNotFoundError(filename)
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+    def size(self, filename):
+        """Size of a cached export in bytes, or None"""
+        data = self.get(filename)
+        return len(data) if data is not None else None
+
+    def stats(self):
+        """
+        Current memory usage
+
+        Returns:
+            dict: Values for the health endpoint
+        """
+        with self._lock:
+            return {"exports": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
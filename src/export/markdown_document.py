@@ -0,0 +1,249 @@
+"""
+Markdown-to-document conversion for exports
+
+Generated articles are a small subset of markdown: headings, paragraphs,
+bold/italic emphasis and bullet or numbered lists, optionally preceded by the
+"✅ **Article Generated Successfully!**" banner. parse_markdown() turns that
+into a small document model in one linear pass over the text; the TXT and
+PDF exporters both render from the same model. Parsed documents are cached,
+so exporting one article in several formats parses it only once.
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+# One run of text with uniform emphasis
+Span = namedtuple("Span", "text bold italic")
+
+# kind is "heading", "paragraph", "bullet" or "numbered"; number is the
+# heading level or the list item number
+Block = namedtuple("Block", "kind number spans")
+
+# A closing run of "#" only counts after whitespace, so "C#" keeps its "#"
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)(?:\s+#+)?\s*$")
+_BULLET = re.compile(r"^\s*[-*+•]\s+(.*)$")
+_NUMBERED = re.compile(r"^\s*(\d{1,3})[.)]\s+(.*)$")
+_RULE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+
+# Status banners put in front of generated text for display
+_BANNER_PREFIXES = ("✅", "⏳")
+
+def _parse_inline(text):
+    """
+    Split a line into emphasis spans in one left-to-right scan
+
+    "**" / "__" toggle bold and "*" / "_" toggle italic. As in CommonMark, a
+    marker followed by whitespace cannot open emphasis and one preceded by
+    whitespace cannot close it, so "2 * 3 * 4" stays literal. Underscores
+    only count at word boundaries so snake_case stays intact, and markers
+    that are never closed are kept as literal text.
+
+    Returns:
+        tuple: Span objects
+    """
+    text = _LINK.sub(r"\1", text)
+
+    # Tokenize into text and marker tokens
+    tokens = []
+    i = 0
+    start = 0
+    length = len(text)
+    while i < length:
+        char = text[i]
+        if char == "`":
+            # Inline code: copy verbatim up to the closing backtick
+            end = text.find("`", i + 1)
+            if end != -1:
+                if start < i:
+                    tokens.append(["text", text[start:i]])
+                tokens.append(["text", text[i + 1:end]])
+                i = start = end + 1
+                continue
+        if char in "*_":
+            run = 2 if text.startswith(char * 2, i) else 1
+            if char == "_":
+                before = text[i - 1] if i > 0 else " "
+                after = text[i + run] if i + run < length else " "
+                if before.isalnum() and after.isalnum():
+                    i += run
+                    continue
+            before = text[i - 1] if i > 0 else " "
+            after = text[i + run] if i + run < length else " "
+            if start < i:
+                tokens.append(["text", text[start:i]])
+            # [kind, marker, can open, can close]
+            tokens.append(["bold" if run == 2 else "italic", text[i:i + run],
+                           not after.isspace(), not before.isspace()])
+            i = start = i + run
+            continue
+        i += 1
+    if start < length:
+        tokens.append(["text", text[start:]])
+
+    # Pair markers; any marker left unpaired becomes literal text again
+    open_at = {"bold": None, "italic": None}
+    for index, token in enumerate(tokens):
+        kind = token[0]
+        if kind == "text":
+            continue
+        can_open, can_close = token[2], token[3]
+        if open_at[kind] is not None and can_close:
+            tokens[open_at[kind]][0] = kind + "_on"
+            token[0] = kind + "_off"
+            open_at[kind] = None
+        elif can_open:
+            open_at[kind] = index
+    for token in tokens:
+        if token[0] in ("bold", "italic"):
+            token[0] = "text"
+
+    spans = []
+    bold = italic = False
+    for kind, value, *_ in tokens:
+        if kind == "bold_on" or kind == "bold_off":
+            bold = kind == "bold_on"
+        elif kind == "italic_on" or kind == "italic_off":
+            italic = kind == "italic_on"
+        elif spans and spans[-1].bold == bold and spans[-1].italic == italic:
+            spans[-1] = Span(spans[-1].text + value, bold, italic)
+        else:
+            spans.append(Span(value, bold, italic))
+    return tuple(span for span in spans if span.text)
+
+class Document:
+    """A parsed article: an ordered tuple of blocks"""
+
+    def __init__(self, blocks):
+        """
+        Args:
+            blocks (tuple): Block objects in reading order
+        """
+        self.blocks = blocks
+
+    def to_text(self):
+        """
+        Render as plain text without markdown markers
+
+        Returns:
+            str: Text with blank lines between blocks
+        """
+        parts = []
+        previous = None
+        for block in self.blocks:
+            text = "".join(span.text for span in block.spans)
+            if block.kind == "bullet":
+                text = f"- {text}"
+            elif block.kind == "numbered":
+                text = f"{block.number}. {text}"
+            elif block.kind == "heading":
+                text = text.upper() if block.number <= 2 else text
+            # Consecutive items of the same list stay together
+            in_list = block.kind in ("bullet", "numbered") and block.kind == previous
+            parts.append(("\n" if in_list else "\n\n") + text if parts else text)
+            previous = block.kind
+        return "".join(parts)
+
+    def to_pdf_blocks(self):
+        """
+        Render as reportlab paragraph markup
+
+        Text is XML-escaped so "&" and "<" in articles cannot break layout.
+
+        Returns:
+            list: (role, markup, bullet) tuples; role is "heading", "body" or
+                "bullet", bullet is the list marker or None
+        """
+        rendered = []
+        for block in self.blocks:
+            markup = "".join(_span_markup(span) for span in block.spans)
+            if block.kind == "heading":
+                rendered.append(("heading", markup, None))
+            elif block.kind == "bullet":
+                rendered.append(("bullet", markup, "•"))
+            elif block.kind == "numbered":
+                rendered.append(("bullet", markup, f"{block.number}."))
+            else:
+                rendered.append(("body", markup, None))
+        return rendered
+
+def _span_markup(span):
+    """reportlab mini-HTML for one span"""
+    markup = escape(span.text)
+    if span.italic:
+        markup = f"<i>{markup}</i>"
+    if span.bold:
+        markup = f"<b>{markup}</b>"
+    return markup
+
+def _strip_banner(lines):
+    """Drop a leading status banner line and the blank lines after it"""
+    index = 0
+    while index < len(lines) and not lines[index].strip():
+        index += 1
+    if index < len(lines) and lines[index].lstrip().startswith(_BANNER_PREFIXES):
+        index += 1
+        while index < len(lines) and not lines[index].strip():
+            index += 1
+    return lines[index:]
+
+@lru_cache(maxsize=64)
+def parse_markdown(content):
+    """
+    Parse generated article markdown into a Document
+
+    Args:
+        content (str): Article text, with or without the status banner
+
+    Returns:
+        Document: Parsed document (cached per content string)
+    """
+    blocks = []
+    paragraph = []  # lines of the paragraph being collected
+    item = None  # [kind, number, lines] of the list item being collected
+
+    def flush():
+        nonlocal item
+        if paragraph:
+            blocks.append(Block("paragraph", 0, _parse_inline(" ".join(paragraph))))
+            paragraph.clear()
+        if item is not None:
+            blocks.append(Block(item[0], item[1], _parse_inline(" ".join(item[2]))))
+            item = None
+
+    for line in _strip_banner(content.splitlines()):
+        stripped = line.strip()
+        if not stripped or _RULE.match(stripped):
+            flush()
+            continue
+
+        match = _HEADING.match(stripped)
+        if match:
+            flush()
+            blocks.append(Block("heading", len(match.group(1)), _parse_inline(match.group(2))))
+            continue
+
+        match = _BULLET.match(line)
+        if match:
+            flush()
+            item = ["bullet", 0, [match.group(1).strip()]]
+            continue
+
+        match = _NUMBERED.match(line)
+        if match:
+            flush()
+            item = ["numbered", int(match.group(1)), [match.group(2).strip()]]
+            continue
+
+        if item is not None and line[:1].isspace():
+            # Indented continuation of a list item
+            item[2].append(stripped)
+        else:
+            if item is not None:
+                flush()
+            paragraph.append(stripped)
+
+    flush()
+    return Document(tuple(blocks))
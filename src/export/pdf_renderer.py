@@ -0,0 +1,268 @@
+"""
+Off-thread PDF rendering for article exports
+
+reportlab layout is CPU-bound pure Python, so rendering a long article inside
+a request thread holds the GIL and stalls everyone else's requests. PDFs are
+rendered in a small pool of pre-warmed worker processes instead. Each worker
+imports reportlab and builds the paragraph styles once, when it starts.
+
+Submissions go through a bounded queue: when every worker is busy and the
+queue is full, new exports wait briefly and then fail fast instead of piling
+up without limit.
+"""
+
+import asyncio
+import io
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Paragraph styles of the current process, built on first use
+_styles = None
+
+def _get_styles():
+    """
+    Build the document styles once per process
+
+    Returns:
+        dict: reportlab ParagraphStyle objects by role
+    """
+    global _styles
+    if _styles is None:
+        # reportlab is heavy, so it is only loaded where PDFs are rendered
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.enums import TA_LEFT, TA_CENTER
+
+        sample = getSampleStyleSheet()
+        _styles = {
+            "title": ParagraphStyle(
+                'CustomTitle',
+                parent=sample['Heading1'],
+                fontSize=18,
+                spaceAfter=30,
+                alignment=TA_CENTER
+            ),
+            "meta": ParagraphStyle(
+                'MetaInfo',
+                parent=sample['Normal'],
+                fontSize=10,
+                spaceAfter=6,
+                leftIndent=20
+            ),
+            "body": ParagraphStyle(
+                'BodyText',
+                parent=sample['Normal'],
+                fontSize=12,
+                spaceAfter=12,
+                alignment=TA_LEFT,
+                leftIndent=0,
+                rightIndent=0,
+                firstLineIndent=20
+            ),
+            "heading": ParagraphStyle(
+                'SectionHeading',
+                parent=sample['Heading2'],
+                fontSize=14,
+                spaceBefore=12,
+                spaceAfter=6,
+                alignment=TA_LEFT
+            ),
+            "bullet": ParagraphStyle(
+                'ListItem',
+                parent=sample['Normal'],
+                fontSize=12,
+                spaceAfter=6,
+                leftIndent=36,
+                bulletIndent=18
+            ),
+            "footer": ParagraphStyle(
+                'Footer',
+                parent=sample['Normal'],
+                fontSize=9,
+                alignment=TA_CENTER
+            )
+        }
+    return _styles
+
+def _warm_worker():
+    """Process pool initializer: load reportlab and build styles up front"""
+    _get_styles()
+    from reportlab.platypus import SimpleDocTemplate  # noqa: F401
+
+def render_pdf(blocks, metadata):
+    """
+    Lay out an article PDF
+
+    Runs inside a pool worker, so it only takes and returns plain picklable
+    values; the caller decides where the bytes are stored.
+
+    Args:
+        blocks (list): (role, markup, bullet) tuples from
+            Document.to_pdf_blocks(); markup is escaped reportlab mini-HTML
+        metadata (list): (label, value) pairs shown under the title, escaped
+
+    Returns:
+        bytes: PDF document
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+    styles = _get_styles()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter,
+                            rightMargin=72, leftMargin=72,
+                            topMargin=72, bottomMargin=18)
+
+    story = []
+
+    # Title
+    story.append(Paragraph("Reflective Story Article", styles["title"]))
+    story.append(Spacer(1, 20))
+
+    # Metadata
+    for label, value in metadata:
+        story.append(Paragraph(f"<b>{label}:</b> {value}", styles["meta"]))
+
+    story.append(Spacer(1, 30))
+
+    # Article content
+    for role, markup, bullet in blocks:
+        story.append(Paragraph(markup, styles[role], bulletText=bullet))
+        if role == "body":
+            story.append(Spacer(1, 12))
+
+    # Footer
+    story.append(Spacer(1, 30))
+    story.append(Paragraph("Generated by Reflective Story Article Generator", styles["footer"]))
+
+    doc.build(story)
+    return buffer.getvalue()
+
+class RenderQueueFull(RuntimeError):
+    """Raised when the PDF render queue stays full for too long"""
+
+class PdfRenderer:
+    """Renders PDFs in a pre-warmed process pool behind a bounded queue"""
+
+    def __init__(self, workers=None, queue_size=None, queue_timeout=None):
+        """
+        Args:
+            workers (int): Worker processes; 0 renders in the calling thread
+            queue_size (int): Renders allowed to wait while all workers are busy
+            queue_timeout (float): Seconds to wait for a queue slot before failing
+        """
+        self.workers = settings.PDF_RENDER_WORKERS if workers is None else workers
+        self.queue_size = settings.PDF_RENDER_QUEUE_SIZE if queue_size is None else queue_size
+        self.queue_timeout = settings.PDF_RENDER_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self._slots = threading.BoundedSemaphore(max(1, self.workers) + self.queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        """Create the process pool on first use"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn, not fork: the app process runs threads (Gradio,
+                    # HTTP pools) that must not be copied mid-operation
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_warm_worker
+                    )
+        return self._executor
+
+    def start(self):
+        """
+        Start and warm every worker now instead of on the first export
+
+        Returns:
+            PdfRenderer: self, for chaining
+        """
+        if self.workers > 0:
+            executor = self._get_executor()
+            for future in [executor.submit(_get_styles) for _ in range(self.workers)]:
+                future.result()
+            logger.info("PDF render pool ready with %d workers", self.workers)
+        return self
+
+    def submit(self, blocks, metadata):
+        """
+        Queue a PDF for rendering
+
+        Args:
+            blocks (list): (role, markup, bullet) tuples
+            metadata (list): (label, value) pairs
+
+        Returns:
+            concurrent.futures.Future: Resolves to the PDF bytes
+
+        Raises:
+            RenderQueueFull: If no queue slot frees up within queue_timeout
+        """
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise RenderQueueFull("Too many PDF exports in progress, please try again in a moment")
+        try:
+            if self.workers > 0:
+                future = self._get_executor().submit(render_pdf, blocks, metadata)
+            else:
+                future = Future()
+                try:
+                    future.set_result(render_pdf(blocks, metadata))
+                except Exception as e:
+                    future.set_exception(e)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def render(self, blocks, metadata):
+        """
+        Render a PDF and wait for it (blocking)
+
+        Returns:
+            bytes: PDF document
+        """
+        return self.submit(blocks, metadata).result()
+
+    async def arender(self, blocks, metadata):
+        """
+        Render a PDF without blocking the event loop
+
+        Returns:
+            bytes: PDF document
+        """
+        loop = asyncio.get_running_loop()
+        # Waiting for a queue slot blocks, so do it off the loop
+        future = await loop.run_in_executor(None, self.submit, blocks, metadata)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+# Global PDF renderer instance, created on first use
+_pdf_renderer = None
+_pdf_renderer_lock = threading.Lock()
+
+def get_pdf_renderer():
+    """
+    Get the global PDF renderer, creating it on first use
+
+    Returns:
+        PdfRenderer: Shared PDF renderer
+    """
+    global _pdf_renderer
+    if _pdf_renderer is None:
+        with _pdf_renderer_lock:
+            if _pdf_renderer is None:
+                _pdf_renderer = PdfRenderer()
+    return _pdf_renderer
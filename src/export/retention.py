@@ -0,0 +1,238 @@
+"""
+Retention for exported downloads
+
+Exports are kept while they are in use and removed once they go stale. A
+background thread sweeps the downloads directory periodically and after
+writes that push it over its byte quota:
+
+- files not accessed (exported or downloaded) for longer than the max age
+  are deleted; the export store refreshes a file's mtime whenever it hands
+  the file out, so that survives restarts
+- while the directory is over the quota, the least recently accessed
+  files are evicted
+
+Requests only record accesses in memory; they never wait for a sweep.
+"""
+
+import logging
+import os
+import threading
+import time
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class DownloadRetention:
+    """Age and size limits for a downloads directory"""
+
+    def __init__(self, directory, max_age=None, max_bytes=None, interval=None):
+        """
+        Args:
+            directory (str): Directory to manage
+            max_age (float): Seconds since last access before a file expires; 0 disables
+            max_bytes (int): Total size quota in bytes; 0 disables
+            interval (float): Seconds between background sweeps
+        """
+        self.directory = directory
+        self.max_age = settings.DOWNLOAD_MAX_AGE if max_age is None else max_age
+        self.max_bytes = settings.DOWNLOAD_MAX_BYTES if max_bytes is None else max_bytes
+        self.interval = settings.DOWNLOAD_SWEEP_INTERVAL if interval is None else interval
+
+        self._lock = threading.Lock()
+        self._last_access = {}  # filename -> epoch seconds
+        self._usage_bytes = 0
+        self._usage_files = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.expired_files = 0
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.last_sweep = None
+
+    def touch(self, filename, added_bytes=0):
+        """
+        Record an access to a file; call it on export hits and downloads
+
+        Args:
+            filename (str): File in the managed directory
+            added_bytes (int): Size of the file if it was just created
+        """
+        with self._lock:
+            self._last_access[filename] = time.time()
+            if added_bytes:
+                self._usage_bytes += added_bytes
+                self._usage_files += 1
+                over_quota = self.max_bytes and self._usage_bytes > self.max_bytes
+            else:
+                over_quota = False
+        if over_quota:
+            self._wake.set()
+
+    def _scan(self):
+        """
+        List the files in the directory with their size and last access
+
+        Returns:
+            list: (last_access, size, filename) tuples
+        """
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    try:
+                        if not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.name))
+        except FileNotFoundError:
+            return []
+
+        with self._lock:
+            return [
+                (max(mtime, self._last_access.get(name, 0)), size, name)
+                for mtime, size, name in entries
+            ]
+
+    def _used_since(self, filename, last_access):
+        """Whether a file was accessed after a sweep listed it"""
+        with self._lock:
+            if self._last_access.get(filename, 0) > last_access:
+                return True
+        try:
+            return os.stat(os.path.join(self.directory, filename)).st_mtime > last_access
+        except FileNotFoundError:
+            return False
+
+    def _remove(self, filename):
+        """Delete one file; returns False if it was already gone"""
+        try:
+            os.remove(os.path.join(self.directory, filename))
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            self._last_access.pop(filename, None)
+        return True
+
+    def sweep(self):
+        """
+        Apply the age and size limits once
+
+        Returns:
+            dict: Number of files expired and evicted by this sweep
+        """
+        now = time.time()
+        entries = self._scan()
+        expired = evicted = evicted_bytes = 0
+
+        kept = []
+        for last_access, size, name in entries:
+            if self.max_age and now - last_access > self.max_age and not self._used_since(name, last_access):
+                if self._remove(name):
+                    expired += 1
+            else:
+                kept.append((last_access, size, name))
+
+        total = sum(size for _, size, _ in kept)
+        if self.max_bytes and total > self.max_bytes:
+            # Least recently accessed first; in-progress temp files are skipped
+            removed = set()
+            for last_access, size, name in sorted(kept):
+                if total <= self.max_bytes:
+                    break
+                if name.startswith(".") or self._used_since(name, last_access):
+                    # In-progress temp file, or handed out since the scan
+                    continue
+                if self._remove(name):
+                    evicted += 1
+                    evicted_bytes += size
+                removed.add(name)
+                total -= size
+            kept = [entry for entry in kept if entry[2] not in removed]
+
+        with self._lock:
+            # Forget accesses to files that no longer exist
+            names = {name for _, _, name in kept}
+            self._last_access = {name: t for name, t in self._last_access.items() if name in names}
+            self._usage_bytes = sum(size for _, size, _ in kept)
+            self._usage_files = len(kept)
+            self.expired_files += expired
+            self.evicted_files += evicted
+            self.evicted_bytes += evicted_bytes
+            self.last_sweep = now
+
+        if expired or evicted:
+            logger.info("Download retention removed %d expired and %d evicted files (%d bytes)",
+                        expired, evicted, evicted_bytes)
+        return {"expired": expired, "evicted": evicted}
+
+    def _run(self):
+        """Sweeper thread: sweep every interval, or sooner when over quota"""
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Download retention sweep failed")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self):
+        """
+        Start the background sweeper (idempotent)
+
+        Returns:
+            DownloadRetention: self, for chaining
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="download-retention", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the background sweeper"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        """
+        Current usage and lifetime eviction counts
+
+        Returns:
+            dict: Values for the health endpoint
+        """
+        with self._lock:
+            return {
+                "files": self._usage_files,
+                "bytes": self._usage_bytes,
+                "max_bytes": self.max_bytes,
+                "max_age_seconds": self.max_age,
+                "expired_files": self.expired_files,
+                "evicted_files": self.evicted_files,
+                "evicted_bytes": self.evicted_bytes,
+                "last_sweep": self.last_sweep
+            }
+
+# Global retention for the default downloads directory, created on first use
+_download_retention = None
+_download_retention_lock = threading.Lock()
+
+def get_download_retention():
+    """
+    Get the retention manager for the default downloads directory
+
+    Returns:
+        DownloadRetention: Shared retention manager
+    """
+    global _download_retention
+    if _download_retention is None:
+        with _download_retention_lock:
+            if _download_retention is None:
+                _download_retention = DownloadRetention("downloads")
+    return _download_retention
@@ -2,16 +2,19 @@
 Main entry point for the Reflective Story Article Generator with Authentication
 """
 
+import logging
 import sys
 import os
 
 # Add parent directory to Python path so we can import config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from ui.interface import story_interface
+from src.ui.interface import get_story_interface
 from config.settings import settings
 
 if __name__ == "__main__":
+    logging.basicConfig(level=settings.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    
     # Enable authentication for Hugging Face deployment
     # For local development, set auth=None to disable authentication
     
@@ -20,7 +23,7 @@ if __name__ == "__main__":
     
     if is_huggingface:
         print("🤗 Running on Hugging Face Spaces with authentication enabled")
-        story_interface.launch(share=False, auth=(settings.AUTH_USERNAME, settings.AUTH_PASSWORD))
+        get_story_interface().launch(share=False, auth=(settings.AUTH_USERNAME, settings.AUTH_PASSWORD))
     else:
         print("💻 Running locally - authentication disabled for development")
-        story_interface.launch(share=False, auth=None)
\ No newline at end of file
+        get_story_interface().launch(share=False, auth=None)
\ No newline at end of file
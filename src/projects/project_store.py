@@ -0,0 +1,364 @@
+"""
+Persistent projects: parameters, outline and article version history
+
+Each project belongs to a user and keeps every version of its parameters,
+outline, article and incremental-edit draft in a local SQLite file, so work
+survives a page reload and can be reopened without calling OpenAI.
+
+Versions are stored as zlib-compressed line deltas against the previous
+version of the same kind, with a full snapshot every KEYFRAME_INTERVAL
+versions, so long edit histories stay small and any version is rebuilt from
+at most KEYFRAME_INTERVAL records.
+"""
+
+import difflib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from config.settings import settings
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PROJECT_VERSIONS = metrics.counter(
+    "story_project_versions_total", "Project versions saved by kind and encoding", ("kind", "encoding")
+)
+
+# What a project keeps versions of
+KINDS = ("params", "outline", "article", "draft")
+
+# A full snapshot is stored every this many versions of a kind
+KEYFRAME_INTERVAL = 20
+
+def make_delta(base, text):
+    """
+    Line delta that turns base into text
+
+    Returns:
+        list: Operations; [start, end] copies base lines, a list of strings
+            inserts those lines
+    """
+    base_lines = base.splitlines(keepends=True)
+    lines = text.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base_lines, lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(lines[j1:j2])
+    return ops
+
+def apply_delta(base, ops):
+    """
+    Rebuild a text from its base and a make_delta() result
+
+    Returns:
+        str: The text
+    """
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if op and isinstance(op[0], int):
+            parts.extend(base_lines[op[0]:op[1]])
+        else:
+            parts.extend(op)
+    return "".join(parts)
+
+def _compress(value):
+    """zlib-compress a string or JSON-serializable value"""
+    if not isinstance(value, str):
+        value = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+    return zlib.compress(value.encode("utf-8"), 9)
+
+def _decompress(data):
+    """Inverse of _compress for strings"""
+    return zlib.decompress(data).decode("utf-8")
+
+class ProjectStore:
+    """SQLite store of projects and their compressed version history"""
+
+    def __init__(self, db_path=None):
+        """
+        Initialize the store; the SQLite file is opened on first use
+
+        Args:
+            db_path (str): SQLite file path
+        """
+        self.db_path = db_path or settings.PROJECT_STORE_PATH
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _open(self):
+        """Open the SQLite file and create the schema (caller holds the lock)"""
+        if self._conn is not None:
+            return
+
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS projects (
+                id INTEGER PRIMARY KEY,
+                username TEXT,
+                title TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS versions (
+                id INTEGER PRIMARY KEY,
+                project_id INTEGER NOT NULL REFERENCES projects (id),
+                kind TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                encoding TEXT NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_projects_user_updated ON projects (username, updated_at)"
+        )
+        self._conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_versions_project_kind_number "
+            "ON versions (project_id, kind, number)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_versions_created ON versions (created_at)")
+        self._conn.commit()
+
+    def _owned(self, project_id, username):
+        """Whether a project exists and belongs to the user (caller holds the lock)"""
+        row = self._conn.execute("SELECT username FROM projects WHERE id = ?", (project_id,)).fetchone()
+        return row is not None and row[0] == username
+
+    def _latest_number(self, project_id, kind):
+        """Number of the newest version of a kind, 0 if none (caller holds the lock)"""
+        row = self._conn.execute(
+            "SELECT MAX(number) FROM versions WHERE project_id = ? AND kind = ?", (project_id, kind)
+        ).fetchone()
+        return row[0] or 0
+
+    def _read(self, project_id, kind, number):
+        """
+        Rebuild one version from its nearest full snapshot (caller holds the lock)
+
+        Returns:
+            str: Version text, or None if it does not exist
+        """
+        rows = self._conn.execute(
+            "SELECT encoding, data FROM versions WHERE project_id = ? AND kind = ? AND number <= ? "
+            "AND number >= (SELECT MAX(number) FROM versions WHERE project_id = ? AND kind = ? "
+            "AND number <= ? AND encoding = 'full') ORDER BY number",
+            (project_id, kind, number, project_id, kind, number)
+        ).fetchall()
+        text = None
+        for encoding, data in rows:
+            if encoding == "full":
+                text = _decompress(data)
+            else:
+                text = apply_delta(text, json.loads(_decompress(data)))
+        return text
+
+    def _write(self, project_id, kind, text):
+        """
+        Store a new version unless it equals the latest one (caller holds the lock)
+
+        Returns:
+            int: Number of the stored (or unchanged latest) version
+        """
+        latest = self._latest_number(project_id, kind)
+        base = self._read(project_id, kind, latest) if latest else None
+        if base == text:
+            return latest
+
+        number = latest + 1
+        encoding, data = "full", _compress(text)
+        if base is not None and number % KEYFRAME_INTERVAL != 1:
+            delta = _compress(make_delta(base, text))
+            if len(delta) < len(data):
+                encoding, data = "delta", delta
+
+        now = time.time()
+        self._conn.execute(
+            "INSERT INTO versions (project_id, kind, number, created_at, encoding, data, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (project_id, kind, number, now, encoding, data, len(text.encode("utf-8")))
+        )
+        self._conn.execute("UPDATE projects SET updated_at = ? WHERE id = ?", (now, project_id))
+        PROJECT_VERSIONS.inc(kind=kind, encoding=encoding)
+        return number
+
+    def create_project(self, username, params, title=None):
+        """
+        Start a project with its first parameter set
+
+        Args:
+            username (str): Owner, or None without authentication
+            params (dict): Story parameters (structure_type, theme, ...)
+            title (str): Display title; derived from the theme if omitted
+
+        Returns:
+            int: Project id
+        """
+        if title is None:
+            theme = " ".join(str(params.get("theme") or "").split())
+            title = (theme[:60] + "…" if len(theme) > 60 else theme) or "Untitled story"
+        now = time.time()
+        with self._lock:
+            self._open()
+            cursor = self._conn.execute(
+                "INSERT INTO projects (username, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (username, title, now, now)
+            )
+            project_id = cursor.lastrowid
+            self._write(project_id, "params", json.dumps(params, indent=1, sort_keys=True, ensure_ascii=False))
+            self._conn.commit()
+        return project_id
+
+    def save(self, project_id, username, params=None, outline=None, article=None, draft=None):
+        """
+        Add new versions to a project; unchanged values are not stored again
+
+        Args:
+            project_id (int): Project to update
+            username (str): Caller; must own the project
+            params (dict): Story parameters
+            outline (str): Outline text as edited
+            article (str): Article text
+            draft (dict): ArticleDraft.to_dict() of the article
+
+        Returns:
+            dict: Kind -> latest version number for the kinds given, or
+                None if the project does not exist or belongs to someone else
+        """
+        values = {
+            "params": json.dumps(params, indent=1, sort_keys=True, ensure_ascii=False) if params is not None else None,
+            "outline": outline,
+            "article": article,
+            "draft": json.dumps(draft, indent=1, sort_keys=True, ensure_ascii=False) if draft is not None else None
+        }
+        with self._lock:
+            self._open()
+            if not self._owned(project_id, username):
+                return None
+            numbers = {kind: self._write(project_id, kind, text) for kind, text in values.items() if text is not None}
+            self._conn.commit()
+        return numbers
+
+    def list_projects(self, username, limit=50):
+        """
+        A user's projects, most recently updated first
+
+        Args:
+            username (str): Owner, or None for projects made without authentication
+            limit (int): Maximum number of projects
+
+        Returns:
+            list: Dicts with id, title, created_at and updated_at
+        """
+        with self._lock:
+            self._open()
+            rows = self._conn.execute(
+                "SELECT id, title, created_at, updated_at FROM projects WHERE username IS ? "
+                "ORDER BY updated_at DESC LIMIT ?",
+                (username, limit)
+            ).fetchall()
+        return [
+            {"id": row[0], "title": row[1], "created_at": row[2], "updated_at": row[3]}
+            for row in rows
+        ]
+
+    def load_project(self, project_id, username):
+        """
+        Latest parameters, outline, article and draft of a project
+
+        Args:
+            project_id (int): Project to open
+            username (str): Caller; must own the project
+
+        Returns:
+            dict: id, title, params, outline, article, draft (None where
+                nothing was saved) and versions (kind -> latest number),
+                or None if the project does not exist or belongs to someone else
+        """
+        with self._lock:
+            self._open()
+            if not self._owned(project_id, username):
+                return None
+            title = self._conn.execute("SELECT title FROM projects WHERE id = ?", (project_id,)).fetchone()[0]
+            versions = {kind: self._latest_number(project_id, kind) for kind in KINDS}
+            texts = {
+                kind: self._read(project_id, kind, number) if number else None
+                for kind, number in versions.items()
+            }
+        return {
+            "id": project_id,
+            "title": title,
+            "params": json.loads(texts["params"]) if texts["params"] else None,
+            "outline": texts["outline"],
+            "article": texts["article"],
+            "draft": json.loads(texts["draft"]) if texts["draft"] else None,
+            "versions": versions
+        }
+
+    def history(self, project_id, username, kind):
+        """
+        Version list of one kind
+
+        Returns:
+            list: Dicts with number, created_at, size (bytes of text) and
+                stored (bytes on disk), oldest first; None if not owned
+        """
+        with self._lock:
+            self._open()
+            if not self._owned(project_id, username):
+                return None
+            rows = self._conn.execute(
+                "SELECT number, created_at, size, LENGTH(data) FROM versions "
+                "WHERE project_id = ? AND kind = ? ORDER BY number",
+                (project_id, kind)
+            ).fetchall()
+        return [{"number": row[0], "created_at": row[1], "size": row[2], "stored": row[3]} for row in rows]
+
+    def load_version(self, project_id, username, kind, number):
+        """
+        Text of one earlier version
+
+        Returns:
+            str: Version text, or None if it does not exist or is not owned
+        """
+        with self._lock:
+            self._open()
+            if not self._owned(project_id, username):
+                return None
+            return self._read(project_id, kind, number)
+
+# Global project store, created on first use
+_project_store = None
+_project_store_lock = threading.Lock()
+
+def get_project_store():
+    """
+    Get the global project store, creating it on first use
+
+    Returns:
+        ProjectStore: Shared store, or None when projects are disabled
+    """
+    global _project_store
+    if not settings.PROJECT_STORE_ENABLED:
+        return None
+    if _project_store is None:
+        with _project_store_lock:
+            if _project_store is None:
+                _project_store = ProjectStore()
+    return _project_store
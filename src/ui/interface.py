@@ -1,27 +1,34 @@
 """
-Gradio user interface components with Flask file server integration
+Gradio user interface components with file download routes
 """
 
-import gradio as gr
+import asyncio
+import functools
+import logging
+import threading
+import time
 from config.settings import settings
 from config.prompts import prompts
 from src.utils.validators import validator
-from src.ai.outline_generator import outline_generator
-from src.ai.article_generator import article_generator
-from src.export.export_handler import export_handler
+from src.utils.text import strip_status_header
+from src.ai.llm_client import call_context
+from src.ai.outline_generator import get_outline_generator
+from src.ai.article_generator import get_article_generator
+from src.export.export_handler import get_export_handler
+from src.projects.project_store import get_project_store
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from file_server import file_server
+from file_server import get_file_server
+
+logger = logging.getLogger(__name__)
 
 class StoryInterface:
     """Main interface for the story generator application"""
     
     def __init__(self):
-        """Initialize the interface"""
+        """Initialize the interface (the file server starts on launch)"""
         self.demo = None
-        # Start the Flask file server
-        file_server.start_server()
     
     def authenticate_user(self, username, password):
         """
@@ -56,12 +63,121 @@ class StoryInterface:
             structure_type, theme, audience, length, style, key_messages
         )
     
-    def generate_outline(self, structure_type, theme, audience, length, style, key_messages):
+    def _username(self, request):
+        """Signed-in user of a Gradio request, or None without authentication"""
+        return getattr(request, "username", None) if request is not None else None
+    
+    def _extract_editor_content(self, outline):
         """
-        Generate AI outline after validation
+        Extract just the outline content for the editor
+        
+        Args:
+            outline (str): Outline as formatted for display
+            
+        Returns:
+            str: Outline without the status message formatting
+        """
+        return strip_status_header(outline)
+    
+    def _save_project(self, project_id, username, params, outline=None, article=None, draft=None):
+        """
+        Save new versions to the session's project, starting one if needed
+        
+        Saving never fails a generation; problems are only logged.
+        
+        Returns:
+            int: Id of the project the versions went to, or project_id
+                unchanged when projects are disabled or saving failed
+        """
+        store = get_project_store()
+        if store is None:
+            return project_id
+        try:
+            if project_id is None or store.save(project_id, username, params=params) is None:
+                project_id = store.create_project(username, params)
+            store.save(project_id, username, outline=outline, article=article,
+                       draft=draft.to_dict() if draft is not None else None)
+        except Exception as e:
+            logger.warning("Could not save project: %s", e)
+        return project_id
+    
+    def list_projects(self, request=None):
+        """
+        Fill the saved-projects dropdown with the user's projects
+        
+        Returns:
+            Dropdown update with (label, project id) choices, newest first
+        """
+        import gradio as gr
+        
+        store = get_project_store()
+        projects = store.list_projects(self._username(request)) if store is not None else []
+        choices = [
+            (f"{project['title']} ({time.strftime('%Y-%m-%d %H:%M', time.localtime(project['updated_at']))})",
+             project["id"])
+            for project in projects
+        ]
+        return gr.update(choices=choices, value=None)
+    
+    def open_project(self, selected, request=None):
+        """
+        Restore a saved project's parameters, outline and article
+        
+        Reads the latest versions from the project store; no OpenAI call is made.
         
         Returns:
-            tuple: (outline_for_display, outline_for_editor) - Returns same content twice for both outputs
+            tuple: Values for the parameter inputs, outline display and editor,
+                article display, article draft, project id and status message
+        """
+        import gradio as gr
+        
+        store = get_project_store()
+        project = store.load_project(selected, self._username(request)) if store and selected is not None else None
+        if project is None:
+            unchanged = (gr.update(),) * 11
+            return unchanged + ("⚠️ **Please select one of your saved projects.**",)
+        
+        params = project["params"] or {}
+        outline = project["outline"] or ""
+        article = project["article"]
+        draft = None
+        if project["draft"] is not None:
+            from src.ai.section_writer import ArticleDraft
+            draft = ArticleDraft.from_dict(project["draft"])
+        
+        versions = project["versions"]
+        return (
+            params.get("structure_type", "personal_journey"),
+            params.get("theme", ""),
+            params.get("audience", ""),
+            params.get("length", settings.DEFAULT_WORD_COUNT),
+            params.get("style", ""),
+            params.get("key_messages", ""),
+            f"✅ **Outline Restored from Project**\n\n{outline}" if outline else "",
+            outline,
+            f"✅ **Article Restored from Project**\n\n{article}" if article else "",
+            draft,
+            project["id"],
+            f"📂 **Opened:** {project['title']} (outline v{versions['outline']}, article v{versions['article']})"
+        )
+    
+    def new_project(self):
+        """Detach the session from its project; the next outline starts a new one"""
+        return None, "🆕 **New project:** your next outline will be saved as a new project."
+    
+    async def generate_outline(self, structure_type, theme, audience, length, style, key_messages, skip_cache=False,
+                               project_id=None, request=None):
+        """
+        Generate AI outline after validation
+        
+        When streaming is enabled the outline is yielded as it arrives, so the
+        display and the editor fill in live. skip_cache forces a fresh generation.
+        The finished outline and its parameters are saved to the session's
+        project (project_id, started if None). request is the Gradio request;
+        its user is charged for the OpenAI calls and owns the project.
+        
+        Yields:
+            tuple: (outline_for_display, outline_for_editor, project_id)
         """
         # Validate parameters first
         is_valid, error_message = validator.validate_parameters(
@@ -70,57 +186,126 @@ class StoryInterface:
         
         if not is_valid:
             error_msg = f"⚠️ **Please fix the following issues before generating outline:**\n\n{error_message}"
-            return error_msg, ""  # Return error for display, empty for editor
+            yield error_msg, "", project_id  # Return error for display, empty for editor
+            return
         
         # Generate outline with selected structure
-        outline = outline_generator.generate_outline(
-            structure_type, theme, audience, length, style, key_messages
-        )
-        
-        # Extract just the outline content for the editor (remove success message formatting)
-        if outline.startswith("✅"):
-            # Find the actual outline content after the success message
-            lines = outline.split('\n')
-            if len(lines) > 2:
-                editor_content = '\n'.join(lines[2:])  # Skip first 2 lines (success message and blank line)
+        username = self._username(request)
+        outline = ""
+        with call_context(username=username, structure_type=structure_type):
+            if settings.STREAM_RESPONSES:
+                async for outline in get_outline_generator().agenerate_outline_stream(
+                    structure_type, theme, audience, length, style, key_messages,
+                    use_cache=not skip_cache
+                ):
+                    yield outline, self._extract_editor_content(outline), project_id
             else:
-                editor_content = outline
-        else:
-            editor_content = outline
+                outline = await get_outline_generator().agenerate_outline(
+                    structure_type, theme, audience, length, style, key_messages,
+                    use_cache=not skip_cache
+                )
         
-        return outline, editor_content  # Return formatted version for display, clean version for editor
+        if outline.startswith("✅"):
+            params = {"structure_type": structure_type, "theme": theme, "audience": audience,
+                      "length": length, "style": style, "key_messages": key_messages}
+            project_id = await asyncio.to_thread(
+                self._save_project, project_id, username, params, outline=self._extract_editor_content(outline)
+            )
+        if outline.startswith("✅") or not settings.STREAM_RESPONSES:
+            yield outline, self._extract_editor_content(outline), project_id
     
-    def generate_article(self, edited_outline, theme, audience, length, style, key_messages):
+    async def generate_article(self, edited_outline, theme, audience, length, style, key_messages,
+                               skip_cache=False, draft=None, structure_type=None, project_id=None, request=None):
         """
         Generate full article from the edited outline
         
         Args:
             edited_outline (str): The user-reviewed and possibly edited outline
             theme, audience, length, style, key_messages: Original parameters
+            skip_cache (bool): Force a fresh generation instead of a cached article
+            draft (ArticleDraft): Sections of this session's previous article;
+                with incremental edits enabled, sectioned articles only
+                regenerate the sections whose outline section changed
+            structure_type (str): Selected story structure, for the usage ledger
+            project_id (int): Session's project; the edited outline and the
+                finished article are saved to it (a project is started if None)
+            request: Gradio request; its user is charged for the OpenAI calls
             
-        Returns:
-            str: Generated article or error message
+        Yields:
+            tuple: (article, draft, project_id) with the article partial while streaming
         """
         if not edited_outline or not edited_outline.strip():
-            return "❌ **Error:** Please generate an outline first or provide outline content."
+            yield "❌ **Error:** Please generate an outline first or provide outline content.", draft, project_id
+            return
+        
+        # The draft is only used when the article is long enough to be written
+        # section by section; shorter articles stay a single call
+        if settings.INCREMENTAL_ARTICLE_EDITS:
+            from src.ai.section_writer import ArticleDraft
+            if draft is None or skip_cache:
+                draft = ArticleDraft()
         
         # Generate the full article
-        return article_generator.generate_article(
-            edited_outline, theme, audience, length, style, key_messages
+        username = self._username(request)
+        article = ""
+        with call_context(username=username, structure_type=structure_type):
+            if settings.STREAM_RESPONSES:
+                async for article in get_article_generator().agenerate_article_stream(
+                    edited_outline, theme, audience, length, style, key_messages,
+                    use_cache=not skip_cache, draft=draft
+                ):
+                    yield article, draft, project_id
+            else:
+                article = await get_article_generator().agenerate_article(
+                    edited_outline, theme, audience, length, style, key_messages,
+                    use_cache=not skip_cache, draft=draft
+                )
+        
+        if article.startswith("✅"):
+            params = {"structure_type": structure_type, "theme": theme, "audience": audience,
+                      "length": length, "style": style, "key_messages": key_messages}
+            project_id = await asyncio.to_thread(
+                self._save_project, project_id, username, params, outline=edited_outline,
+                article=strip_status_header(article), draft=draft
+            )
+        if article.startswith("✅") or not settings.STREAM_RESPONSES:
+            yield article, draft, project_id
+    
+    def _create_export(self, export_fn, article_content, structure_type, theme, audience, length):
+        """
+        Write an export file and measure it (blocking, runs in an executor)
+        
+        Returns:
+            tuple: (filename, download_url, file_size)
+        """
+        filename, download_url = export_fn(
+            article_content, theme, audience, length, structure_type
+        )
+        file_size = get_export_handler().get_export_size(filename)
+        return filename, download_url, file_size
+    
+    async def _run_export(self, export_fn, article_content, structure_type, theme, audience, length):
+        """Run a blocking export in the default executor so the event loop stays free"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            functools.partial(
+                self._create_export, export_fn,
+                article_content, structure_type, theme, audience, length
+            )
         )
     
-    def export_txt(self, article_content, structure_type, theme, audience, length):
-        """Export article as TXT file with Flask download link"""
+    async def export_txt(self, article_content, structure_type, theme, audience, length):
+        """Export article as TXT file with download link"""
         try:
             if not article_content or not article_content.strip():
                 return "⚠️ **Error:** No article content to export. Please generate an article first."
             
-            filename, download_url = export_handler.export_to_txt(
-                article_content, theme, audience, length, structure_type
+            filename, download_url, file_size = await self._run_export(
+                get_export_handler().export_to_txt,
+                article_content, structure_type, theme, audience, length
             )
             
-            file_size = export_handler.get_file_size(f"downloads/{filename}")
-            
             return f"""✅ **TXT Export Ready!**
 
 **Filename:** {filename}
@@ -134,18 +319,17 @@ class StoryInterface:
         except Exception as e:
             return f"❌ **Export Error:** {str(e)}"
 
-    def export_pdf(self, article_content, structure_type, theme, audience, length):
-        """Export article as PDF file with Flask download link"""
+    async def export_pdf(self, article_content, structure_type, theme, audience, length):
+        """Export article as PDF file with download link"""
         try:
             if not article_content or not article_content.strip():
                 return "⚠️ **Error:** No article content to export. Please generate an article first."
             
-            filename, download_url = export_handler.export_to_pdf(
-                article_content, theme, audience, length, structure_type
+            filename, download_url, file_size = await self._run_export(
+                get_export_handler().export_to_pdf,
+                article_content, structure_type, theme, audience, length
             )
             
-            file_size = export_handler.get_file_size(f"downloads/{filename}")
-            
             return f"""✅ **PDF Export Ready!**
 
 **Filename:** {filename}
@@ -154,6 +338,34 @@ class StoryInterface:
 **Click the link below to download:**
 [📑 Download PDF File]({download_url})
 
+*This will open the browser's "Save As" dialog.*"""
+            
+        except Exception as e:
+            return f"❌ **Export Error:** {str(e)}"
+    
+    def export_zip(self, article_content, structure_type, theme, audience, length):
+        """Export article as TXT and PDF together in one ZIP download"""
+        try:
+            if not article_content or not article_content.strip():
+                return "⚠️ **Error:** No article content to export. Please generate an article first."
+            
+            # Only registers the archive; it is rendered while it downloads
+            filename, download_url = get_export_handler().export_bulk([{
+                "article_content": article_content,
+                "theme": theme,
+                "audience": audience,
+                "word_count": length,
+                "structure_type": structure_type
+            }])
+            
+            return f"""✅ **ZIP Export Ready!**
+
+**Filename:** {filename}
+**Contents:** TXT and PDF
+
+**Click the link below to download:**
+[📦 Download ZIP Archive]({download_url})
+
 *This will open the browser's "Save As" dialog.*"""
             
         except Exception as e:
@@ -161,11 +373,43 @@ class StoryInterface:
     
     def create_interface(self):
         """Create and return the Gradio interface with authentication"""
+        # Gradio is only imported when the UI is actually built
+        import gradio as gr
+        
+        # Gradio passes its request to parameters annotated gr.Request; the
+        # annotation is attached here because gradio is imported lazily
+        for handler in (StoryInterface.generate_outline, StoryInterface.generate_article,
+                        StoryInterface.list_projects, StoryInterface.open_project):
+            handler.__annotations__["request"] = gr.Request
+        
         with gr.Blocks(title=settings.APP_TITLE, theme=gr.themes.Soft()) as demo:
             gr.Markdown(f"# 🌟 {settings.APP_TITLE}")
             gr.Markdown(settings.APP_DESCRIPTION)
             gr.Markdown("---")
             
+            # Project the session's outline and article versions are saved to
+            project_id = gr.State(None)
+            projects_enabled = get_project_store() is not None
+            
+            # Saved Projects: reopen earlier work without generating it again
+            if projects_enabled:
+                with gr.Group():
+                    gr.Markdown("## 📂 Saved Projects")
+                    
+                    with gr.Row():
+                        project_picker = gr.Dropdown(
+                            label="Your projects",
+                            choices=[],
+                            info="Outlines and articles are saved automatically as you generate them"
+                        )
+                        with gr.Column():
+                            open_project_btn = gr.Button("📂 Open Project", variant="secondary")
+                            refresh_projects_btn = gr.Button("🔄 Refresh List", variant="secondary")
+                            new_project_btn = gr.Button("🆕 New Project", variant="secondary")
+                    
+                    with gr.Row():
+                        project_status = gr.Markdown()
+            
             # Step 1: Input Parameters
             with gr.Group():
                 gr.Markdown("## Step 1: Define Your Story Parameters")
@@ -222,6 +466,11 @@ class StoryInterface:
                 
                 with gr.Row():
                     generate_outline_btn = gr.Button("🚀 Generate Outline", variant="primary")
+                    skip_cache = gr.Checkbox(
+                        label="🔄 Force fresh generation",
+                        value=False,
+                        info="Skip cached results for identical parameters and reused outlines for similar ones"
+                    )
                     
                 with gr.Row():
                     outline_output = gr.Markdown(label="Generated Outline")
@@ -248,6 +497,8 @@ class StoryInterface:
                 
                 with gr.Row():
                     article_output = gr.Markdown(label="Generated Article")
+                    # Article text per outline section, for incremental regeneration
+                    article_draft = gr.State(None)
             
             # Step 5: Export Article
             with gr.Group():
@@ -257,6 +508,7 @@ class StoryInterface:
                 with gr.Row():
                     export_txt_btn = gr.Button("📄 Export as TXT", variant="secondary")
                     export_pdf_btn = gr.Button("📑 Export as PDF", variant="secondary")
+                    export_zip_btn = gr.Button("📦 Export TXT + PDF (ZIP)", variant="secondary")
                 
                 with gr.Row():
                     export_status = gr.Markdown(label="Download Links")
@@ -270,14 +522,17 @@ class StoryInterface:
             
             generate_outline_btn.click(
                 fn=self.generate_outline,
-                inputs=[structure_type, theme, audience, length, style, key_messages],
-                outputs=[outline_output, outline_editor]
+                inputs=[structure_type, theme, audience, length, style, key_messages, skip_cache, project_id],
+                outputs=[outline_output, outline_editor, project_id],
+                concurrency_limit=settings.GENERATION_CONCURRENCY_LIMIT
             )
             
             generate_article_btn.click(
                 fn=self.generate_article,
-                inputs=[outline_editor, theme, audience, length, style, key_messages],
-                outputs=article_output
+                inputs=[outline_editor, theme, audience, length, style, key_messages, skip_cache, article_draft,
+                        structure_type, project_id],
+                outputs=[article_output, article_draft, project_id],
+                concurrency_limit=settings.GENERATION_CONCURRENCY_LIMIT
             )
             
             export_txt_btn.click(
@@ -291,31 +546,88 @@ class StoryInterface:
                 inputs=[article_output, structure_type, theme, audience, length],
                 outputs=export_status
             )
+            
+            export_zip_btn.click(
+                fn=self.export_zip,
+                inputs=[article_output, structure_type, theme, audience, length],
+                outputs=export_status
+            )
+        
+            if projects_enabled:
+                refresh_projects_btn.click(fn=self.list_projects, outputs=project_picker)
+                demo.load(fn=self.list_projects, outputs=project_picker)
+                
+                open_project_btn.click(
+                    fn=self.open_project,
+                    inputs=project_picker,
+                    outputs=[structure_type, theme, audience, length, style, key_messages,
+                             outline_output, outline_editor, article_output, article_draft,
+                             project_id, project_status]
+                )
+                
+                new_project_btn.click(fn=self.new_project, outputs=[project_id, project_status])
         
         self.demo = demo
         return demo
     
-    def launch(self, share=False, auth=None):
+    def launch(self, share=False, auth=None, server_name=None, server_port=None):
         """
         Launch the Gradio interface with optional authentication
         
         Args:
             share (bool): Whether to create a public link
-            auth (tuple): (username, password) or None for no auth
+            auth (tuple or callable): (username, password), an auth function, or None for no auth
+            server_name (str): Interface to bind, or None for Gradio's default
+            server_port (int): Port to bind, or None for Gradio's default
         """
         if not self.demo:
             self.create_interface()
         
+        # Keep the downloads directory within its age and size limits
+        if settings.EXPORT_STORAGE != "memory":
+            from src.export.retention import get_download_retention
+            get_download_retention().start()
+        
+        # Warm the PDF render workers in the background so the first export is fast
+        from src.export.pdf_renderer import get_pdf_renderer
+        threading.Thread(target=get_pdf_renderer().start, daemon=True).start()
+        
         print(f"🌟 Starting {settings.APP_TITLE}...")
         
+        launch_kwargs = {"share": share}
+        if server_name:
+            launch_kwargs["server_name"] = server_name
+        if server_port:
+            launch_kwargs["server_port"] = server_port
+        
         # Set up authentication if provided
         if auth:
             print("🔒 Authentication enabled")
-            print("📱 Open your browser to: http://127.0.0.1:7860")
-            self.demo.launch(share=share, auth=self.authenticate_user)
-        else:
-            print("📱 Open your browser to: http://127.0.0.1:7860")
-            self.demo.launch(share=share)
+            launch_kwargs["auth"] = auth if callable(auth) else self.authenticate_user
+        
+        # Serve downloads and /health from Gradio's own FastAPI app and port
+        launch_kwargs["app_kwargs"] = {"routes": get_file_server().routes()}
+        
+        print(f"📱 Open your browser to: http://127.0.0.1:{server_port or 7860}")
+        self.demo.launch(**launch_kwargs)
+
+# Global interface instance, created on first use
+_story_interface = None
+
+def get_story_interface():
+    """
+    Get the global story interface, creating it on first use
+    
+    Returns:
+        StoryInterface: Shared interface
+    """
+    global _story_interface
+    if _story_interface is None:
+        _story_interface = StoryInterface()
+    return _story_interface
 
-# Create global interface instance
-story_interface = StoryInterface()
\ No newline at end of file
+def __getattr__(name):
+    """Keep `from src.ui.interface import story_interface` working"""
+    if name == "story_interface":
+        return get_story_interface()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
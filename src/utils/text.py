@@ -0,0 +1,22 @@
+"""
+Text helpers shared by the UI, exports and batch runs
+"""
+
+def strip_status_header(content):
+    """
+    Remove the status banner the generators put in front of their output
+    
+    Generated outlines and articles start with a "✅ ..." (or, while
+    streaming, "⏳ ...") line followed by a blank line.
+    
+    Args:
+        content (str): Generated content as formatted for display
+        
+    Returns:
+        str: Content without the first two lines, or unchanged if there is no banner
+    """
+    if content.startswith("✅") or content.startswith("⏳"):
+        lines = content.split('\n')
+        if len(lines) > 2:
+            return '\n'.join(lines[2:])
+    return content
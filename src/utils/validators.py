@@ -4,6 +4,13 @@ Input validation utilities
 
 from config.settings import settings
 from config.prompts import prompts
+from src.utils.metrics import metrics
+
+VALIDATIONS = metrics.counter("story_validations_total", "Story parameter validations by result", ("result",))
+VALIDATION_LATENCY = metrics.histogram(
+    "story_validation_seconds", "Time to validate story parameters",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05)
+)
 
 class StoryParameterValidator:
     """Validates story parameters input by users"""
@@ -24,6 +31,16 @@ class StoryParameterValidator:
         Returns:
             tuple: (is_valid, error_message)
         """
+        with VALIDATION_LATENCY.time():
+            is_valid, error_message = StoryParameterValidator._check_parameters(
+                structure_type, theme, audience, length, style, key_messages
+            )
+        VALIDATIONS.inc(result="valid" if is_valid else "invalid")
+        return is_valid, error_message
+    
+    @staticmethod
+    def _check_parameters(structure_type, theme, audience, length, style, key_messages):
+        """Run the checks of validate_parameters"""
         # Check story structure
         if not structure_type or structure_type not in prompts.STORY_STRUCTURES:
             return False, "❌ Story Structure is required. Please select a valid story structure."
@@ -0,0 +1,139 @@
+"""
+Tests for the OpenAI circuit breaker state machine
+"""
+
+import asyncio
+import httpx
+import openai
+import pytest
+from src.ai import circuit_breaker
+from src.ai.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+def _error(cls, status):
+    request = httpx.Request("POST", "http://localhost/v1/chat/completions")
+    return cls(str(status), response=httpx.Response(status, request=request), body=None)
+
+def _raise(error):
+    def fn():
+        raise error
+    return fn
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+def _breaker(**overrides):
+    options = dict(enabled=True, window=10, min_calls=4, failure_rate=0.5,
+                   slow_call_seconds=0, slow_call_rate=0.5, open_seconds=30)
+    options.update(overrides)
+    return CircuitBreaker("test", **options)
+
+def _trip(breaker):
+    for _ in range(breaker.min_calls):
+        with pytest.raises(openai.InternalServerError):
+            breaker.call(_raise(_error(openai.InternalServerError, 500)))
+
+def test_outage_errors_open_the_circuit(clock):
+    breaker = _breaker()
+    _trip(breaker)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.call(lambda: "never sent")
+    assert excinfo.value.retry_after == 30
+
+def test_needs_min_calls_before_tripping(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        with pytest.raises(openai.APIConnectionError):
+            breaker.call(_raise(openai.APIConnectionError(request=httpx.Request("POST", "http://x"))))
+    assert breaker.state == CLOSED
+
+def test_throttling_does_not_trip(clock):
+    breaker = _breaker()
+    for _ in range(20):
+        with pytest.raises(openai.RateLimitError):
+            breaker.call(_raise(_error(openai.RateLimitError, 429)))
+    assert breaker.state == CLOSED
+    assert breaker.stats()["recent_calls"] == 0
+
+def test_client_errors_count_as_success(clock):
+    breaker = _breaker()
+    for _ in range(10):
+        with pytest.raises(openai.BadRequestError):
+            breaker.call(_raise(_error(openai.BadRequestError, 400)))
+    assert breaker.state == CLOSED
+    assert breaker.stats()["failure_rate"] == 0.0
+
+def test_slow_calls_trip(clock):
+    breaker = _breaker(slow_call_seconds=5)
+    for _ in range(4):
+        trial = breaker.allow()
+        breaker.record(trial, False, 6.0)
+    assert breaker.state == OPEN
+
+def test_half_open_trial_success_closes(clock):
+    breaker = _breaker()
+    _trip(breaker)
+    clock[0] += 30
+    assert breaker.stats()["state"] == HALF_OPEN
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+    assert breaker.stats()["recent_calls"] == 0
+
+def test_half_open_trial_failure_reopens(clock):
+    breaker = _breaker()
+    _trip(breaker)
+    clock[0] += 30
+    with pytest.raises(openai.InternalServerError):
+        breaker.call(_raise(_error(openai.InternalServerError, 503)))
+    assert breaker.state == OPEN
+    assert breaker.stats()["retry_after"] == 30
+
+def test_only_one_trial_at_a_time(clock):
+    breaker = _breaker()
+    _trip(breaker)
+    clock[0] += 30
+    assert breaker.allow() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.release(True)
+    assert breaker.allow() is True
+
+def test_throttled_trial_is_released(clock):
+    breaker = _breaker()
+    _trip(breaker)
+    clock[0] += 30
+    with pytest.raises(openai.RateLimitError):
+        breaker.call(_raise(_error(openai.RateLimitError, 429)))
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is True
+
+def test_cancelled_async_trial_is_released(clock):
+    breaker = _breaker()
+    _trip(breaker)
+    clock[0] += 30
+
+    async def main():
+        task = asyncio.ensure_future(breaker.acall(lambda: asyncio.sleep(5)))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is True
+
+def test_late_outcomes_are_ignored_while_open(clock):
+    breaker = _breaker()
+    _trip(breaker)
+    breaker.record(False, False, 0.1)
+    assert breaker.state == OPEN
+
+def test_disabled_breaker_lets_everything_through(clock):
+    breaker = _breaker(enabled=False)
+    _trip(breaker)
+    assert breaker.state == CLOSED
+    assert breaker.call(lambda: "ok") == "ok"
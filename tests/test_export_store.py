@@ -0,0 +1,36 @@
+"""
+Tests for the content-addressed export stores
+"""
+
+import pytest
+from src.export.export_store import ExportStore, MemoryExportStore
+
+def _writer(data):
+    def write(f):
+        f.write(data)
+    return write
+
+def test_memory_store_keeps_exports_under_the_cap():
+    store = MemoryExportStore(max_bytes=10, ttl=60)
+    first, created = store.save("a" * 64, "txt", _writer(b"12345"))
+    assert created
+    assert store.save("a" * 64, "txt", _writer(b"other")) == (first, False)
+    second, _ = store.save("b" * 64, "txt", _writer(b"123456"))
+    # The older export is evicted to make room
+    assert store.get(first) is None
+    assert store.get(second) == b"123456"
+
+def test_memory_store_refuses_an_export_larger_than_the_cap():
+    store = MemoryExportStore(max_bytes=10, ttl=60)
+    kept, _ = store.save("a" * 64, "txt", _writer(b"12345"))
+    with pytest.raises(ValueError):
+        store.save("b" * 64, "txt", _writer(b"x" * 11))
+    assert store.get(kept) == b"12345"
+    assert store.stats()["exports"] == 1
+
+def test_disk_store_reuses_files(tmp_path):
+    store = ExportStore(str(tmp_path))
+    filename, created = store.save("a" * 64, "txt", _writer(b"hello"))
+    assert created
+    assert store.save("a" * 64, "txt", _writer(b"never written")) == (filename, False)
+    assert b"".join(store.iter_bytes(filename)) == b"hello"
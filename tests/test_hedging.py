@@ -0,0 +1,145 @@
+"""
+Tests for hedged requests and failover to the secondary provider
+"""
+
+import asyncio
+import httpx
+import openai
+import pytest
+from src.ai.circuit_breaker import CircuitOpenError
+from src.ai.hedging import HedgePolicy, hedged_call, percentile
+
+def _policy(**overrides):
+    options = dict(enabled=True, percentile=95, min_delay=0.02, max_rate=1.0, min_samples=1)
+    options.update(overrides)
+    return HedgePolicy(**options)
+
+def _warm(policy, stage="outline", latency=0.02, count=5):
+    for _ in range(count):
+        policy.observe(stage, latency, False)
+    return policy
+
+def _connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "http://localhost/v1/chat/completions"))
+
+class Attempts:
+    """Fake attempt callable: per-provider delays and outcomes"""
+
+    def __init__(self, primary=(0.0, "primary"), secondary=(0.0, "secondary")):
+        self.plans = {False: [primary], True: [secondary]}
+        self.calls = []
+        self.cancelled = []
+
+    def queue(self, secondary, delay, outcome):
+        self.plans[secondary].append((delay, outcome))
+
+    async def __call__(self, secondary):
+        plans = self.plans[secondary]
+        delay, outcome = plans.pop(0) if len(plans) > 1 else plans[0]
+        self.calls.append(secondary)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(secondary)
+            raise
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+def _run(attempts, has_secondary, policy, **kwargs):
+    async def main():
+        result = await hedged_call("outline", attempts, has_secondary, policy, **kwargs)
+        # Let cancelled losers finish
+        await asyncio.sleep(0.01)
+        return result
+    return asyncio.run(main())
+
+def test_percentile_is_nearest_rank():
+    assert percentile([], 95) is None
+    assert percentile(range(1, 101), 95) == 95
+    assert percentile([3, 1, 2], 50) == 2
+
+def test_no_hedge_while_warming_up():
+    attempts = Attempts(primary=(0.05, "primary"))
+    assert _run(attempts, True, _policy(min_samples=10)) == ("primary", False)
+    assert attempts.calls == [False]
+
+def test_fast_call_is_not_hedged():
+    attempts = Attempts()
+    assert _run(attempts, True, _warm(_policy())) == ("primary", False)
+    assert attempts.calls == [False]
+
+def test_slow_call_is_hedged_to_the_secondary_and_loser_cancelled():
+    attempts = Attempts(primary=(1.0, "primary"))
+    assert _run(attempts, True, _warm(_policy())) == ("secondary", True)
+    assert attempts.calls == [False, True]
+    assert attempts.cancelled == [False]
+
+def test_hedge_goes_to_the_same_provider_without_a_secondary():
+    attempts = Attempts(primary=(1.0, "slow"))
+    attempts.queue(False, 0.0, "fast")
+    assert _run(attempts, False, _warm(_policy())) == ("fast", False)
+    assert attempts.calls == [False, False]
+
+def test_hedge_rate_cap():
+    policy = _warm(_policy(max_rate=0.0))
+    attempts = Attempts(primary=(0.1, "primary"))
+    assert _run(attempts, True, policy) == ("primary", False)
+    assert attempts.calls == [False]
+
+def test_disabled_policy_never_hedges():
+    attempts = Attempts(primary=(0.1, "primary"))
+    assert _run(attempts, True, _warm(_policy(enabled=False))) == ("primary", False)
+    assert attempts.calls == [False]
+
+def test_transient_failure_fails_over():
+    attempts = Attempts(primary=(0.0, _connection_error()))
+    assert _run(attempts, True, _policy()) == ("secondary", True)
+    assert attempts.calls == [False, True]
+
+def test_open_circuit_fails_over():
+    attempts = Attempts(primary=(0.0, CircuitOpenError("primary", 30)))
+    assert _run(attempts, True, _policy()) == ("secondary", True)
+
+def test_no_failover_without_secondary_or_for_client_errors():
+    with pytest.raises(openai.APIConnectionError):
+        _run(Attempts(primary=(0.0, _connection_error())), False, _policy())
+    attempts = Attempts(primary=(0.0, ValueError("bad request")))
+    with pytest.raises(ValueError):
+        _run(attempts, True, _policy())
+    assert attempts.calls == [False]
+
+def test_failed_hedge_leaves_the_original_running():
+    attempts = Attempts(primary=(0.1, "primary"), secondary=(0.0, _connection_error()))
+    assert _run(attempts, True, _warm(_policy())) == ("primary", False)
+
+def test_loser_that_still_finishes_is_discarded():
+    discarded = []
+
+    async def discard(result):
+        discarded.append(result)
+
+    async def attempt(secondary):
+        if secondary:
+            return "secondary"
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            # E.g. a stream that opened just as it was cancelled
+            return "late primary"
+
+    async def main():
+        result = await hedged_call("outline", attempt, True, _warm(_policy()), discard=discard)
+        await asyncio.sleep(0.01)
+        return result
+
+    assert asyncio.run(main()) == ("secondary", True)
+    assert discarded == ["late primary"]
+
+def test_latency_is_recorded_except_after_failover():
+    policy = _policy(min_samples=1)
+    _run(Attempts(), True, policy)
+    assert policy.delay("outline") == 0.02
+    failover_policy = _policy(min_samples=1)
+    _run(Attempts(primary=(0.0, _connection_error())), True, failover_policy)
+    assert failover_policy.delay("outline") is None
@@ -0,0 +1,86 @@
+"""
+Tests for the export markdown parser
+"""
+
+import pytest
+from src.export.markdown_document import Span, parse_markdown, _parse_inline
+
+def _plain(text):
+    return "".join(span.text for span in _parse_inline(text))
+
+@pytest.mark.parametrize("text", [
+    "The cost is 2 * 3 * 4 dollars",
+    "5 * 3 = 15 and 2 * x",
+    "x ** y ** z",
+    "a * b",
+])
+def test_arithmetic_asterisks_stay_literal(text):
+    assert _parse_inline(text) == (Span(text, False, False),)
+
+def test_arithmetic_asterisks_render_literally_in_text_and_pdf():
+    document = parse_markdown("The cost is 2 * 3 * 4 dollars")
+    assert document.to_text() == "The cost is 2 * 3 * 4 dollars"
+    assert document.to_pdf_blocks() == [("body", "The cost is 2 * 3 * 4 dollars", None)]
+
+def test_bold_and_italic():
+    assert _parse_inline("**bold** and *it* and __b__ and _i_") == (
+        Span("bold", True, False),
+        Span(" and ", False, False),
+        Span("it", False, True),
+        Span(" and ", False, False),
+        Span("b", True, False),
+        Span(" and ", False, False),
+        Span("i", False, True),
+    )
+
+def test_nested_emphasis():
+    assert _parse_inline("**bold *both* bold**") == (
+        Span("bold ", True, False),
+        Span("both", True, True),
+        Span(" bold", True, False),
+    )
+
+def test_space_before_marker_cannot_close():
+    assert _parse_inline("a *b * c* d") == (
+        Span("a ", False, False),
+        Span("b * c", False, True),
+        Span(" d", False, False),
+    )
+
+def test_unclosed_markers_are_literal():
+    assert _plain("**unclosed") == "**unclosed"
+    assert _parse_inline("*a *b*") == (Span("*a ", False, False), Span("b", False, True))
+
+def test_snake_case_underscores_are_literal():
+    assert _parse_inline("call snake_case_name now") == (Span("call snake_case_name now", False, False),)
+
+def test_inline_code_and_links():
+    assert _plain("use `*args` and [docs](https://example.com)") == "use *args and docs"
+
+def test_blocks_and_banner():
+    document = parse_markdown(
+        "✅ **Article Generated Successfully!**\n\n"
+        "# Title\n\n"
+        "First *line*\ncontinues.\n\n"
+        "- one\n- two\n\n"
+        "1. first\n2) second\n"
+    )
+    assert [(block.kind, block.number) for block in document.blocks] == [
+        ("heading", 1), ("paragraph", 0), ("bullet", 0), ("bullet", 0), ("numbered", 1), ("numbered", 2)
+    ]
+    assert document.to_text() == "TITLE\n\nFirst line continues.\n\n- one\n- two\n\n1. first\n2. second"
+
+def test_pdf_markup_is_escaped():
+    blocks = parse_markdown("Fish & chips <b> are **great**").to_pdf_blocks()
+    assert blocks == [("body", "Fish &amp; chips &lt;b&gt; are <b>great</b>", None)]
+
+@pytest.mark.parametrize("line, title", [
+    ("## Intro to C#", "Intro to C#"),
+    ("## Closing hashes ##", "Closing hashes"),
+    ("# Title #  ", "Title"),
+    ("### F# and C# #", "F# and C#"),
+])
+def test_heading_closing_sequence(line, title):
+    block, = parse_markdown(line).blocks
+    assert block.kind == "heading"
+    assert "".join(span.text for span in block.spans) == title
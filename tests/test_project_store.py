@@ -0,0 +1,96 @@
+"""
+Tests for persistent projects and their delta/keyframe version history
+"""
+
+import hashlib
+import pytest
+from src.projects.project_store import KEYFRAME_INTERVAL, ProjectStore, apply_delta, make_delta
+
+PARAMS = {"structure_type": "personal_journey", "theme": "Learning to rest", "length": 800}
+
+@pytest.fixture
+def store(tmp_path):
+    return ProjectStore(str(tmp_path / "projects.sqlite3"))
+
+def _article(version):
+    # Hashes keep zlib from shrinking the keyframes as much as the deltas
+    paragraphs = [hashlib.sha256(str(index).encode()).hexdigest() + "\n" for index in range(40)]
+    paragraphs[version % 40] = f"Paragraph edited in version {version}.\n"
+    return "".join(paragraphs)
+
+@pytest.mark.parametrize("base, text", [
+    ("", "new\ntext"),
+    ("a\nb\nc\n", "a\nB\nc\nd\n"),
+    ("a\nb\nc", ""),
+    ("same\n", "same\n"),
+    ("no newline", "no newline\nadded"),
+])
+def test_delta_round_trip(base, text):
+    assert apply_delta(base, make_delta(base, text)) == text
+
+def test_create_and_load(store):
+    project_id = store.create_project("alice", PARAMS)
+    project = store.load_project(project_id, "alice")
+    assert project["title"] == "Learning to rest"
+    assert project["params"] == PARAMS
+    assert project["outline"] is None
+    assert project["versions"] == {"params": 1, "outline": 0, "article": 0, "draft": 0}
+
+def test_every_version_is_rebuilt_across_keyframes(store):
+    project_id = store.create_project("alice", PARAMS)
+    count = KEYFRAME_INTERVAL * 2 + 5
+    for version in range(1, count + 1):
+        assert store.save(project_id, "alice", article=_article(version)) == {"article": version}
+
+    for version in range(1, count + 1):
+        assert store.load_version(project_id, "alice", "article", version) == _article(version)
+    assert store.load_project(project_id, "alice")["article"] == _article(count)
+
+    history = store.history(project_id, "alice", "article")
+    assert [entry["number"] for entry in history] == list(range(1, count + 1))
+    # Deltas are much smaller than the keyframes
+    assert history[1]["stored"] * 3 < history[0]["stored"]
+    assert history[KEYFRAME_INTERVAL]["stored"] > history[1]["stored"] * 3
+
+def test_unchanged_values_are_not_stored_again(store):
+    project_id = store.create_project("alice", PARAMS)
+    store.save(project_id, "alice", outline="1. Start", article="Text")
+    assert store.save(project_id, "alice", params=PARAMS, outline="1. Start", article="Text") == {
+        "params": 1, "outline": 1, "article": 1
+    }
+    assert store.save(project_id, "alice", outline="1. Start\n2. End") == {"outline": 2}
+
+def test_draft_round_trip(store):
+    project_id = store.create_project("alice", PARAMS)
+    draft = {"sections": [{"title": "Intro", "text": "Hello"}]}
+    store.save(project_id, "alice", draft=draft)
+    assert store.load_project(project_id, "alice")["draft"] == draft
+
+def test_projects_are_private_to_their_owner(store):
+    project_id = store.create_project("alice", PARAMS)
+    store.save(project_id, "alice", outline="1. Start")
+    assert store.save(project_id, "bob", outline="stolen") is None
+    assert store.load_project(project_id, "bob") is None
+    assert store.history(project_id, "bob", "outline") is None
+    assert store.load_version(project_id, "bob", "outline", 1) is None
+    assert store.list_projects("bob") == []
+    assert store.load_project(project_id, "alice")["outline"] == "1. Start"
+    assert store.load_project(project_id + 1, "alice") is None
+
+def test_list_projects_newest_first(store):
+    first = store.create_project("alice", PARAMS)
+    second = store.create_project("alice", dict(PARAMS, theme=""))
+    store.create_project(None, PARAMS)
+    store.save(first, "alice", outline="1. Start")
+    projects = store.list_projects("alice")
+    assert [project["id"] for project in projects] == [first, second]
+    assert projects[1]["title"] == "Untitled story"
+    assert len(store.list_projects(None)) == 1
+
+def test_history_survives_reopening(tmp_path):
+    path = str(tmp_path / "projects.sqlite3")
+    project_id = ProjectStore(path).create_project("alice", PARAMS, title="Rest")
+    ProjectStore(path).save(project_id, "alice", article=_article(1))
+    reopened = ProjectStore(path).load_project(project_id, "alice")
+    assert reopened["title"] == "Rest"
+    assert reopened["article"] == _article(1)
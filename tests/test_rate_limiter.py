@@ -0,0 +1,198 @@
+"""
+Tests for the token buckets and the rate-limit scheduler
+"""
+
+import asyncio
+from types import SimpleNamespace
+import httpx
+import openai
+import pytest
+from src.ai import llm_client as llm_client_module
+from src.ai import rate_limiter as rate_limiter_module
+from src.ai.rate_limiter import RateLimitScheduler, TokenBucket, parse_reset_duration
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter_module.time, "monotonic", lambda: now[0])
+    return now
+
+def _scheduler(tpm=60000):
+    return RateLimitScheduler(requests_per_minute=0, tokens_per_minute=tpm,
+                              max_retries=2, base_delay=0.001, max_delay=0.001)
+
+def _rate_limit_error():
+    request = httpx.Request("POST", "http://localhost/v1/chat/completions")
+    return openai.RateLimitError("429", response=httpx.Response(429, request=request), body=None)
+
+@pytest.mark.parametrize("value, seconds", [
+    ("1s", 1.0), ("6m0s", 360.0), ("250ms", 0.25), ("1h2m", 3720.0), ("0.5", 0.5), ("soon", None), (None, None)
+])
+def test_parse_reset_duration(value, seconds):
+    assert parse_reset_duration(value) == seconds
+
+def test_reserve_queues_callers_in_order(clock):
+    bucket = TokenBucket(100, 60)  # one token per second
+    assert bucket.reserve(80) == 0.0
+    assert bucket.reserve(50) == 30.0
+    assert bucket.reserve(10) == 40.0
+    clock[0] += 40
+    assert bucket.tokens == -40
+    assert bucket.reserve(0) == 0.0
+
+def test_reservation_is_capped_at_capacity(clock):
+    bucket = TokenBucket(100, 60)
+    assert bucket.reserve(500) == 0.0
+    assert bucket.tokens == 0
+
+def test_adjust_refunds_and_charges_up_to_capacity(clock):
+    bucket = TokenBucket(100, 60)
+    bucket.reserve(80)
+    bucket.adjust(200)
+    assert bucket.tokens == 100
+    bucket.adjust(-30)
+    assert bucket.tokens == 70
+
+def test_sync_only_lowers_the_balance(clock):
+    bucket = TokenBucket(100, 60)
+    bucket.sync(150)
+    assert bucket.tokens == 100
+    bucket.sync(40)
+    assert bucket.tokens == 40
+    bucket.reserve(100)
+    bucket.sync(-100, reset_seconds=10)
+    assert bucket.tokens == -10
+
+def test_settle_returns_the_unused_estimate(clock):
+    scheduler = _scheduler()
+    scheduler.token_bucket.reserve(5000)
+    scheduler.settle(5000, 1200)
+    assert scheduler.token_bucket.tokens == 60000 - 1200
+    scheduler.settle(1000, None)
+    assert scheduler.token_bucket.tokens == 60000 - 1200
+
+def test_settle_charges_an_underestimate(clock):
+    scheduler = _scheduler()
+    scheduler.token_bucket.reserve(1000)
+    scheduler.settle(1000, 3000)
+    assert scheduler.token_bucket.tokens == 60000 - 3000
+
+def test_failed_calls_are_refunded(clock, monkeypatch):
+    monkeypatch.setattr(rate_limiter_module.time, "sleep", lambda seconds: None)
+    scheduler = _scheduler()
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise _rate_limit_error()
+
+    with pytest.raises(openai.RateLimitError):
+        scheduler.run(call, 5000)
+    assert calls == [1, 1, 1]
+    assert scheduler.token_bucket.tokens == 60000
+
+    def bad_request():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        scheduler.run(bad_request, 5000)
+    assert scheduler.token_bucket.tokens == 60000
+
+def test_run_retries_then_succeeds(clock, monkeypatch):
+    monkeypatch.setattr(rate_limiter_module.time, "sleep", lambda seconds: None)
+    scheduler = _scheduler()
+    outcomes = [_rate_limit_error(), "ok"]
+
+    def call():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert scheduler.run(call, 5000) == "ok"
+    # The successful attempt's reservation is settled by the caller
+    assert scheduler.token_bucket.tokens == 55000
+
+def test_arun_refunds_a_cancelled_request():
+    scheduler = _scheduler()
+
+    async def main():
+        task = asyncio.ensure_future(scheduler.arun(lambda: asyncio.sleep(5), 5000))
+        await asyncio.sleep(0.01)
+        assert scheduler.token_bucket.tokens < 60000 - 4000
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert scheduler.token_bucket.tokens == 60000
+
+def test_arun_refunds_a_request_cancelled_while_queued():
+    scheduler = _scheduler()
+    scheduler.token_bucket.reserve(60000)
+
+    async def main():
+        task = asyncio.ensure_future(scheduler.arun(lambda: asyncio.sleep(0), 5000))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    # Only the earlier reservation (minus the refill since) is still held
+    assert scheduler.token_bucket.tokens > -100
+
+def test_backoff_honours_retry_after():
+    scheduler = RateLimitScheduler(requests_per_minute=0, tokens_per_minute=0,
+                                   max_retries=2, base_delay=1, max_delay=30)
+    request = httpx.Request("POST", "http://localhost/v1/chat/completions")
+    response = httpx.Response(429, request=request, headers={"retry-after-ms": "1500"})
+    error = openai.RateLimitError("429", response=response, body=None)
+    assert scheduler.backoff_delay(0, error) == 1.5
+    assert 0.5 <= scheduler.backoff_delay(3) <= 8
+
+class FakeStream:
+    """Sync chat completion stream that may fail partway through"""
+
+    def __init__(self, deltas, error=None):
+        self.deltas = deltas
+        self.error = error
+        self.closed = False
+
+    def __iter__(self):
+        for delta in self.deltas:
+            yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def streaming(monkeypatch):
+    scheduler = _scheduler()
+    monkeypatch.setattr(llm_client_module, "rate_limiter", scheduler)
+    client = llm_client_module.LLMClient()
+    args = client._stream_args([{"role": "user", "content": "Hi"}], 5000, None)
+    return scheduler, client, args
+
+def test_stream_stopped_early_is_closed_and_refunded(streaming, monkeypatch):
+    scheduler, client, args = streaming
+    stream = FakeStream(["a", "b", "c"])
+    monkeypatch.setattr(client, "_create", lambda args: stream)
+
+    deltas = client._stream(args, "outline")
+    assert next(deltas) == "a"
+    deltas.close()
+    assert stream.closed
+    assert scheduler.token_bucket.tokens == 60000
+
+def test_stream_failing_midway_is_closed_and_refunded(streaming, monkeypatch):
+    scheduler, client, args = streaming
+    stream = FakeStream(["a"], RuntimeError("connection reset"))
+    monkeypatch.setattr(client, "_create", lambda args: stream)
+
+    with pytest.raises(RuntimeError):
+        list(client._stream(args, "outline"))
+    assert stream.closed
+    assert scheduler.token_bucket.tokens == 60000
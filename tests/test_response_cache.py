@@ -0,0 +1,51 @@
+"""
+Tests for the two-level response cache
+"""
+
+import pytest
+from src.ai import outline_generator as outline_module
+from src.ai.response_cache import ResponseCache
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=0, max_memory_entries=2)
+    cache.enabled = True
+    return cache
+
+@pytest.fixture
+def broken_cache(tmp_path):
+    # The "directory" of the SQLite file is a regular file, so it cannot be opened
+    (tmp_path / "blocked").write_text("")
+    cache = ResponseCache(str(tmp_path / "blocked" / "cache.sqlite3"), ttl_seconds=0)
+    cache.enabled = True
+    return cache
+
+def test_round_trip_through_memory_and_disk(cache, tmp_path):
+    cache.set("a", "first")
+    cache.set("b", "second")
+    cache.set("c", "third")  # Pushes "a" out of memory
+    assert cache.get("a") == "first"
+    reopened = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=0)
+    reopened.enabled = True
+    assert reopened.get("c") == "third"
+    assert reopened.get("missing") is None
+
+def test_unwritable_path_is_a_miss(broken_cache):
+    assert broken_cache.get("key") is None
+
+def test_unwritable_path_still_keeps_the_value_in_memory(broken_cache):
+    broken_cache.set("key", "paid for")
+    assert broken_cache.get("key") == "paid for"
+
+def test_outline_survives_a_broken_cache(broken_cache, monkeypatch):
+    monkeypatch.setattr(outline_module, "response_cache", broken_cache)
+    monkeypatch.setattr(outline_module, "get_similar_outline_index", lambda: None)
+    monkeypatch.setattr(outline_module, "json_mode_enabled", lambda: False)
+    generator = outline_module.OutlineGenerator()
+    monkeypatch.setattr(generator.llm, "complete", lambda *args, **kwargs: "1. Opening")
+
+    outline = generator.generate_outline(
+        "personal_journey", "Learning to rest", "Managers", 800, "Warm", "Rest is work"
+    )
+    assert outline.startswith("✅")
+    assert outline.endswith("1. Opening")
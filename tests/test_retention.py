@@ -0,0 +1,64 @@
+"""
+Tests for download retention and its interplay with the export store
+"""
+
+import os
+import time
+import pytest
+from src.export.export_store import ExportStore
+from src.export.retention import DownloadRetention
+
+KEY = "a" * 64
+
+@pytest.fixture
+def stored(tmp_path):
+    retention = DownloadRetention(str(tmp_path), max_age=3600, max_bytes=0, interval=3600)
+    store = ExportStore(str(tmp_path), retention=retention)
+    filename, _ = store.save(KEY, "txt", lambda f: f.write(b"article"))
+    path = store.path_for(filename)
+    # Exported two hours ago, before a restart that forgot the in-memory accesses
+    old = time.time() - 7200
+    os.utime(path, (old, old))
+    retention._last_access.clear()
+    return retention, store, filename, path
+
+def test_stale_files_are_removed(stored):
+    retention, _, _, path = stored
+    assert retention.sweep()["expired"] == 1
+    assert not os.path.exists(path)
+
+def test_a_reused_export_is_not_swept_after_a_restart(stored):
+    retention, store, filename, path = stored
+    assert store.save(KEY, "txt", lambda f: f.write(b"never written")) == (filename, False)
+    retention._last_access.clear()
+    assert retention.sweep()["expired"] == 0
+    assert os.path.exists(path)
+
+def test_an_export_reused_during_a_sweep_is_kept(stored, monkeypatch):
+    retention, store, filename, path = stored
+    scan = retention._scan
+
+    def scan_then_reuse():
+        entries = scan()
+        # The same article is exported again while the sweep is running
+        store.save(KEY, "txt", lambda f: f.write(b"never written"))
+        return entries
+
+    monkeypatch.setattr(retention, "_scan", scan_then_reuse)
+    assert retention.sweep()["expired"] == 0
+    assert os.path.exists(path)
+
+def test_recently_used_files_survive_quota_eviction(stored, monkeypatch):
+    retention, store, filename, path = stored
+    retention.max_age = 0
+    retention.max_bytes = 1
+    scan = retention._scan
+
+    def scan_then_reuse():
+        entries = scan()
+        store.save(KEY, "txt", lambda f: f.write(b"never written"))
+        return entries
+
+    monkeypatch.setattr(retention, "_scan", scan_then_reuse)
+    assert retention.sweep()["evicted"] == 0
+    assert os.path.exists(path)
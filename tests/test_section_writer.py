@@ -0,0 +1,59 @@
+"""
+Tests for parallel section writing and its transition pass
+"""
+
+import asyncio
+import pytest
+from config.settings import settings
+from src.ai.section_writer import SectionWriter
+
+OUTLINE = "1. Opening\n   Set the scene\n2. Turning Point\n   What changed\n3. Closing\n   Lessons learned\n"
+
+class FakeLLM:
+    """Writes "<title> body" per section; the transition after "Opening" fails"""
+
+    def _answer(self, messages, stage):
+        prompt = messages[-1]["content"]
+        if stage == "section_transition":
+            if 'END OF SECTION "Opening"' in prompt:
+                raise RuntimeError("transition failed")
+            return "A bridge."
+        return "Section body."
+
+    def complete(self, messages, max_tokens, temperature=None, response_format=None, stage="other"):
+        return self._answer(messages, stage)
+
+    async def acomplete(self, messages, max_tokens, temperature=None, response_format=None, stage="other"):
+        return self._answer(messages, stage)
+
+    async def astream(self, messages, max_tokens, temperature=None, stage="other"):
+        yield self._answer(messages, stage)
+
+@pytest.fixture
+def writer(monkeypatch):
+    monkeypatch.setattr(settings, "SECTION_TRANSITIONS", True)
+    writer = SectionWriter(FakeLLM())
+    return writer, writer.plan(OUTLINE, 900)
+
+def _check(article, transitions):
+    assert article.count("Section body.") == 3
+    assert article.count("A bridge.") == 1
+    assert transitions == [None, "A bridge."]
+
+def test_failed_transition_does_not_fail_the_article(writer):
+    writer, tasks = writer
+    transitions = [None] * (len(tasks) - 1)
+    article = list(writer.write(tasks, OUTLINE, "Rest", "Managers", "Warm", "Rest", transitions=transitions))[-1]
+    _check(article, transitions)
+
+def test_failed_transition_does_not_fail_the_streamed_article(writer):
+    writer, tasks = writer
+    transitions = [None] * (len(tasks) - 1)
+
+    async def main():
+        updates = [update async for update in writer.astream(
+            tasks, OUTLINE, "Rest", "Managers", "Warm", "Rest", transitions=transitions
+        )]
+        return updates[-1]
+
+    _check(asyncio.run(main()), transitions)
@@ -0,0 +1,92 @@
+"""
+Tests for MinHash/LSH near-duplicate outline lookup
+"""
+
+import sqlite3
+import pytest
+from src.ai.similar_outlines import NUM_PERM, SimilarOutlineIndex, shingles, signature, similarity
+
+THEME = "Overcoming fear of failure"
+AUDIENCE = "Young professionals"
+KEY_MESSAGES = "Failure is a teacher; courage grows with practice"
+
+@pytest.fixture
+def index(tmp_path):
+    return SimilarOutlineIndex(str(tmp_path / "similar.sqlite3"), threshold=0.5)
+
+def test_shingles_drop_stop_words_stem_and_tag_fields():
+    result = shingles("The fear of failing", "Managers", "")
+    assert result == {"t:fear", "t:fail", "t:fear fail", "a:manager"}
+
+def test_same_word_in_different_fields_does_not_match():
+    assert shingles("growth", "", "").isdisjoint(shingles("", "growth", ""))
+
+def test_signature_is_deterministic_and_empty_set_has_none():
+    first = signature(shingles(THEME, AUDIENCE, KEY_MESSAGES))
+    assert len(first) == NUM_PERM
+    assert first == signature(shingles(THEME, AUDIENCE, KEY_MESSAGES))
+    assert signature(set()) is None
+
+def test_similarity_tracks_overlap():
+    base = signature(shingles(THEME, AUDIENCE, KEY_MESSAGES))
+    reworded = signature(shingles("Overcoming the fear of failing", AUDIENCE, KEY_MESSAGES))
+    unrelated = signature(shingles("Baking sourdough bread", "Retirees", "Patience and flour"))
+    assert similarity(base, base) == 1.0
+    assert similarity(base, reworded) > 0.5
+    assert similarity(base, unrelated) < 0.2
+
+def test_find_returns_reworded_match(index):
+    index.add("personal_journey", THEME, AUDIENCE, KEY_MESSAGES, "1. Outline")
+    match = index.find("personal_journey", "Overcoming the fear of failing", AUDIENCE, KEY_MESSAGES)
+    assert match is not None
+    assert match.outline == "1. Outline"
+    assert match.similarity >= 0.5
+
+def test_find_misses_unrelated_requests_and_other_structures(index):
+    index.add("personal_journey", THEME, AUDIENCE, KEY_MESSAGES, "1. Outline")
+    assert index.find("personal_journey", "Baking sourdough bread", "Retirees", "Patience and flour") is None
+    assert index.find("hero_journey", THEME, AUDIENCE, KEY_MESSAGES) is None
+
+def test_outlines_are_only_reused_for_their_user(index):
+    index.add("personal_journey", THEME, AUDIENCE, KEY_MESSAGES, "alice's outline", "alice")
+    assert index.find("personal_journey", THEME, AUDIENCE, KEY_MESSAGES, "bob") is None
+    assert index.find("personal_journey", THEME, AUDIENCE, KEY_MESSAGES) is None
+    assert index.find("personal_journey", THEME, AUDIENCE, KEY_MESSAGES, "alice").outline == "alice's outline"
+
+def test_files_without_usernames_are_migrated(tmp_path):
+    path = tmp_path / "similar.sqlite3"
+    connection = sqlite3.connect(str(path))
+    connection.execute(
+        "CREATE TABLE outlines (id INTEGER PRIMARY KEY, created_at REAL NOT NULL, structure_type TEXT NOT NULL, "
+        "theme TEXT, audience TEXT, key_messages TEXT, signature BLOB NOT NULL, outline TEXT NOT NULL)"
+    )
+    connection.execute(
+        "INSERT INTO outlines VALUES (1, 0, 'personal_journey', ?, ?, ?, ?, 'old outline')",
+        (THEME, AUDIENCE, KEY_MESSAGES, signature(shingles(THEME, AUDIENCE, KEY_MESSAGES)).tobytes())
+    )
+    connection.commit()
+    connection.close()
+
+    index = SimilarOutlineIndex(str(path), threshold=0.5)
+    assert index.find("personal_journey", THEME, AUDIENCE, KEY_MESSAGES, "alice") is None
+    assert index.find("personal_journey", THEME, AUDIENCE, KEY_MESSAGES).outline == "old outline"
+    index.add("personal_journey", THEME, AUDIENCE, KEY_MESSAGES, "new outline", "alice")
+    assert index.find("personal_journey", THEME, AUDIENCE, KEY_MESSAGES, "alice").outline == "new outline"
+
+def test_empty_requests_and_outlines_are_not_indexed(index):
+    index.add("personal_journey", "", "", "", "1. Outline")
+    index.add("personal_journey", THEME, AUDIENCE, KEY_MESSAGES, "")
+    assert len(index) == 0
+    assert index.find("personal_journey", "", "", "") is None
+
+def test_newest_entry_wins_ties(index):
+    index.add("personal_journey", THEME, AUDIENCE, KEY_MESSAGES, "old")
+    index.add("personal_journey", THEME, AUDIENCE, KEY_MESSAGES, "new")
+    assert index.find("personal_journey", THEME, AUDIENCE, KEY_MESSAGES).outline == "new"
+
+def test_index_is_reloaded_from_disk(tmp_path):
+    path = str(tmp_path / "similar.sqlite3")
+    SimilarOutlineIndex(path, threshold=0.5).add("personal_journey", THEME, AUDIENCE, KEY_MESSAGES, "1. Outline")
+    reopened = SimilarOutlineIndex(path, threshold=0.5)
+    assert len(reopened) == 1
+    assert reopened.find("personal_journey", THEME, AUDIENCE, KEY_MESSAGES).similarity == 1.0
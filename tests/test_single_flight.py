@@ -0,0 +1,208 @@
+"""
+Tests for single-flight coalescing of identical requests
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from src.ai.single_flight import AsyncSingleFlight, SingleFlight
+
+def _run_threads(count, target):
+    results = [None] * count
+    errors = [None] * count
+
+    def run(index):
+        try:
+            results[index] = target()
+        except Exception as e:
+            errors[index] = e
+
+    # Daemon threads, so a regression that leaves one stuck cannot hang the run
+    threads = [threading.Thread(target=run, args=(index,), daemon=True) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+def _wait_for_subscribers(flight, count, timeout=5):
+    """Wait until `count` callers joined the flights, failing instead of hanging"""
+    deadline = time.monotonic() + timeout
+    while sum(f.subscribers for f in list(flight._flights.values())) < count:
+        assert time.monotonic() < deadline, f"only some of {count} callers joined the flight"
+        time.sleep(0.001)
+
+def test_call_runs_once_for_concurrent_callers():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    threads, results, errors = _run_threads(5, lambda: flight.call("key", fn))
+    # Let every thread join the flight before the leader finishes
+    _wait_for_subscribers(flight, 5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ["result"] * 5
+    assert errors == [None] * 5
+    assert flight._flights == {}
+
+def test_call_shares_the_error():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise ValueError("boom")
+
+    threads, _, errors = _run_threads(3, lambda: flight.call("key", fn))
+    _wait_for_subscribers(flight, 3)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert all(isinstance(error, ValueError) for error in errors)
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight()
+    assert flight.call("a", lambda: 1) == 1
+    assert flight.call("b", lambda: 2) == 2
+
+def test_stream_late_joiner_replays_from_the_start():
+    flight = SingleFlight()
+    first_sent = threading.Event()
+    release = threading.Event()
+    opened = []
+
+    def fn():
+        opened.append(1)
+        yield "a"
+        first_sent.set()
+        release.wait(5)
+        yield "b"
+        yield "c"
+
+    first = flight.stream("key", fn)
+    assert next(first) == "a"
+    first_sent.wait(5)
+    second = flight.stream("key", fn)
+    release.set()
+
+    assert list(second) == ["a", "b", "c"]
+    assert list(first) == ["b", "c"]
+    assert opened == [1]
+
+def test_stream_error_reaches_every_subscriber():
+    flight = SingleFlight()
+
+    def fn():
+        yield "a"
+        raise RuntimeError("dropped")
+
+    with pytest.raises(RuntimeError):
+        list(flight.stream("key", fn))
+
+def test_abandoned_stream_lets_new_callers_start_fresh():
+    flight = SingleFlight()
+    release = threading.Event()
+    opened = []
+
+    def fn():
+        opened.append(1)
+        yield "a"
+        release.wait(5)
+        yield "b"
+
+    stream = flight.stream("key", fn)
+    assert next(stream) == "a"
+    stream.close()
+    release.set()
+
+    assert list(flight.stream("key", lambda: iter(["x"]))) == ["x"]
+    assert opened == [1]
+
+def test_async_call_runs_once_for_concurrent_callers():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*[flight.call("key", fn) for _ in range(5)])
+
+    assert asyncio.run(main()) == ["result"] * 5
+    assert calls == [1]
+
+def test_async_call_survives_one_caller_cancelling():
+    flight = AsyncSingleFlight()
+    upstream_cancelled = []
+
+    async def fn():
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            upstream_cancelled.append(1)
+            raise
+        return "result"
+
+    async def main():
+        leaver = asyncio.ensure_future(flight.call("key", fn))
+        stayer = asyncio.ensure_future(flight.call("key", fn))
+        await asyncio.sleep(0.01)
+        leaver.cancel()
+        return await stayer, leaver.cancelled()
+
+    assert asyncio.run(main()) == ("result", True)
+    assert upstream_cancelled == []
+
+def test_async_call_cancels_upstream_when_everyone_leaves():
+    flight = AsyncSingleFlight()
+    upstream_cancelled = []
+
+    async def fn():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            upstream_cancelled.append(1)
+            raise
+
+    async def main():
+        callers = [asyncio.ensure_future(flight.call("key", fn)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert upstream_cancelled == [1]
+    assert flight._flights == {}
+
+def test_async_stream_is_shared_and_replayed():
+    flight = AsyncSingleFlight()
+    opened = []
+
+    async def deltas():
+        opened.append(1)
+        for delta in ("a", "b", "c"):
+            await asyncio.sleep(0.01)
+            yield delta
+
+    async def collect(delay):
+        await asyncio.sleep(delay)
+        return [delta async for delta in flight.stream("key", deltas)]
+
+    async def main():
+        return await asyncio.gather(collect(0), collect(0.015))
+
+    assert asyncio.run(main()) == [["a", "b", "c"], ["a", "b", "c"]]
+    assert opened == [1]
@@ -0,0 +1,53 @@
+"""
+Tests for the usage ledger and per-user daily budgets
+"""
+
+from types import SimpleNamespace
+import pytest
+from src.ai import outline_generator as outline_module
+from src.ai.usage_ledger import BudgetExceededError, UsageLedger, _today
+
+def _usage(tokens):
+    return SimpleNamespace(prompt_tokens=tokens, completion_tokens=0, prompt_tokens_details=None)
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = UsageLedger(str(tmp_path / "ledger.sqlite3"), daily_budget=100)
+    yield ledger
+    ledger.flush()
+
+def test_queued_records_count_against_the_budget(ledger):
+    ledger.record("gpt-4o", "outline", _usage(60), username="alice")
+    ledger.check_budget("alice")
+    ledger.record("gpt-4o", "outline", _usage(50), username="alice")
+    with pytest.raises(BudgetExceededError):
+        ledger.check_budget("alice")
+    ledger.check_budget("bob")
+    ledger.check_budget(None)
+
+def test_cold_check_counts_queued_records(ledger):
+    for _ in range(5):
+        ledger.record("gpt-4o", "outline", _usage(20), username="alice")
+    with pytest.raises(BudgetExceededError):
+        ledger.check_budget("alice")
+
+def test_records_made_while_the_total_is_read_are_counted_once(ledger, monkeypatch):
+    ledger.record("gpt-4o", "outline", _usage(60), username="alice")
+    insert = ledger._insert
+
+    def insert_then_record(rows):
+        insert(rows)
+        # Another request finishes while the database is read
+        ledger.record("gpt-4o", "outline", _usage(30), username="alice")
+
+    monkeypatch.setattr(ledger, "_insert", insert_then_record)
+    ledger.check_budget("alice")
+    monkeypatch.undo()
+    assert ledger._usage[("alice", _today())] == 90
+    ledger.flush()
+    assert ledger.tokens_used("alice") == 90
+
+def test_budget_error_message_is_shown_alone():
+    message = outline_module.OutlineGenerator()._format_error(BudgetExceededError("Daily token budget reached"))
+    assert message == "❌ Daily token budget reached"
+    assert "API key" not in message